@@ -1,13 +1,76 @@
 import os
+import json
+import hashlib
 import logging
-from components.load_document import (
-    load_documents,
-    split_text,
-    initialize_vector_store,
-    get_embeddings,
+from typing import Union
+from concurrent.futures import ThreadPoolExecutor
+from components.load_document import IndexManager
+from components.sharded_store import (
+    ShardedIndexManager,
+    ShardedRetriever,
+    ShardedVectorStore,
 )
+from components.streaming_ingest import StreamingIngestor
+from components.index_watcher import IndexWatcher
+from components.hybrid_retriever import HybridRetriever
+from components.metadata_filter import FilteredRetriever, MetadataIndex, parse_filter
+from components.context_packer import ContextPacker, PackingRetriever
+from components.reranker import RerankingRetriever, load_cross_encoder
+from components.symbol_index import SymbolIndex
+from components.vector_store import VectorStore
+from components.get_embeddings import describe_embeddings
 from components.llm_agent import QAChain
-from components.codellama_agent import run_codellama_agent
+from components.query_cache import QueryCache
+from components.semantic_cache import SemanticCache
+from components.codellama_agent import (
+    get_llm as get_agent_llm,
+    iter_codellama_agent,
+    stream_codellama_agent,
+)
+from components.model_registry import ModelRegistry, get_model_registry, warm_up_ollama
+from config.constants import (
+    AGENT_MAX_WORKERS,
+    AGENT_PARALLEL,
+    CHUNK_MODE,
+    CHUNK_OVERLAP,
+    CHUNK_SIZE,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_CACHE_MAX_MB,
+    EMBEDDING_MODEL,
+    HYBRID_RETRIEVAL,
+    INDEX_EF_SEARCH,
+    INDEX_MMAP,
+    INDEX_NPROBE,
+    INDEX_RECALL_QUERIES,
+    INDEX_SHARDING,
+    INDEX_TYPE,
+    INDEX_WATCH,
+    INDEX_WATCH_DEBOUNCE,
+    INDEX_WATCH_INTERVAL,
+    INGEST_BATCH_SIZE,
+    INGEST_MAX_MEMORY_MB,
+    INGEST_STREAMING,
+    LLM_BACKEND,
+    LLM_BATCH_WAIT_MS,
+    LLM_MAX_BATCH_SIZE,
+    LLM_MODEL_PATH,
+    MODEL_CONTEXT_TOKENS,
+    MODEL_WARM_UP,
+    QUERY_CACHE_DIR,
+    QUERY_CACHE_MAX_ENTRIES,
+    QUERY_CACHE_TTL,
+    RERANK,
+    RERANK_BATCH_SIZE,
+    RERANK_CANDIDATES,
+    RERANK_TIME_BUDGET_MS,
+    RERANKER_MODEL,
+    RETRIEVAL_FETCH_K,
+    RETRIEVAL_K,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_THRESHOLD,
+    SYMBOL_INDEX_DIR,
+)
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
 import streamlit as st
@@ -26,29 +89,59 @@ HUGGINGFACEHUB_API_TOKEN = os.getenv("HUGGINGFACEHUB_API_TOKEN")
 REPO_ID = os.getenv("REPO_ID")
 CODEBASE_DIR = os.getenv("CODEBASE_DIR")
 # Set up environment variables and logging
-os.environ["HUGGINGFACEHUB_API_TOKEN"] = HUGGINGFACEHUB_API_TOKEN
+if HUGGINGFACEHUB_API_TOKEN:
+    # Only the endpoint backend needs it
+    os.environ["HUGGINGFACEHUB_API_TOKEN"] = HUGGINGFACEHUB_API_TOKEN
 logging.basicConfig(level=logging.INFO)
 
-# Directory input
-root_dir = st.sidebar.text_input("Enter the root directory path:", CODEBASE_DIR)
 
-if root_dir:
-    documents = load_documents(root_dir)
-    st.sidebar.success(f"Loaded {len(documents)} documents")
+def get_embeddings():
+    """Returns the embedding model shared by every codebase."""
+    return get_model_registry().embedding_engine(
+        EMBEDDING_MODEL,
+        batch_size=EMBEDDING_BATCH_SIZE,
+        cache_dir=EMBEDDING_CACHE_DIR,
+        cache_max_bytes=EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+    )
 
-    texts = split_text(documents)
-    st.sidebar.success(f"Split into {len(texts)} chunks")
 
-    embeddings = get_embeddings()
+def create_qa_chain() -> QAChain:
+    """Creates a QA chain; its LLM is the shared one from the model registry."""
+    qa = QAChain(
+        repo_id=REPO_ID,
+        backend=LLM_BACKEND,
+        model_path=LLM_MODEL_PATH,
+        max_batch_size=LLM_MAX_BATCH_SIZE,
+        batch_wait=LLM_BATCH_WAIT_MS / 1000,
+    )
+    qa.initialize_llm()
+    return qa
+
 
-    vector_store = initialize_vector_store(texts=texts, embeddings=embeddings)
-    st.sidebar.success("Vector store initialized")
+@st.cache_resource
+def get_models() -> ModelRegistry:
+    """Creates the models once per process and warms them up together."""
+    registry = get_model_registry()
+    embeddings = get_embeddings()
+    agent_llm = get_agent_llm()
+    qa_llm = create_qa_chain().llm
+    if MODEL_WARM_UP:
+        probes = {
+            "embeddings": lambda: embeddings.embed_query("warm up"),
+            "agent": lambda: warm_up_ollama(agent_llm),
+        }
+        if LLM_BACKEND != "endpoint":
+            # The endpoint is remote; there is nothing to load here
+            probes["qa"] = qa_llm.warm_up
+        with ThreadPoolExecutor(max_workers=len(probes)) as executor:
+            for name, probe in probes.items():
+                executor.submit(registry.warm_up, name, probe)
+    return registry
 
-    retriever = vector_store.as_retriever(search_kwargs={"k": 1})
-    qa = QAChain(repo_id=REPO_ID)
-    llm = qa.initialize_llm()
-    qa_chain = qa.get_qa_chain(retriever)
 
+@st.cache_resource
+def get_explanation_chain(_llm) -> LLMChain:
+    """Builds the explanation chain once; its LLM is shared by every session."""
     # Create an explanation chain
     explanation_template = """
     Analyze and explain the following result:
@@ -62,47 +155,300 @@ if root_dir:
     explanation_prompt = PromptTemplate(
         template=explanation_template, input_variables=["result"]
     )
-    explanation_chain = LLMChain(llm=llm, prompt=explanation_prompt)
+    return LLMChain(llm=_llm, prompt=explanation_prompt)
+
+
+@st.cache_resource
+def get_index_manager(root_dir: str) -> Union[IndexManager, ShardedIndexManager]:
+    """Shares one index manager (and its embedding model) across sessions."""
+    embeddings = get_embeddings()
+    # One symbol database per codebase
+    root_digest = hashlib.sha256(os.path.abspath(root_dir).encode("utf-8")).hexdigest()
+    symbol_index = SymbolIndex(
+        root_dir, os.path.join(SYMBOL_INDEX_DIR, f"{root_digest[:16]}.sqlite")
+    )
+    options = dict(
+        embeddings=embeddings,
+        model_name=EMBEDDING_MODEL,
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        chunk_mode=CHUNK_MODE,
+        vector_store=VectorStore(
+            index_type=INDEX_TYPE,
+            nprobe=INDEX_NPROBE,
+            ef_search=INDEX_EF_SEARCH,
+            recall_queries=INDEX_RECALL_QUERIES,
+        ),
+        mmap=INDEX_MMAP,
+        ingestor=StreamingIngestor(
+            batch_size=INGEST_BATCH_SIZE,
+            max_memory_bytes=INGEST_MAX_MEMORY_MB * 1024 * 1024,
+        )
+        if INGEST_STREAMING
+        else None,
+    )
+    if INDEX_SHARDING == "directory":
+        # Each top-level directory is indexed, updated and searched on its own
+        return ShardedIndexManager.by_directory(
+            root_dir,
+            faiss_path=os.path.join("faiss", "shards", root_digest[:16]),
+            symbol_index=symbol_index,
+            **options,
+        )
+    return IndexManager(root_dir=root_dir, symbol_index=symbol_index, **options)
+
+
+@st.cache_resource
+def get_index_watcher(root_dir: str) -> IndexWatcher:
+    """Keeps the index of a codebase live for every session."""
+    return IndexWatcher(
+        get_index_manager(root_dir),
+        poll_interval=INDEX_WATCH_INTERVAL,
+        debounce=INDEX_WATCH_DEBOUNCE,
+    ).start()
+
+
+@st.cache_resource
+def get_query_cache() -> QueryCache:
+    """Shares answered queries across sessions and, on disk, across restarts."""
+    return QueryCache(
+        max_entries=QUERY_CACHE_MAX_ENTRIES,
+        ttl=QUERY_CACHE_TTL,
+        cache_dir=QUERY_CACHE_DIR,
+    )
+
+
+@st.cache_resource
+def get_semantic_cache(root_dir: str) -> SemanticCache:
+    """Shares answers of similar questions across sessions."""
+    return SemanticCache(
+        get_index_manager(root_dir).embeddings,
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+    )
+
+
+# Only the live index version and the one being replaced are kept
+@st.cache_resource(max_entries=2)
+def get_hybrid_retriever(index_key: str, _vector_store, k: int) -> HybridRetriever:
+    """Builds the BM25 side of hybrid retrieval once per index version."""
+    return HybridRetriever.from_vector_store(
+        _vector_store, k=k, fetch_k=max(k, RETRIEVAL_FETCH_K)
+    )
+
+
+# Two versions of each shard: the live one and the one being replaced
+@st.cache_resource(max_entries=64)
+def get_shard_retriever(shard_key: str, _vector_store, k: int) -> HybridRetriever:
+    """Builds the BM25 side of hybrid retrieval once per shard version."""
+    return HybridRetriever.from_vector_store(
+        _vector_store, k=k, fetch_k=max(k, RETRIEVAL_FETCH_K)
+    )
+
+
+@st.cache_resource(max_entries=2)
+def get_metadata_index(index_key: str, _vector_store) -> MetadataIndex:
+    """Builds the metadata columns used by retrieval filters once per index version."""
+    return MetadataIndex.from_vector_store(_vector_store)
+
+
+@st.cache_resource
+def get_cross_encoder(model_name: str):
+    """Shares one re-ranking model across sessions."""
+    return load_cross_encoder(model_name)
+
+
+# Models are created and warmed up by the first run of the process only
+with st.spinner("Loading models..."):
+    try:
+        models = get_models()
+    except (ImportError, FileNotFoundError) as e:
+        # A local LLM backend without its library or model cannot answer
+        st.error(f"Could not load the models: {e}")
+        st.stop()
+st.sidebar.caption(f"Models: {models.summary()}")
+
+# Directory input
+root_dir = st.sidebar.text_input("Enter the root directory path:", CODEBASE_DIR)
+
+if root_dir:
+    index_manager = get_index_manager(root_dir)
+    with st.spinner("Indexing codebase..."):
+        if INDEX_WATCH:
+            # Saved files are indexed in the background; each run takes the
+            # latest snapshot and keeps it for the whole run
+            index_key, vector_store = get_index_watcher(root_dir).snapshot()
+        else:
+            vector_store = index_manager.get_vector_store()
+            index_key = index_manager.index_key
+    sharded = isinstance(vector_store, ShardedVectorStore)
+    chunks = vector_store.ntotal if sharded else vector_store.index.ntotal
+    st.sidebar.success(f"Vector store ready: {chunks} chunks (index {index_key[:12]})")
+    if sharded:
+        st.sidebar.caption(f"Shards: {', '.join(vector_store.shards)}")
+    st.sidebar.caption(f"Discovery: {index_manager.discovery_stats.summary()}")
+    # The engine is wrapped in the embedding cache only when one is configured
+    for line in describe_embeddings(index_manager.embeddings):
+        st.sidebar.caption(line)
+
+    filter_text = st.sidebar.text_input(
+        "Filter retrieval (e.g. package:components ext:.py kind:function):"
+    )
+    try:
+        metadata_filter = parse_filter(filter_text)
+    except ValueError as e:
+        st.sidebar.error(str(e))
+        metadata_filter = {}
+    # Answers depend on the filter as much as on the index version
+    retrieval_key = index_key
+    if metadata_filter:
+        retrieval_key += json.dumps(metadata_filter, sort_keys=True)
+
+    # With re-ranking, a large candidate set is narrowed down to RETRIEVAL_K
+    candidate_k = RERANK_CANDIDATES if RERANK else RETRIEVAL_K
+    if sharded and HYBRID_RETRIEVAL:
+        # Shards are searched in parallel and fused as one ranking; unchanged
+        # shards keep their BM25 index
+        retriever = ShardedRetriever(
+            retrievers={
+                name: get_shard_retriever(
+                    vector_store.keys[name], store, candidate_k
+                ).filtered(metadata_filter)
+                for name, store in vector_store.shards.items()
+            },
+            k=candidate_k,
+            fetch_k=max(candidate_k, RETRIEVAL_FETCH_K),
+        )
+    elif sharded:
+        retriever = vector_store.as_retriever(
+            search_kwargs={"k": candidate_k, "metadata_filter": metadata_filter}
+        )
+    elif HYBRID_RETRIEVAL:
+        retriever = get_hybrid_retriever(
+            index_key, vector_store, candidate_k
+        ).filtered(metadata_filter)
+    elif metadata_filter:
+        retriever = FilteredRetriever(
+            vector_store=vector_store,
+            metadata_index=get_metadata_index(index_key, vector_store),
+            metadata_filter=metadata_filter,
+            k=candidate_k,
+        )
+    else:
+        retriever = vector_store.as_retriever(search_kwargs={"k": candidate_k})
+    if RERANK:
+        retriever = RerankingRetriever(
+            retriever=retriever,
+            cross_encoder=get_cross_encoder(RERANKER_MODEL),
+            top_n=RETRIEVAL_K,
+            batch_size=RERANK_BATCH_SIZE,
+            time_budget=RERANK_TIME_BUDGET_MS / 1000,
+        )
+    # The chain holds this run's retriever; its LLM is shared, and local
+    # backends batch the prompts of concurrent sessions
+    qa = create_qa_chain()
+    llm = qa.llm
+    if LLM_BACKEND != "endpoint":
+        st.sidebar.caption(f"LLM batching: {llm.batcher.stats.summary()}")
+    # Overlaps and copied code are removed and the context fits the model
+    packer = ContextPacker.for_model(MODEL_CONTEXT_TOKENS, qa.max_length)
+    qa.get_qa_chain(PackingRetriever(retriever=retriever, packer=packer))
+
+    explanation_chain = get_explanation_chain(llm)
 
     # Main query interface
     st.header("Ask a question about your codebase")
     query = st.text_input("Enter your query:")
 
-    if query:
-        with st.spinner("Processing query..."):
-            result = qa_chain.run(query)
-            agent_result = run_codellama_agent(
-                result
-            )  # Run our new agent on the result
+    agent_sections = {
+        "analysis": "AI Agent Analysis:",
+        "explanation": "AI Agent Explanation:",
+        "improvements": "AI Agent Suggested Improvements:",
+    }
+    streamed = []
+
+    def stream_query(query: str) -> dict:
+        # Tokens are rendered as they arrive; the caches keep the full answer
+        streamed.append(query)
         st.subheader("Answer:")
-        st.write(result)
+        result = st.write_stream(qa.stream(query))
 
-        st.subheader("AI Agent Analysis:")
-        st.write(agent_result["analysis"])
+        placeholders = {}
+        for section, title in agent_sections.items():
+            st.subheader(title)
+            placeholders[section] = st.empty()
+        agent_result = dict.fromkeys(agent_sections, "")
+        # Run our new agent on the result
+        for section, chunk in stream_codellama_agent(result, parallel=AGENT_PARALLEL):
+            if section == "timings":
+                agent_result["timings"] = chunk
+            else:
+                agent_result[section] += chunk
+                placeholders[section].markdown(agent_result[section])
+        return {"result": result, "agent_result": agent_result}
 
-        st.subheader("AI Agent Explanation:")
-        st.write(agent_result["explanation"])
+    def answer_query(query: str) -> dict:
+        # Rephrased questions are caught by meaning once the exact match misses
+        return semantic_cache.get_or_compute(
+            query,
+            qa.cache_scope(retrieval_key),
+            lambda: stream_query(query),
+        )
 
-        st.subheader("AI Agent Suggested Improvements:")
-        st.write(agent_result["improvements"])
+    symbol_answer = index_manager.symbol_index.answer(query) if query else None
+    if symbol_answer:
+        # Location questions are answered from the symbol table, without the LLM
+        st.subheader("Answer:")
+        st.markdown(symbol_answer)
+    elif query:
+        query_cache = get_query_cache()
+        semantic_cache = get_semantic_cache(root_dir)
+        answer = query_cache.get_or_compute(
+            qa.cache_key(query, retrieval_key),
+            lambda: answer_query(query),
+        )
+        result, agent_result = answer["result"], answer["agent_result"]
+        st.sidebar.caption(f"Query cache: {query_cache.summary()}")
+        st.sidebar.caption(f"Semantic cache: {semantic_cache.stats.summary()}")
+        if not streamed:
+            # Cached answers are complete, so they are written at once
+            st.subheader("Answer:")
+            st.write(result)
+            for section, title in agent_sections.items():
+                st.subheader(title)
+                st.write(agent_result[section])
+        st.caption(
+            "Agent timings: "
+            + ", ".join(
+                f"{name} {seconds:.1f}s"
+                for name, seconds in agent_result["timings"].items()
+            )
+        )
 
     # Display and analyze relevant documents
     if st.checkbox("Show and analyze relevant documents"):
         st.subheader("Relevant Documents:")
         docs = retriever.get_relevant_documents(query)
-        for i, doc in enumerate(docs):
+        # Overlapping chunks can come back more than once; analyze each once
+        contents = list(dict.fromkeys(doc.page_content for doc in docs))
+        placeholders = []
+        for i, content in enumerate(contents):
             st.markdown(f"**Document {i + 1}:**")
-            st.text(doc.page_content)
-
-            # Analyze document content using our new agent
-            doc_analysis = run_codellama_agent(doc.page_content)
-            st.subheader(f"AI Agent Analysis of Document {i + 1}:")
-            st.write(doc_analysis["analysis"])
-            st.write(doc_analysis["explanation"])
-            st.write(doc_analysis["improvements"])
-
+            st.text(content)
+            placeholders.append(st.empty())
             st.markdown("---")
 
+        # Analyze document content using our new agent, all documents at once,
+        # filling in each analysis as soon as it is ready
+        for i, doc_analysis in iter_codellama_agent(
+            contents, max_workers=AGENT_MAX_WORKERS, parallel=AGENT_PARALLEL
+        ):
+            with placeholders[i].container():
+                st.subheader(f"AI Agent Analysis of Document {i + 1}:")
+                st.write(doc_analysis["analysis"])
+                st.write(doc_analysis["explanation"])
+                st.write(doc_analysis["improvements"])
+
 else:
     st.warning("Please enter a valid directory path in the sidebar.")
 
@@ -0,0 +1,185 @@
+import ast
+import logging
+from typing import List, Optional
+from langchain.text_splitter import Language, RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+PYTHON_EXTENSIONS = (".py", ".pyw", ".pyi")
+
+_DEFINITIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+
+class PythonCodeSplitter:
+    """
+    Splits Python sources along their syntax tree.
+
+    Every function, method and class becomes one chunk, prefixed with the
+    signatures of its enclosing scopes so it can be read on its own. A class
+    chunk holds the class body with its methods collapsed to signatures.
+    Module-level statements between definitions are grouped into chunks of
+    their own. Only definitions longer than ``chunk_size`` are sub-split.
+    Documents that are not Python, or do not parse, fall back to the
+    recursive character splitter.
+    """
+
+    def __init__(self, chunk_size: int = 1500, chunk_overlap: int = 50):
+        """
+        Initializes the PythonCodeSplitter.
+
+        Args:
+            chunk_size (int): Chunks longer than this many characters are sub-split.
+            chunk_overlap (int): Overlap between the pieces of a sub-split chunk.
+        """
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._python_splitter = RecursiveCharacterTextSplitter.from_language(
+            Language.PYTHON, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        )
+        self._text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True
+        )
+
+    def split_documents(self, documents) -> List[Document]:
+        """Splits documents, using the syntax tree for Python sources."""
+        chunks = []
+        for document in documents:
+            source = document.metadata.get("source", "")
+            if source.endswith(PYTHON_EXTENSIONS):
+                chunks.extend(
+                    self.split_source(document.page_content, document.metadata)
+                )
+            else:
+                chunks.extend(self._text_splitter.split_documents([document]))
+        return chunks
+
+    def split_source(
+        self, source: str, metadata: Optional[dict] = None
+    ) -> List[Document]:
+        """
+        Splits a Python source into one chunk per definition.
+
+        Args:
+            source (str): The Python source code.
+            metadata (dict): Metadata copied into every chunk.
+
+        Returns:
+            List[Document]: Chunks with ``symbol``, ``kind``, ``start_line`` and
+            ``end_line`` metadata.
+        """
+        metadata = dict(metadata or {})
+        try:
+            tree = ast.parse(source)
+        except (SyntaxError, ValueError) as e:
+            logging.debug(
+                f"Falling back to text splitting for {metadata.get('source')}: {e}"
+            )
+            return self._text_splitter.split_documents(
+                [Document(page_content=source, metadata=metadata)]
+            )
+
+        lines = source.splitlines(keepends=True)
+        chunks: List[Document] = []
+        self._split_body(tree.body, lines, [], "", metadata, chunks)
+        return chunks
+
+    def _split_body(self, body, lines, headers, prefix, metadata, chunks):
+        pending = []
+        for node in body:
+            if not isinstance(node, _DEFINITIONS):
+                pending.append(node)
+                continue
+            if pending and not headers:
+                self._emit_statements(pending, lines, metadata, chunks)
+            pending = []
+
+            qualname = f"{prefix}{node.name}"
+            span = (_first_line(node), node.end_lineno)
+            if isinstance(node, ast.ClassDef):
+                text = self._class_outline(node, lines)
+                self._emit(text, headers, qualname, "class", span, metadata, chunks)
+                self._split_body(
+                    node.body,
+                    lines,
+                    headers + [_signature(node, lines)],
+                    f"{qualname}.",
+                    metadata,
+                    chunks,
+                )
+            else:
+                kind = "method" if headers else "function"
+                text = "".join(lines[span[0] - 1 : span[1]])
+                self._emit(text, headers, qualname, kind, span, metadata, chunks)
+        # Statements inside a class are part of the class outline already
+        if pending and not headers:
+            self._emit_statements(pending, lines, metadata, chunks)
+
+    def _emit_statements(self, nodes, lines, metadata, chunks):
+        start, end = _first_line(nodes[0]), nodes[-1].end_lineno
+        text = "".join(lines[start - 1 : end])
+        if text.strip():
+            self._emit(text, [], "<module>", "module", (start, end), metadata, chunks)
+
+    def _emit(self, text, headers, symbol, kind, span, metadata, chunks):
+        header = "".join(headers)
+        chunk_metadata = dict(
+            metadata,
+            symbol=symbol,
+            kind=kind,
+            start_line=span[0],
+            end_line=span[1],
+            language="python",
+        )
+        if len(header) + len(text) <= self.chunk_size:
+            chunks.append(
+                Document(page_content=header + text, metadata=chunk_metadata)
+            )
+            return
+
+        # Oversized definition: sub-split it, repeating the scope header and
+        # the definition's own first line on every following piece
+        first_line = text.splitlines(keepends=True)[0] if kind != "module" else ""
+        pieces = self._python_splitter.split_text(text)
+        for i, piece in enumerate(pieces):
+            piece_header = header if i == 0 else header + first_line
+            chunks.append(
+                Document(
+                    page_content=piece_header + piece,
+                    metadata=dict(chunk_metadata, part=i),
+                )
+            )
+
+    @staticmethod
+    def _class_outline(node: ast.ClassDef, lines) -> str:
+        """Returns the class source with method bodies collapsed to signatures."""
+        start = _first_line(node)
+        parts = []
+        cursor = start
+        for child in node.body:
+            if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                continue
+            child_start = _first_line(child)
+            parts.append("".join(lines[cursor - 1 : child_start - 1]))
+            parts.append(_signature(child, lines))
+            indent = " " * (child.col_offset + 4)
+            parts.append(f"{indent}...\n")
+            cursor = child.end_lineno + 1
+        parts.append("".join(lines[cursor - 1 : node.end_lineno]))
+        return "".join(parts)
+
+
+def _first_line(node) -> int:
+    """Line number of a node including its decorators."""
+    decorators = getattr(node, "decorator_list", None)
+    return min([node.lineno] + [d.lineno for d in decorators or []])
+
+
+def _signature(node, lines) -> str:
+    """Source lines from a definition's first line up to its body."""
+    start = _first_line(node)
+    body_start = node.body[0].lineno
+    # Docstrings and other body statements do not belong to the signature
+    end = max(node.lineno, body_start - 1)
+    text = "".join(lines[start - 1 : end])
+    if not text.endswith("\n"):
+        text += "\n"
+    return text
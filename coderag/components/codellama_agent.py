@@ -1,33 +1,100 @@
-from typing import Dict, TypedDict, Any
-from langgraph.graph import StateGraph
+import time
+import queue
+import asyncio
+import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Annotated, Dict, Iterator, List, Sequence, Tuple, TypedDict, Any
+from langgraph.graph import END, StateGraph
 from langchain_core.messages import HumanMessage, AIMessage
-from langchain_ollama.llms import OllamaLLM
 from langchain.prompts import ChatPromptTemplate
+from components.model_registry import get_model_registry
+from config.constants import MODEL, OLLAMA_BASE_URL, OLLAMA_KEEP_ALIVE
+
+
+def _merge_timings(left: Dict[str, float], right: Dict[str, float]) -> Dict[str, float]:
+    """Reducer that lets parallel nodes record their latency in the same state key."""
+    return {**(left or {}), **(right or {})}
 
 
 # Define the state of our agent
 class AgentState(TypedDict):
     messages: list[HumanMessage | AIMessage]
     next_step: str
+    timings: Annotated[Dict[str, float], _merge_timings]
+
+
+# State of the parallel agent: every stage writes its own key
+class ParallelAgentState(TypedDict):
+    code: str
+    analysis: str
+    explanation: str
+    improvements: str
+    timings: Annotated[Dict[str, float], _merge_timings]
+
+
+def _timed(name: str, node):
+    """Wraps a graph node so it records its latency under ``timings[name]``."""
+
+    @functools.wraps(node)
+    def timed_node(state):
+        start = time.perf_counter()
+        update = node(state)
+        update["timings"] = {name: time.perf_counter() - start}
+        return update
+
+    return timed_node
 
 
-# Initialize our language model using Ollama with Llama 3.1
-llm = OllamaLLM(model="llama3.1")
+# Our language model, Llama 3.1 served by Ollama, comes from the model
+# registry on first use and is shared with every session; set ``llm`` to
+# use another model
+llm = None
+
+
+def get_llm():
+    """Returns the agent's language model."""
+    if llm is not None:
+        return llm
+    return get_model_registry().ollama_llm(
+        MODEL, base_url=OLLAMA_BASE_URL, keep_alive=OLLAMA_KEEP_ALIVE
+    )
+
+
+code_analysis_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "You are a code analysis expert. Analyze the following code and provide insights.",
+        ),
+        ("human", "{input}"),
+    ]
+)
+explanation_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "You are an expert at explaining technical concepts. Explain the following analysis in simpler terms.",
+        ),
+        ("human", "{input}"),
+    ]
+)
+improvement_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "You are a software optimization expert. Suggest improvements for the following code and analysis.",
+        ),
+        ("human", "{input}"),
+    ]
+)
 
 
 # Define our agent's steps
 def analyze_code(state: AgentState) -> AgentState:
     messages = state["messages"]
-    code_analysis_prompt = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                "You are a code analysis expert. Analyze the following code and provide insights.",
-            ),
-            ("human", "{input}"),
-        ]
-    )
-    code_analysis_chain = code_analysis_prompt | llm
+    code_analysis_chain = code_analysis_prompt | get_llm()
     response = code_analysis_chain.invoke({"input": messages[-1].content})
     state["messages"].append(
         AIMessage(content=response)
@@ -38,16 +105,7 @@ def analyze_code(state: AgentState) -> AgentState:
 
 def explain_result(state: AgentState) -> AgentState:
     messages = state["messages"]
-    explanation_prompt = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                "You are an expert at explaining technical concepts. Explain the following analysis in simpler terms.",
-            ),
-            ("human", "{input}"),
-        ]
-    )
-    explanation_chain = explanation_prompt | llm
+    explanation_chain = explanation_prompt | get_llm()
     response = explanation_chain.invoke({"input": messages[-1].content})
     state["messages"].append(
         AIMessage(content=response)
@@ -58,16 +116,7 @@ def explain_result(state: AgentState) -> AgentState:
 
 def suggest_improvements(state: AgentState) -> AgentState:
     messages = state["messages"]
-    improvement_prompt = ChatPromptTemplate.from_messages(
-        [
-            (
-                "system",
-                "You are a software optimization expert. Suggest improvements for the following code and analysis.",
-            ),
-            ("human", "{input}"),
-        ]
-    )
-    improvement_chain = improvement_prompt | llm
+    improvement_chain = improvement_prompt | get_llm()
     response = improvement_chain.invoke(
         {"input": "\n".join([m.content for m in messages])}
     )
@@ -78,30 +127,264 @@ def suggest_improvements(state: AgentState) -> AgentState:
     return state
 
 
-# Define our workflow
-workflow = StateGraph(AgentState)
+@functools.lru_cache(maxsize=None)
+def get_graph():
+    """Compiles the sequential agent graph on first use."""
+    # Define our workflow
+    workflow = StateGraph(AgentState)
+
+    # Add nodes to our graph
+    workflow.add_node("analyze_code", _timed("analyze_code", analyze_code))
+    workflow.add_node("explain_result", _timed("explain_result", explain_result))
+    workflow.add_node(
+        "suggest_improvements", _timed("suggest_improvements", suggest_improvements)
+    )
+
+    # Add edges to our graph
+    workflow.add_edge("analyze_code", "explain_result")
+    workflow.add_edge("explain_result", "suggest_improvements")
+    workflow.set_entry_point("analyze_code")
+
+    # Compile the graph
+    return workflow.compile()
+
 
-# Add nodes to our graph
-workflow.add_node("analyze_code", analyze_code)
-workflow.add_node("explain_result", explain_result)
-workflow.add_node("suggest_improvements", suggest_improvements)
+# Parallel steps: explanation and improvements only need the code and the
+# analysis, so they run concurrently once the analysis is done. The steps
+# are synchronous; the graph runs the two branches on threads. The shared
+# LLM's async client is bound to the event loop it was first used on, so
+# async steps under a new loop per run would fail from the second run on.
+def analyze_code_step(state: ParallelAgentState) -> Dict[str, Any]:
+    response = (code_analysis_prompt | get_llm()).invoke({"input": state["code"]})
+    return {"analysis": response}
 
-# Add edges to our graph
-workflow.add_edge("analyze_code", "explain_result")
-workflow.add_edge("explain_result", "suggest_improvements")
-workflow.set_entry_point("analyze_code")
 
-# Compile the graph
-graph = workflow.compile()
+def explain_result_step(state: ParallelAgentState) -> Dict[str, Any]:
+    response = (explanation_prompt | get_llm()).invoke({"input": state["analysis"]})
+    return {"explanation": response}
+
+
+def suggest_improvements_step(state: ParallelAgentState) -> Dict[str, Any]:
+    response = (improvement_prompt | get_llm()).invoke(
+        {"input": "\n".join([state["code"], state["analysis"]])}
+    )
+    return {"improvements": response}
+
+
+@functools.lru_cache(maxsize=None)
+def get_parallel_graph():
+    """Compiles the parallel agent graph on first use."""
+    parallel_workflow = StateGraph(ParallelAgentState)
+    parallel_workflow.add_node(
+        "analyze_code", _timed("analyze_code", analyze_code_step)
+    )
+    parallel_workflow.add_node(
+        "explain_result", _timed("explain_result", explain_result_step)
+    )
+    parallel_workflow.add_node(
+        "suggest_improvements",
+        _timed("suggest_improvements", suggest_improvements_step),
+    )
+    parallel_workflow.set_entry_point("analyze_code")
+    parallel_workflow.add_edge("analyze_code", "explain_result")
+    parallel_workflow.add_edge("analyze_code", "suggest_improvements")
+    parallel_workflow.add_edge("explain_result", END)
+    parallel_workflow.add_edge("suggest_improvements", END)
+    return parallel_workflow.compile()
+
+
+def _run_parallel(code: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    result = get_parallel_graph().invoke({"code": code, "timings": {}})
+    timings = _log_timings(result["timings"], time.perf_counter() - start)
+    return {
+        "analysis": result["analysis"],
+        "explanation": result["explanation"],
+        "improvements": result["improvements"],
+        "timings": timings,
+    }
+
+
+async def arun_codellama_agent(code: str) -> Dict[str, Any]:
+    """
+    Runs the agent with the explanation and improvement steps in parallel.
+
+    The steps run on a worker thread, so the caller's event loop stays free.
+
+    Parameters:
+    - code (str): The code or answer to analyze.
+
+    Returns:
+    - Dict[str, Any]: The analysis, explanation and improvements, plus
+      ``timings`` with the latency of every step and the wall-clock total.
+    """
+    return await asyncio.to_thread(_run_parallel, code)
+
+
+def _log_timings(timings: Dict[str, float], total: float) -> Dict[str, float]:
+    timings = dict(timings, total=total)
+    logging.info(
+        "CodeLlama agent timings: "
+        + ", ".join(f"{name}={seconds:.2f}s" for name, seconds in timings.items())
+    )
+    return timings
 
 
 # Function to run our agent
-def run_codellama_agent(code: str) -> Dict[str, Any]:
-    result = graph.invoke(
-        {"messages": [HumanMessage(content=code)], "next_step": "analyze_code"}
+def run_codellama_agent(code: str, parallel: bool = False) -> Dict[str, Any]:
+    if parallel:
+        return _run_parallel(code)
+    start = time.perf_counter()
+    result = get_graph().invoke(
+        {
+            "messages": [HumanMessage(content=code)],
+            "next_step": "analyze_code",
+            "timings": {},
+        }
     )
     return {
         "analysis": result["messages"][1].content,
         "explanation": result["messages"][2].content,
         "improvements": result["messages"][3].content,
+        "timings": _log_timings(result["timings"], time.perf_counter() - start),
     }
+
+
+def iter_codellama_agent(
+    codes: Sequence[str], max_workers: int = 4, parallel: bool = False
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Runs the agent on several inputs concurrently, yielding results as they finish.
+
+    Identical inputs are analyzed once; every position holding them is
+    yielded when that analysis completes.
+
+    Parameters:
+    - codes (Sequence[str]): The code or documents to analyze.
+    - max_workers (int): Maximum number of agents running at once.
+    - parallel (bool): Whether each agent runs its steps in parallel.
+
+    Yields:
+    - Tuple[int, Dict[str, Any]]: The position of an input and its agent result.
+    """
+    positions: Dict[str, List[int]] = {}
+    for i, code in enumerate(codes):
+        positions.setdefault(code, []).append(i)
+    if not positions:
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(positions))) as executor:
+        futures = {
+            executor.submit(run_codellama_agent, code, parallel): code
+            for code in positions
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            for i in positions[futures[future]]:
+                yield i, result
+
+
+def _stream_step(section, node, prompt, text, timings, start):
+    """Streams one agent step, yielding ``(section, chunk)`` and returning the text."""
+    node_start = time.perf_counter()
+    chunks = []
+    for chunk in (prompt | get_llm()).stream({"input": text}):
+        if not chunks:
+            timings[f"{node}_first_token"] = time.perf_counter() - start
+        chunks.append(chunk)
+        yield section, chunk
+    timings[node] = time.perf_counter() - node_start
+    return "".join(chunks)
+
+
+def _merge_streams(*steps) -> Iterator[Tuple[str, Any]]:
+    """
+    Runs step generators in threads, yielding their events as they arrive.
+
+    When the consumer stops iterating, every step is closed at its next
+    event, which ends its request to the model.
+    """
+    events: queue.Queue = queue.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def produce(step):
+        try:
+            for event in step:
+                if stop.is_set():
+                    break
+                events.put(event)
+        except Exception as e:
+            events.put((done, e))
+        else:
+            events.put((done, None))
+        finally:
+            step.close()
+
+    for step in steps:
+        threading.Thread(target=produce, args=(step,), daemon=True).start()
+    remaining = len(steps)
+    try:
+        while remaining:
+            event = events.get()
+            if event[0] is done:
+                remaining -= 1
+                if event[1] is not None:
+                    raise event[1]
+                continue
+            yield event
+    finally:
+        stop.set()
+
+
+def stream_codellama_agent(
+    code: str, parallel: bool = False
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Runs the agent, yielding the tokens of every step as they are generated.
+
+    Parameters:
+    - code (str): The code or answer to analyze.
+    - parallel (bool): Whether to stream the explanation and improvements at once.
+
+    Yields:
+    - Tuple[str, Any]: ``(section, chunk)`` events, where section is
+      ``"analysis"``, ``"explanation"`` or ``"improvements"``, followed by a
+      final ``("timings", timings)`` event including time-to-first-token.
+    """
+    start = time.perf_counter()
+    timings: Dict[str, float] = {}
+    analysis = yield from _stream_step(
+        "analysis", "analyze_code", code_analysis_prompt, code, timings, start
+    )
+    if parallel:
+        yield from _merge_streams(
+            _stream_step(
+                "explanation",
+                "explain_result",
+                explanation_prompt,
+                analysis,
+                timings,
+                start,
+            ),
+            _stream_step(
+                "improvements",
+                "suggest_improvements",
+                improvement_prompt,
+                "\n".join([code, analysis]),
+                timings,
+                start,
+            ),
+        )
+    else:
+        explanation = yield from _stream_step(
+            "explanation", "explain_result", explanation_prompt, analysis, timings, start
+        )
+        yield from _stream_step(
+            "improvements",
+            "suggest_improvements",
+            improvement_prompt,
+            "\n".join([code, analysis, explanation]),
+            timings,
+            start,
+        )
+    yield "timings", _log_timings(timings, time.perf_counter() - start)
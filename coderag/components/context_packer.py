@@ -0,0 +1,261 @@
+import re
+import hashlib
+import logging
+from typing import Callable, List, Optional, Sequence
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def approximate_tokens(text: str) -> int:
+    """Estimates the token count of a text at four characters per token."""
+    return (len(text) + 3) // 4
+
+
+def simhash(text: str, bits: int = 64, shingle: int = 3) -> int:
+    """
+    Returns the SimHash fingerprint of a text over word shingles.
+
+    Texts that differ in a few tokens get fingerprints a few bits apart.
+
+    Args:
+        text (str): The text.
+        bits (int): Fingerprint size.
+        shingle (int): Number of consecutive tokens per feature.
+
+    Returns:
+        int: The fingerprint.
+    """
+    tokens = _TOKEN.findall(text)
+    features = [
+        " ".join(tokens[i : i + shingle])
+        for i in range(max(1, len(tokens) - shingle + 1))
+    ]
+    weights = [0] * bits
+    for feature in features:
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=bits // 8)
+        value = int.from_bytes(digest.digest(), "big")
+        for bit in range(bits):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(bits) if weights[bit] > 0)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _text_overlap(left: str, right: str, max_overlap: int) -> int:
+    """Length of the longest suffix of ``left`` that is a prefix of ``right``."""
+    for size in range(min(len(left), len(right), max_overlap), 0, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+class ContextPacker:
+    """
+    Assembles retrieved chunks into a compact context for the LLM.
+
+    Chunks are processed in three steps: adjacent or overlapping chunks of
+    the same file are merged, so shared overlaps appear once; near-duplicate
+    chunks (copied code) are dropped by SimHash distance; and the remaining
+    chunks are packed, most relevant first, into a token budget.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 2048,
+        max_distance: int = 3,
+        min_overlap: int = 20,
+        max_overlap: int = 1000,
+        token_counter: Optional[Callable[[str], int]] = None,
+    ):
+        """
+        Initializes the ContextPacker.
+
+        Args:
+            max_tokens (int): Token budget of the packed context.
+            max_distance (int): SimHash bit distance under which chunks are duplicates.
+            min_overlap (int): Shortest text overlap that merges two chunks.
+            max_overlap (int): Longest text overlap that is looked for.
+            token_counter (Callable[[str], int]): Counts the tokens of a text;
+                defaults to ``approximate_tokens``.
+        """
+        self.max_tokens = max_tokens
+        self.max_distance = max_distance
+        self.min_overlap = min_overlap
+        self.max_overlap = max_overlap
+        self.count_tokens = token_counter or approximate_tokens
+
+    @classmethod
+    def for_model(
+        cls,
+        context_tokens: int,
+        max_new_tokens: int,
+        reserve_tokens: int = 512,
+        **kwargs,
+    ) -> "ContextPacker":
+        """
+        Creates a packer whose budget fits a model's context window.
+
+        Args:
+            context_tokens (int): The model's context length.
+            max_new_tokens (int): Tokens reserved for the generated answer.
+            reserve_tokens (int): Tokens reserved for the prompt template and question.
+            **kwargs: Other ``ContextPacker`` arguments.
+
+        Returns:
+            ContextPacker: The packer.
+        """
+        budget = max(256, context_tokens - max_new_tokens - reserve_tokens)
+        return cls(max_tokens=budget, **kwargs)
+
+    def _merge_pair(self, left: Document, right: Document) -> Optional[str]:
+        """Returns the merged text of two chunks of one file, or None."""
+        left_start = left.metadata.get("start_index")
+        right_start = right.metadata.get("start_index")
+        if left_start is not None and right_start is not None:
+            left_end = left_start + len(left.page_content)
+            if right_start > left_end:
+                return None
+            skip = left_end - right_start
+            return left.page_content + right.page_content[skip:]
+        if right.page_content in left.page_content:
+            return left.page_content
+        if left.page_content in right.page_content:
+            return right.page_content
+        overlap = _text_overlap(
+            left.page_content, right.page_content, self.max_overlap
+        )
+        if overlap >= self.min_overlap:
+            return left.page_content + right.page_content[overlap:]
+        left_end = left.metadata.get("end_line")
+        right_start_line = right.metadata.get("start_line")
+        if left_end is not None and right_start_line == left_end + 1:
+            return left.page_content + right.page_content
+        return None
+
+    def merge(self, documents: Sequence[Document]) -> List[Document]:
+        """
+        Merges adjacent and overlapping chunks of the same file.
+
+        Merged chunks keep the rank of their most relevant part.
+
+        Args:
+            documents (Sequence[Document]): Chunks, most relevant first.
+
+        Returns:
+            List[Document]: Merged chunks, most relevant first.
+        """
+
+        def position(item):
+            rank, document = item
+            return (
+                document.metadata.get("start_index", -1),
+                document.metadata.get("start_line", -1),
+                rank,
+            )
+
+        by_source = {}
+        for rank, document in enumerate(documents):
+            source = document.metadata.get("source")
+            by_source.setdefault(source, []).append((rank, document))
+
+        merged = []
+        for source, items in by_source.items():
+            if source is None:
+                merged.extend(items)
+                continue
+            items.sort(key=position)
+            rank, current = items[0]
+            for next_rank, document in items[1:]:
+                text = self._merge_pair(current, document)
+                if text is None and "start_index" not in document.metadata:
+                    # Without positions the file order of the chunks is unknown
+                    text = self._merge_pair(document, current)
+                if text is None:
+                    merged.append((rank, current))
+                    rank, current = next_rank, document
+                    continue
+                metadata = dict(current.metadata)
+                if "start_line" in document.metadata:
+                    metadata["start_line"] = min(
+                        metadata.get("start_line", document.metadata["start_line"]),
+                        document.metadata["start_line"],
+                    )
+                if "end_line" in document.metadata:
+                    metadata["end_line"] = max(
+                        metadata.get("end_line", 0), document.metadata["end_line"]
+                    )
+                current = Document(page_content=text, metadata=metadata)
+                rank = min(rank, next_rank)
+            merged.append((rank, current))
+        merged.sort(key=lambda item: item[0])
+        return [document for _, document in merged]
+
+    def deduplicate(self, documents: Sequence[Document]) -> List[Document]:
+        """Drops chunks that are near-duplicates of a more relevant chunk."""
+        kept, fingerprints = [], []
+        for document in documents:
+            fingerprint = simhash(document.page_content)
+            if any(
+                hamming_distance(fingerprint, other) <= self.max_distance
+                for other in fingerprints
+            ):
+                continue
+            kept.append(document)
+            fingerprints.append(fingerprint)
+        return kept
+
+    def pack(self, documents: Sequence[Document]) -> List[Document]:
+        """
+        Merges, deduplicates and packs chunks into the token budget.
+
+        Chunks are added most relevant first while they fit; the most
+        relevant chunk is truncated if it alone exceeds the budget.
+
+        Args:
+            documents (Sequence[Document]): Retrieved chunks, most relevant first.
+
+        Returns:
+            List[Document]: The chunks to put in the prompt.
+        """
+        candidates = self.deduplicate(self.merge(documents))
+        packed, used = [], 0
+        for document in candidates:
+            tokens = self.count_tokens(document.page_content)
+            if used + tokens <= self.max_tokens:
+                packed.append(document)
+                used += tokens
+            elif not packed:
+                ratio = self.max_tokens / tokens
+                text = document.page_content[: int(len(document.page_content) * ratio)]
+                packed.append(Document(page_content=text, metadata=document.metadata))
+                used = self.count_tokens(text)
+                break
+        before = sum(self.count_tokens(d.page_content) for d in documents)
+        logging.info(
+            f"Packed {len(documents)} chunks ({before} tokens) into "
+            f"{len(packed)} chunks ({used} tokens)"
+        )
+        return packed
+
+
+class PackingRetriever(BaseRetriever):
+    """Wraps a retriever so its results go through a ContextPacker."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    retriever: BaseRetriever
+    packer: ContextPacker
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        documents = self.retriever.invoke(
+            query, config={"callbacks": run_manager.get_child()}
+        )
+        return self.packer.pack(documents)
@@ -0,0 +1,252 @@
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def cache_key(model_name: str, normalize: bool, text: str) -> str:
+    """Returns the cache key of a text embedded by a given model."""
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model_name}\0{int(normalize)}\0{text_hash}"
+
+
+class EmbeddingCache:
+    """
+    A persistent, size-bounded store of embedding vectors.
+
+    Vectors live in a fixed-capacity memory-mapped array file (``vectors.bin``)
+    and an SQLite database (``index.sqlite``) maps each key to its slot in the
+    array and its last access time. When the array is full, the least
+    recently used entries are evicted and their slots reused.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        dim: int,
+        max_bytes: int = 1 << 30,
+        dtype: str = "float16",
+    ):
+        """
+        Opens or creates the cache.
+
+        Args:
+            cache_dir (str): Directory holding the cache files.
+            dim (int): Dimension of the cached vectors.
+            max_bytes (int): Size of the vector file, bounding the number of entries.
+            dtype (str): ``"float16"`` or ``"float32"`` storage type.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.dtype = np.dtype(dtype)
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(cache_dir, "index.sqlite"), check_same_thread=False
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries "
+            "(key TEXT PRIMARY KEY, slot INTEGER UNIQUE, last_used REAL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)"
+        )
+        self._db.commit()
+
+        meta_path = os.path.join(cache_dir, "meta.json")
+        meta = {"dim": dim, "dtype": self.dtype.name, "max_bytes": max_bytes}
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f:
+                existing = json.load(f)
+            if existing != meta:
+                # The layout changed, so the stored slots are meaningless
+                logging.warning("Embedding cache layout changed, clearing it")
+                self._db.execute("DELETE FROM entries")
+                self._db.commit()
+                if os.path.exists(os.path.join(cache_dir, "vectors.bin")):
+                    os.remove(os.path.join(cache_dir, "vectors.bin"))
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        self.capacity = max(1, max_bytes // (dim * self.dtype.itemsize))
+        vectors_path = os.path.join(cache_dir, "vectors.bin")
+        mode = "r+" if os.path.exists(vectors_path) else "w+"
+        self._vectors = np.memmap(
+            vectors_path, dtype=self.dtype, mode=mode, shape=(self.capacity, dim)
+        )
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _lookup(self, keys: Sequence[str]) -> Dict[str, int]:
+        slots = {}
+        # SQLite limits the number of bound parameters per statement
+        for i in range(0, len(keys), 500):
+            batch = list(keys[i : i + 500])
+            placeholders = ",".join("?" * len(batch))
+            slots.update(
+                self._db.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({placeholders})",
+                    batch,
+                ).fetchall()
+            )
+        return slots
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Returns the cached vectors of the given keys and marks them as used."""
+        with self._lock:
+            slots = self._lookup(list(dict.fromkeys(keys)))
+            found = {
+                key: np.array(self._vectors[slot], dtype=np.float32)
+                for key, slot in slots.items()
+            }
+            now = time.time()
+            self._db.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ?",
+                [(now, key) for key in found],
+            )
+            self._db.commit()
+        return found
+
+    def put_many(self, items: Dict[str, Sequence[float]]) -> None:
+        """Stores vectors, evicting the least recently used entries if full."""
+        items = dict(list(items.items())[-self.capacity :])
+        if not items:
+            return
+        with self._lock:
+            # An immediate transaction serializes slot allocation across processes
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                slots = self._lookup(list(items))
+                new_keys = [key for key in items if key not in slots]
+                slots.update(zip(new_keys, self._allocate(len(new_keys))))
+                now = time.time()
+                for key, slot in slots.items():
+                    self._vectors[slot] = np.asarray(items[key], dtype=self.dtype)
+                self._vectors.flush()
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO entries (key, slot, last_used) "
+                    "VALUES (?, ?, ?)",
+                    [(key, slot, now) for key, slot in slots.items()],
+                )
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+
+    def _allocate(self, count: int) -> List[int]:
+        # Slots are only freed by eviction, which reuses them at once, so the
+        # unused slots are exactly those above the highest one in use
+        highest = self._db.execute("SELECT MAX(slot) FROM entries").fetchone()[0]
+        next_slot = 0 if highest is None else highest + 1
+        slots = list(range(next_slot, min(next_slot + count, self.capacity)))
+        evict = count - len(slots)
+        if evict > 0:
+            victims = self._db.execute(
+                "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (evict,)
+            ).fetchall()
+            self._db.executemany(
+                "DELETE FROM entries WHERE key = ?", [(key,) for key, _ in victims]
+            )
+            slots.extend(slot for _, slot in victims)
+            logging.info(f"Evicted {len(victims)} entries from the embedding cache")
+        return slots
+
+    def close(self) -> None:
+        self._vectors.flush()
+        self._db.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings object with a persistent ``EmbeddingCache``.
+
+    Document texts are looked up by (model name, normalize flag, sha256 of
+    the text); only cache misses are sent to the wrapped model, in one batch.
+    Queries are passed through uncached.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        cache_dir: str,
+        normalize: bool = False,
+        max_bytes: int = 1 << 30,
+        dtype: str = "float16",
+    ):
+        """
+        Initializes the CachedEmbeddings.
+
+        Args:
+            embeddings (Embeddings): The embeddings object to wrap.
+            model_name (str): Name of the wrapped model, part of the cache key.
+            cache_dir (str): Directory of the on-disk cache.
+            normalize (bool): Whether the wrapped model normalizes its vectors.
+            max_bytes (int): Size bound of the cached vectors.
+            dtype (str): Storage type of the cached vectors.
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.normalize = normalize
+        self.max_bytes = max_bytes
+        self.dtype = dtype
+        self.hits = 0
+        self.misses = 0
+        self._cache = None
+
+    def _get_cache(self, dim: Optional[int] = None) -> Optional[EmbeddingCache]:
+        if self._cache is None:
+            meta_path = os.path.join(self.cache_dir, "meta.json")
+            if dim is None and os.path.exists(meta_path):
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    dim = json.load(f)["dim"]
+            if dim is None:
+                return None
+            self._cache = EmbeddingCache(
+                self.cache_dir, dim, max_bytes=self.max_bytes, dtype=self.dtype
+            )
+        return self._cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [cache_key(self.model_name, self.normalize, text) for text in texts]
+        cache = self._get_cache()
+        found = cache.get_many(keys) if cache is not None else {}
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing, vectors))
+            self._get_cache(len(vectors[0])).put_many(computed)
+            found.update(
+                {key: np.asarray(v, dtype=np.float32) for key, v in computed.items()}
+            )
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        logging.info(
+            f"Embedding cache: {len(texts) - len(missing)} hits, "
+            f"{len(missing)} misses for {len(texts)} texts"
+        )
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> str:
+        return f"{self.hits} hits, {self.misses} misses ({self.hit_rate:.1%} hit rate)"
@@ -0,0 +1,191 @@
+import os
+import time
+import logging
+import threading
+from typing import List, Optional
+from langchain_core.embeddings import Embeddings
+from sentence_transformers import SentenceTransformer
+
+
+class EmbeddingStats:
+    """Throughput counters of an EmbeddingEngine."""
+
+    def __init__(self):
+        self.chunks = 0
+        self.tokens = 0
+        self.padded_tokens = 0
+        self.seconds = 0.0
+
+    def record(self, chunks: int, tokens: int, padded_tokens: int, seconds: float):
+        self.chunks += chunks
+        self.tokens += tokens
+        self.padded_tokens += padded_tokens
+        self.seconds += seconds
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.tokens / self.seconds if self.seconds else 0.0
+
+    @property
+    def padding_ratio(self) -> float:
+        """Share of the computed token positions that were padding."""
+        return 1 - self.tokens / self.padded_tokens if self.padded_tokens else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.chunks} chunks / {self.tokens} tokens in {self.seconds:.2f}s "
+            f"({self.chunks_per_second:.1f} chunks/s, "
+            f"{self.tokens_per_second:.0f} tokens/s, "
+            f"{self.padding_ratio:.1%} padding)"
+        )
+
+
+class EmbeddingEngine(Embeddings):
+    """
+    A CPU embedding engine built directly on sentence-transformers.
+
+    Texts are tokenized once, sorted by token length and encoded in batches
+    of ``batch_size`` so each batch holds texts of similar length and little
+    padding. Large inputs are spread over a multi-process pool with one
+    worker per core; small ones (queries, incremental updates) are encoded
+    in-process to avoid the pool round trip. Throughput is tracked in
+    ``self.stats``.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = 64,
+        num_workers: Optional[int] = None,
+        min_parallel_chunks: int = 1024,
+        normalize_embeddings: bool = False,
+    ):
+        """
+        Initializes the EmbeddingEngine.
+
+        Parameters:
+        - model_name (str): Name of the sentence-transformers model.
+        - batch_size (int): Number of texts per forward pass.
+        - num_workers (int): Processes in the encoding pool (default: one per core).
+        - min_parallel_chunks (int): Smallest input that is sent to the process pool.
+        - normalize_embeddings (bool): Whether to L2-normalize the vectors.
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.min_parallel_chunks = min_parallel_chunks
+        self.normalize_embeddings = normalize_embeddings
+        self.stats = EmbeddingStats()
+        self._model = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> SentenceTransformer:
+        if self._model is None:
+            logging.info(f"Loading sentence-transformers model: {self.model_name}")
+            self._model = SentenceTransformer(self.model_name, device="cpu")
+        return self._model
+
+    def _get_pool(self):
+        if self._pool is None:
+            logging.info(f"Starting embedding pool with {self.num_workers} workers")
+            self._pool = self.model.start_multi_process_pool(
+                target_devices=["cpu"] * self.num_workers
+            )
+        return self._pool
+
+    def _token_lengths(self, texts: List[str]) -> List[int]:
+        tokenizer = self.model.tokenizer
+        encoded = tokenizer(
+            texts,
+            add_special_tokens=True,
+            truncation=True,
+            max_length=self.model.max_seq_length,
+            return_attention_mask=False,
+            return_token_type_ids=False,
+        )
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def _padded_tokens(self, lengths: List[int]) -> int:
+        # Every text of a batch is padded to the longest text of that batch
+        batches = [
+            lengths[i : i + self.batch_size]
+            for i in range(0, len(lengths), self.batch_size)
+        ]
+        return sum(max(batch) * len(batch) for batch in batches)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds texts in length-bucketed batches, in parallel for large inputs.
+
+        Parameters:
+        - texts (List[str]): The texts to embed.
+
+        Returns:
+        - List[List[float]]: One vector per text, in input order.
+        """
+        if not texts:
+            return []
+        start = time.perf_counter()
+        lengths = self._token_lengths(texts)
+        order = sorted(range(len(texts)), key=lengths.__getitem__)
+        sorted_texts = [texts[i] for i in order]
+
+        # One engine may be shared by several sessions; the pool is not re-entrant
+        with self._lock:
+            if self.num_workers > 1 and len(texts) >= self.min_parallel_chunks:
+                vectors = self.model.encode_multi_process(
+                    sorted_texts,
+                    self._get_pool(),
+                    batch_size=self.batch_size,
+                    # Contiguous slices of the sorted input keep batches homogeneous
+                    chunk_size=self.batch_size * 8,
+                    normalize_embeddings=self.normalize_embeddings,
+                )
+            else:
+                vectors = self.model.encode(
+                    sorted_texts,
+                    batch_size=self.batch_size,
+                    normalize_embeddings=self.normalize_embeddings,
+                    convert_to_numpy=True,
+                )
+
+        results: List[List[float]] = [None] * len(texts)
+        for position, index in enumerate(order):
+            results[index] = vectors[position].tolist()
+
+        sorted_lengths = [lengths[i] for i in order]
+        self.stats.record(
+            len(texts),
+            sum(lengths),
+            self._padded_tokens(sorted_lengths),
+            time.perf_counter() - start,
+        )
+        logging.info(f"Embedded {len(texts)} chunks; total: {self.stats.summary()}")
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embeds a single query in-process."""
+        vector = self.model.encode(
+            [text],
+            normalize_embeddings=self.normalize_embeddings,
+            convert_to_numpy=True,
+        )[0]
+        return vector.tolist()
+
+    def close(self) -> None:
+        """Stops the process pool, if one was started."""
+        if self._pool is not None:
+            SentenceTransformer.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
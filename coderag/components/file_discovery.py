@@ -0,0 +1,352 @@
+import os
+import re
+import logging
+from collections import Counter
+from fnmatch import fnmatch
+from typing import List, Optional, Sequence, Tuple
+
+# Directories that never hold source worth indexing; pruned before descending.
+PRUNED_DIRS = frozenset(
+    {
+        ".git",
+        ".hg",
+        ".svn",
+        "node_modules",
+        "bower_components",
+        "__pycache__",
+        ".venv",
+        "venv",
+        "env",
+        ".tox",
+        ".nox",
+        ".mypy_cache",
+        ".pytest_cache",
+        ".ruff_cache",
+        ".ipynb_checkpoints",
+        "build",
+        "dist",
+        ".eggs",
+        "site-packages",
+        "target",
+        ".idea",
+        ".vscode",
+    }
+)
+PRUNED_DIR_GLOBS = ("*.egg-info",)
+# Project-level ignore file, read with .gitignore syntax from the root directory.
+PROJECT_IGNORE_FILE = ".coderagignore"
+
+
+def _translate(pattern: str) -> str:
+    """Translates a gitignore glob (without anchors or trailing slash) to a regex."""
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            regex += "/.*"
+            i += 3
+        elif pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif pattern[i] == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                regex += re.escape(pattern[i])
+                i += 1
+            else:
+                body = pattern[i + 1 : end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                regex += f"[{body}]"
+                i = end + 1
+        elif pattern[i] == "\\" and i + 1 < len(pattern):
+            regex += re.escape(pattern[i + 1])
+            i += 2
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return regex
+
+
+class IgnoreRule:
+    """A single compiled line of a .gitignore-style file."""
+
+    def __init__(self, pattern: str):
+        """
+        Compiles a gitignore pattern.
+
+        Args:
+            pattern (str): A non-empty, non-comment line of an ignore file.
+        """
+        self.negated = pattern.startswith("!")
+        if self.negated or pattern.startswith("\\"):
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        # Patterns with an inner slash are relative to the ignore file's directory
+        anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+        prefix = "" if anchored else "(?:.*/)?"
+        self.regex = re.compile(f"^{prefix}{_translate(pattern)}$")
+
+    def matches(self, relative_path: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        return bool(self.regex.match(relative_path))
+
+
+def parse_ignore_file(path: str) -> List[IgnoreRule]:
+    """Parses a .gitignore-style file; a missing file yields no rules."""
+    rules = []
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return rules
+    for line in lines:
+        # Trailing spaces are ignored unless escaped with a backslash
+        if not line.endswith("\\ "):
+            line = line.rstrip()
+        if line and not line.startswith("#"):
+            rules.append(IgnoreRule(line))
+    return rules
+
+
+class DiscoveryStats:
+    """Counts the files kept and the files, bytes and directories skipped, by reason."""
+
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self.skipped_files: Counter = Counter()
+        self.skipped_bytes: Counter = Counter()
+        self.pruned_dirs: Counter = Counter()
+
+    def keep(self, size: int) -> None:
+        self.files += 1
+        self.bytes += size
+
+    def skip(self, reason: str, size: int) -> None:
+        self.skipped_files[reason] += 1
+        self.skipped_bytes[reason] += size
+
+    def prune(self, reason: str) -> None:
+        self.pruned_dirs[reason] += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "files": self.files,
+            "bytes": self.bytes,
+            "skipped_files": dict(self.skipped_files),
+            "skipped_bytes": dict(self.skipped_bytes),
+            "pruned_dirs": dict(self.pruned_dirs),
+        }
+
+    def summary(self) -> str:
+        skipped = ", ".join(
+            f"{reason}: {count} files/{self.skipped_bytes[reason]} bytes"
+            for reason, count in sorted(self.skipped_files.items())
+        )
+        pruned = ", ".join(
+            f"{reason}: {count}" for reason, count in sorted(self.pruned_dirs.items())
+        )
+        return (
+            f"kept {self.files} files ({self.bytes} bytes); "
+            f"skipped [{skipped or 'none'}]; pruned dirs [{pruned or 'none'}]"
+        )
+
+
+class FileDiscovery:
+    """
+    Walks a codebase and selects the files worth indexing.
+
+    Honors ``.gitignore`` files at every level, ``.git/info/exclude`` and the
+    project-level ``.coderagignore``, and prunes vendor, build and cache
+    directories before descending into them. Paths are matched relative to
+    the root, with ``/`` as separator.
+    """
+
+    def __init__(
+        self,
+        root_dir: str,
+        include: Sequence[str] = ("*.*",),
+        exclude: Sequence[str] = (),
+        max_file_size: Optional[int] = None,
+        use_gitignore: bool = True,
+        pruned_dirs: Sequence[str] = PRUNED_DIRS,
+    ):
+        """
+        Initializes the FileDiscovery.
+
+        Args:
+            root_dir (str): Directory to walk.
+            include (Sequence[str]): Globs a relative path must match to be kept.
+            exclude (Sequence[str]): Globs of relative paths (or directories) to skip.
+            max_file_size (Optional[int]): Files larger than this many bytes are skipped.
+            use_gitignore (bool): Whether to honor .gitignore-style files.
+            pruned_dirs (Sequence[str]): Directory names that are never descended into.
+        """
+        self.root_dir = root_dir
+        self.include = tuple(include)
+        self.exclude = tuple(exclude)
+        self.max_file_size = max_file_size
+        self.use_gitignore = use_gitignore
+        self.pruned_dirs = frozenset(pruned_dirs)
+        self.stats = DiscoveryStats()
+
+    def _root_rules(self) -> List[Tuple[str, List[IgnoreRule]]]:
+        # Lowest to highest precedence, like git: info/exclude, then .gitignore
+        paths = [
+            os.path.join(self.root_dir, ".git", "info", "exclude"),
+            os.path.join(self.root_dir, ".gitignore"),
+            os.path.join(self.root_dir, PROJECT_IGNORE_FILE),
+        ]
+        return [("", parse_ignore_file(path)) for path in paths]
+
+    @staticmethod
+    def _is_ignored(rule_sets, relative_path: str, is_dir: bool) -> bool:
+        ignored = False
+        for base, rules in rule_sets:
+            path = relative_path[len(base) + 1 :] if base else relative_path
+            for rule in rules:
+                if rule.matches(path, is_dir):
+                    ignored = not rule.negated
+        return ignored
+
+    def _dir_skip_reason(
+        self, name: str, relative_path: str, rule_sets
+    ) -> Optional[str]:
+        if name in self.pruned_dirs or any(
+            fnmatch(name, pattern) for pattern in PRUNED_DIR_GLOBS
+        ):
+            return "vendor"
+        if name.startswith("."):
+            return "hidden"
+        if self.use_gitignore and self._is_ignored(rule_sets, relative_path, True):
+            return "gitignore"
+        if any(fnmatch(relative_path, pattern) for pattern in self.exclude):
+            return "exclude"
+        return None
+
+    def _file_skip_reason(
+        self, name: str, relative_path: str, size: int, rule_sets
+    ) -> Optional[str]:
+        if name.startswith("."):
+            return "hidden"
+        if self.use_gitignore and self._is_ignored(rule_sets, relative_path, False):
+            return "gitignore"
+        if not any(fnmatch(relative_path, pattern) for pattern in self.include):
+            return "include"
+        if any(fnmatch(relative_path, pattern) for pattern in self.exclude):
+            return "exclude"
+        if self.max_file_size is not None and size > self.max_file_size:
+            return "size"
+        return None
+
+    def selects(self, path: str, is_dir: bool = False) -> bool:
+        """
+        Whether a change to ``path`` can change the result of ``discover``.
+
+        Applies the rules of ``discover`` to one path without walking the
+        tree: every parent directory must be descended into and a file must
+        be kept. The size limit is not checked, since the path may have been
+        deleted. Ignore files always count, as they change the rules.
+
+        Args:
+            path (str): A path under the root directory.
+            is_dir (bool): Whether the path is a directory.
+
+        Returns:
+            bool: Whether the path is, or may hold, a discovered file.
+        """
+        relative_path = os.path.relpath(path, self.root_dir).replace(os.sep, "/")
+        if relative_path == "." or relative_path.split("/")[0] == "..":
+            return False
+        parts = relative_path.split("/")
+        if self.use_gitignore and (
+            relative_path == ".git/info/exclude"
+            or parts[-1] in (".gitignore", PROJECT_IGNORE_FILE)
+        ):
+            return True
+
+        rule_sets = self._root_rules() if self.use_gitignore else []
+        directories = parts if is_dir else parts[:-1]
+        for depth, name in enumerate(directories):
+            relative_dir = "/".join(parts[: depth + 1])
+            if self._dir_skip_reason(name, relative_dir, rule_sets):
+                return False
+            if self.use_gitignore:
+                nested = parse_ignore_file(
+                    os.path.join(self.root_dir, relative_dir, ".gitignore")
+                )
+                if nested:
+                    rule_sets = rule_sets + [(relative_dir, nested)]
+        if is_dir:
+            return True
+        return self._file_skip_reason(parts[-1], relative_path, 0, rule_sets) is None
+
+    def discover(self) -> List[str]:
+        """
+        Walks the root directory and returns the selected files, sorted.
+
+        Statistics about what was kept and skipped are left in ``self.stats``.
+
+        Returns:
+            List[str]: Paths of the selected files.
+        """
+        self.stats = DiscoveryStats()
+        files = []
+        rule_sets_by_dir = {"": self._root_rules() if self.use_gitignore else []}
+        for dirpath, dirnames, filenames in os.walk(self.root_dir):
+            relative_dir = os.path.relpath(dirpath, self.root_dir).replace(os.sep, "/")
+            relative_dir = "" if relative_dir == "." else relative_dir
+            rule_sets = rule_sets_by_dir.pop(relative_dir)
+            if self.use_gitignore and relative_dir:
+                nested = parse_ignore_file(os.path.join(dirpath, ".gitignore"))
+                if nested:
+                    rule_sets = rule_sets + [(relative_dir, nested)]
+
+            kept_dirs = []
+            for name in sorted(dirnames):
+                relative_path = f"{relative_dir}/{name}" if relative_dir else name
+                reason = self._dir_skip_reason(name, relative_path, rule_sets)
+                if reason:
+                    self.stats.prune(reason)
+                    continue
+                kept_dirs.append(name)
+                rule_sets_by_dir[relative_path] = rule_sets
+            # Pruning in place stops os.walk from descending into skipped dirs
+            dirnames[:] = kept_dirs
+
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                relative_path = f"{relative_dir}/{name}" if relative_dir else name
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    continue
+                reason = self._file_skip_reason(name, relative_path, size, rule_sets)
+                if reason:
+                    self.stats.skip(reason, size)
+                else:
+                    self.stats.keep(size)
+                    files.append(path)
+
+        logging.info(f"Discovery of {self.root_dir}: {self.stats.summary()}")
+        return sorted(files)
+
+
+def discover_files(root_dir: str, **kwargs) -> Tuple[List[str], DiscoveryStats]:
+    """Discovers the files of ``root_dir`` and returns them with the discovery stats."""
+    discovery = FileDiscovery(root_dir, **kwargs)
+    files = discovery.discover()
+    return files, discovery.stats
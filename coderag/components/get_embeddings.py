@@ -1,4 +1,6 @@
 from langchain_community.embeddings import HuggingFaceEmbeddings
+from components.embedding_cache import CachedEmbeddings
+from components.embedding_engine import EmbeddingEngine
 import logging
 
 
@@ -7,17 +9,31 @@ class Embedding:
     A state-of-the-art class to manage HuggingFace embeddings initialization with modularity and flexibility.
     """
 
-    def __init__(self, model_name=None, **kwargs):
+    def __init__(
+        self,
+        model_name=None,
+        cache_dir=None,
+        cache_max_bytes=1 << 30,
+        cache_dtype="float16",
+        **kwargs,
+    ):
         """
         Initializes the Embedding.
 
         Parameters:
         - model_name (str): Name of the HuggingFace model for embeddings.
+        - cache_dir (str): Optional directory of a persistent embedding cache.
+        - cache_max_bytes (int): Size bound of the cached vectors.
+        - cache_dtype (str): Storage type of the cached vectors ("float16" or "float32").
         - kwargs: Additional arguments for the HuggingFaceEmbeddings.
         """
         self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_dtype = cache_dtype
         self.kwargs = kwargs
         self._embeddings = None
+        self._engine = None
         logging.info(f"EmbeddingManager initialized with model: {self.model_name}")
 
     def get_embeddings(self):
@@ -30,8 +46,11 @@ class Embedding:
         if self._embeddings is None:
             try:
                 logging.info(f"Loading embeddings for model: {self.model_name}")
-                self._embeddings = HuggingFaceEmbeddings(
-                    model_name=self.model_name, **self.kwargs
+                self._embeddings = self._with_cache(
+                    HuggingFaceEmbeddings(model_name=self.model_name, **self.kwargs),
+                    self.kwargs.get("encode_kwargs", {}).get(
+                        "normalize_embeddings", False
+                    ),
                 )
                 logging.info("Embeddings successfully loaded.")
             except Exception as e:
@@ -41,6 +60,48 @@ class Embedding:
             logging.info("Returning cached embeddings.")
         return self._embeddings
 
+    def get_embedding_engine(self, batch_size=64, num_workers=None, **kwargs):
+        """
+        Lazily loads and returns a batched, multi-process embedding engine.
+
+        Parameters:
+        - batch_size (int): Number of texts per forward pass.
+        - num_workers (int): Processes used for large inputs; defaults to the number of cores.
+        - kwargs: Additional arguments for the EmbeddingEngine.
+
+        Returns:
+        - EmbeddingEngine: The embedding engine, wrapped in CachedEmbeddings if a cache_dir is set.
+        """
+        if self._engine is None:
+            logging.info(
+                f"Loading embedding engine for model: {self.model_name} "
+                f"(batch_size={batch_size}, num_workers={num_workers})"
+            )
+            engine = EmbeddingEngine(
+                self.model_name,
+                batch_size=batch_size,
+                num_workers=num_workers,
+                **kwargs,
+            )
+            self._engine = self._with_cache(engine, engine.normalize_embeddings)
+        else:
+            logging.info("Returning cached embedding engine.")
+        return self._engine
+
+    def _with_cache(self, embeddings, normalize):
+        """Wraps embeddings in the persistent cache when a cache_dir is set."""
+        if not self.cache_dir:
+            return embeddings
+        logging.info(f"Caching embeddings in: {self.cache_dir}")
+        return CachedEmbeddings(
+            embeddings,
+            model_name=self.model_name,
+            cache_dir=self.cache_dir,
+            normalize=normalize,
+            max_bytes=self.cache_max_bytes,
+            dtype=self.cache_dtype,
+        )
+
     def reload_embeddings(self, model_name=None):
         """
         Reloads embeddings with a new model name or reinitializes with the same model.
@@ -50,4 +111,28 @@ class Embedding:
         """
         self.model_name = model_name or self.model_name
         self._embeddings = None
+        if self._engine is not None:
+            getattr(self._engine, "embeddings", self._engine).close()
+        self._engine = None
         logging.info(f"Embeddings reloaded with model: {self.model_name}")
+
+
+def describe_embeddings(embeddings):
+    """
+    Returns one status line per counter of an embedding engine, cached or not.
+
+    Parameters:
+    - embeddings: The object returned by ``Embedding.get_embedding_engine``.
+
+    Returns:
+    - list: Engine throughput, once anything was embedded, and cache hits.
+    """
+    cached = isinstance(embeddings, CachedEmbeddings)
+    engine = embeddings.embeddings if cached else embeddings
+    lines = []
+    stats = getattr(engine, "stats", None)
+    if stats is not None and stats.chunks:
+        lines.append(f"Embedding: {stats.summary()}")
+    if cached:
+        lines.append(f"Embedding cache: {embeddings.summary()}")
+    return lines
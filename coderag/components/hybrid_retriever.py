@@ -0,0 +1,252 @@
+import re
+import math
+import logging
+from collections import Counter
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+from components.metadata_filter import MetadataFilter, MetadataIndex
+from components.vector_store import search_index
+
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_CAMEL_PART = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def tokenize_code(text: str) -> List[str]:
+    """
+    Splits text into code-aware search terms.
+
+    Every identifier is kept whole (``parse_ignore_file``) and, when it is a
+    compound, also split into its snake_case and camelCase parts (``parse``,
+    ``ignore``, ``file``), so both exact and partial names match. Terms are
+    lowercased.
+
+    Args:
+        text (str): Code or a natural-language query.
+
+    Returns:
+        List[str]: The terms, in order, with repetitions.
+    """
+    tokens = []
+    for word in _WORD.findall(text):
+        tokens.append(word.lower())
+        parts = [
+            part.lower()
+            for piece in word.split("_")
+            for part in _CAMEL_PART.findall(piece)
+        ]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    """
+    A compact in-memory BM25 inverted index.
+
+    Postings are stored per term as two numpy arrays (document numbers and
+    term frequencies), so scoring a query touches only the documents that
+    contain its terms.
+    """
+
+    def __init__(self, texts: Sequence[str], k1: float = 1.2, b: float = 0.75):
+        """
+        Builds the index.
+
+        Args:
+            texts (Sequence[str]): The documents, addressed by their position.
+            k1 (float): Term frequency saturation.
+            b (float): Document length normalization.
+        """
+        self.k1 = k1
+        self.b = b
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = []
+        for doc, text in enumerate(texts):
+            counts = Counter(tokenize_code(text))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc, tf))
+        self.doc_lengths = np.asarray(lengths, dtype=np.float32)
+        self.avg_length = float(self.doc_lengths.mean()) if lengths else 0.0
+        self.postings = {
+            term: (
+                np.asarray([doc for doc, _ in pairs], dtype=np.int32),
+                np.asarray([tf for _, tf in pairs], dtype=np.float32),
+            )
+            for term, pairs in postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def search(
+        self, query: str, k: int = 10, mask: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Returns the best matching documents of a query.
+
+        Args:
+            query (str): The query.
+            k (int): Number of results.
+            mask (Optional[np.ndarray]): Boolean array of the documents to consider.
+
+        Returns:
+            List[Tuple[int, float]]: (document number, score), best first.
+        """
+        scores = np.zeros(len(self), dtype=np.float32)
+        n = len(self)
+        for term in set(tokenize_code(query)):
+            if term not in self.postings:
+                continue
+            docs, tfs = self.postings[term]
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (
+                1 - self.b + self.b * self.doc_lengths[docs] / (self.avg_length or 1)
+            )
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        if mask is not None:
+            scores[~mask] = 0
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        top = matched[np.argsort(-scores[matched], kind="stable")[:k]]
+        return [(int(doc), float(scores[doc])) for doc in top]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Hashable]], rrf_k: int = 60
+) -> List[Tuple[Hashable, float]]:
+    """
+    Fuses ranked lists of keys with reciprocal rank fusion.
+
+    Args:
+        rankings (Sequence[Sequence[Hashable]]): Lists of keys, best first.
+        rrf_k (int): Damping constant; larger values flatten the rank weights.
+
+    Returns:
+        List[Tuple[Hashable, float]]: Keys with their fused scores, best first.
+    """
+    scores: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retrieves from a FAISS store and a BM25 index over the same chunks.
+
+    Dense search finds chunks by meaning, BM25 over code-aware tokens finds
+    exact identifiers and error strings; the two rankings are fused with
+    reciprocal rank fusion so a low ``k`` still holds both kinds of match.
+    Both searches are restricted to the chunks matching ``metadata_filter``.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vector_store: FAISS
+    bm25: BM25Index
+    # Docstore IDs by index position
+    doc_ids: List[Any]
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+    metadata_index: Optional[MetadataIndex] = None
+    metadata_filter: Optional[MetadataFilter] = None
+
+    @classmethod
+    def from_vector_store(cls, vector_store: FAISS, **kwargs) -> "HybridRetriever":
+        """
+        Builds the BM25 index over the documents of a FAISS store.
+
+        Args:
+            vector_store (FAISS): The store to search and index.
+            **kwargs: ``k``, ``fetch_k``, ``rrf_k`` and ``metadata_filter``.
+
+        Returns:
+            HybridRetriever: The retriever.
+        """
+        doc_ids = [
+            vector_store.index_to_docstore_id[i]
+            for i in range(vector_store.index.ntotal)
+        ]
+        documents = [vector_store.docstore.search(doc_id) for doc_id in doc_ids]
+        bm25 = BM25Index([document.page_content for document in documents])
+        metadata_index = MetadataIndex([document.metadata for document in documents])
+        logging.info(f"Built BM25 index over {len(bm25)} chunks")
+        return cls(
+            vector_store=vector_store,
+            bm25=bm25,
+            doc_ids=doc_ids,
+            metadata_index=metadata_index,
+            **kwargs,
+        )
+
+    def filtered(self, metadata_filter: Optional[MetadataFilter]) -> "HybridRetriever":
+        """Returns a copy sharing the indexes of this retriever, with another filter."""
+        return self.model_copy(update={"metadata_filter": metadata_filter})
+
+    def rankings(
+        self, query: str, embedding: Optional[List[float]] = None
+    ) -> Tuple[List[Tuple[Any, float]], List[Tuple[Any, float]]]:
+        """
+        Returns the dense and BM25 candidates of a query, before fusion.
+
+        Args:
+            query (str): The query.
+            embedding (Optional[List[float]]): The query embedding, if known.
+
+        Returns:
+            Tuple[List[Tuple[Any, float]], List[Tuple[Any, float]]]: Up to
+            ``fetch_k`` (docstore ID, L2 distance) pairs, nearest first, and
+            up to ``fetch_k`` (docstore ID, BM25 score) pairs, best first.
+        """
+        mask = None
+        if self.metadata_index is not None:
+            mask = self.metadata_index.mask(self.metadata_filter)
+        if embedding is None:
+            embedding = self.vector_store.embedding_function.embed_query(query)
+        distances, positions = search_index(
+            self.vector_store.index,
+            np.asarray([embedding], dtype=np.float32),
+            self.fetch_k,
+            mask,
+        )
+        dense = [
+            (self.doc_ids[i], float(distance))
+            for i, distance in zip(positions[0], distances[0])
+            if i >= 0
+        ]
+        sparse = [
+            (self.doc_ids[i], score)
+            for i, score in self.bm25.search(query, self.fetch_k, mask)
+        ]
+        return dense, sparse
+
+    def get_document(self, doc_id: Any, **metadata) -> Document:
+        """Returns a stored chunk as a new document with extra metadata."""
+        document = self.vector_store.docstore.search(doc_id)
+        return Document(
+            id=document.id,
+            page_content=document.page_content,
+            metadata=dict(document.metadata, **metadata),
+        )
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        dense, sparse = self.rankings(query)
+        fused = reciprocal_rank_fusion(
+            [[doc_id for doc_id, _ in dense], [doc_id for doc_id, _ in sparse]],
+            self.rrf_k,
+        )
+        return [
+            self.get_document(doc_id, rrf_score=score)
+            for doc_id, score in fused[: self.k]
+        ]
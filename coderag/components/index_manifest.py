@@ -0,0 +1,176 @@
+import os
+import json
+import hashlib
+import logging
+from typing import Dict, List, Optional
+
+
+class FileChanges:
+    """The files that differ between a manifest and the codebase on disk."""
+
+    def __init__(
+        self,
+        added: Optional[List[str]] = None,
+        changed: Optional[List[str]] = None,
+        deleted: Optional[List[str]] = None,
+    ):
+        """
+        Initializes FileChanges.
+
+        Args:
+            added (List[str]): Relative paths of new files.
+            changed (List[str]): Relative paths of files whose content changed.
+            deleted (List[str]): Relative paths of files that no longer exist.
+        """
+        self.added = added or []
+        self.changed = changed or []
+        self.deleted = deleted or []
+
+    @property
+    def to_index(self) -> List[str]:
+        """Files that have to be (re-)chunked and (re-)embedded."""
+        return self.added + self.changed
+
+    @property
+    def to_remove(self) -> List[str]:
+        """Files whose existing vectors have to be removed."""
+        return self.changed + self.deleted
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.deleted)
+
+    def __repr__(self) -> str:
+        return (
+            f"FileChanges(added={len(self.added)}, changed={len(self.changed)}, "
+            f"deleted={len(self.deleted)})"
+        )
+
+
+def hash_file(path: str, block_size: int = 1 << 20) -> str:
+    """Returns the sha256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IndexManifest:
+    """
+    Tracks, per source file, its mtime, size and content hash together with
+    the vector IDs of its chunks, so re-indexing only touches files that
+    actually changed.
+    """
+
+    def __init__(
+        self,
+        root_dir: str,
+        files: Optional[Dict[str, Dict]] = None,
+        metadata: Optional[Dict] = None,
+    ):
+        """
+        Initializes the IndexManifest.
+
+        Args:
+            root_dir (str): Directory the relative paths are resolved against.
+            files (Dict[str, Dict]): Existing entries keyed by relative path.
+            metadata (Dict): Free-form fields saved alongside the entries.
+        """
+        self.root_dir = root_dir
+        self.files: Dict[str, Dict] = files or {}
+        self.metadata: Dict = metadata or {}
+        # Content hashes computed by the last scan, consumed by ``record``
+        self._pending_hashes: Dict[str, str] = {}
+
+    @classmethod
+    def load(cls, path: str, root_dir: str) -> "IndexManifest":
+        """Loads a manifest from ``path``, or returns an empty one if missing."""
+        if not os.path.exists(path):
+            return cls(root_dir)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(root_dir, files=data.pop("files", {}), metadata=data)
+
+    def save(self, path: str) -> None:
+        """Writes the manifest and its metadata to ``path`` as JSON."""
+        data = dict(self.metadata, files=self.files)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def scan(self, paths: List[str]) -> FileChanges:
+        """
+        Compares the given files with the manifest.
+
+        Files whose mtime and size are unchanged are skipped without being
+        read. Otherwise the content hash decides: a touched but identical file
+        only gets its stat data refreshed.
+
+        Args:
+            paths (List[str]): Absolute or root-relative paths of the current files.
+
+        Returns:
+            FileChanges: The added, changed and deleted relative paths.
+        """
+        changes = FileChanges()
+        seen = set()
+        for path in paths:
+            full_path = os.path.join(self.root_dir, path)
+            relative_path = os.path.relpath(full_path, self.root_dir)
+            seen.add(relative_path)
+            stat = os.stat(full_path)
+            entry = self.files.get(relative_path)
+            if (
+                entry
+                and entry["mtime_ns"] == stat.st_mtime_ns
+                and entry["size"] == stat.st_size
+            ):
+                continue
+
+            content_hash = hash_file(full_path)
+            if entry and entry["sha256"] == content_hash:
+                entry["mtime_ns"] = stat.st_mtime_ns
+                entry["size"] = stat.st_size
+                continue
+
+            self._pending_hashes[relative_path] = content_hash
+            if entry:
+                changes.changed.append(relative_path)
+            else:
+                changes.added.append(relative_path)
+
+        changes.deleted = sorted(set(self.files) - seen)
+        logging.info(f"Manifest scan of {len(paths)} files: {changes}")
+        return changes
+
+    def ids_for(self, relative_paths: List[str]) -> List[str]:
+        """Returns the vector IDs recorded for the given files."""
+        ids = []
+        for relative_path in relative_paths:
+            ids.extend(self.files.get(relative_path, {}).get("ids", []))
+        return ids
+
+    def record(self, relative_path: str, ids: List[str]) -> None:
+        """Records the current state of a file and the IDs of its chunks."""
+        full_path = os.path.join(self.root_dir, relative_path)
+        stat = os.stat(full_path)
+        content_hash = self._pending_hashes.pop(relative_path, None) or hash_file(
+            full_path
+        )
+        self.files[relative_path] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": content_hash,
+            "ids": list(ids),
+        }
+
+    def forget(self, relative_path: str) -> None:
+        """Removes a file from the manifest."""
+        self.files.pop(relative_path, None)
+        self._pending_hashes.pop(relative_path, None)
+
+    @staticmethod
+    def chunk_ids(relative_path: str, count: int) -> List[str]:
+        """Returns deterministic vector IDs for the chunks of a file."""
+        return [f"{relative_path}::{i}" for i in range(count)]
@@ -0,0 +1,204 @@
+import time
+import logging
+import threading
+from typing import Callable, List, Optional, Tuple, Union
+from langchain_community.vectorstores import FAISS
+from components.file_discovery import FileDiscovery
+from components.load_document import IndexManager
+from components.sharded_store import ShardedIndexManager, ShardedVectorStore
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # Optional: without watchdog the codebase is polled
+    FileSystemEventHandler = object
+    Observer = None
+
+
+class _EventHandler(FileSystemEventHandler):
+    """
+    Forwards the file system events of a codebase that concern indexed files.
+
+    Events in pruned, hidden or ignored directories (``.git``, virtual
+    environments, build output, ...) and on files the discovery rules skip
+    are dropped, so they do not trigger an update.
+    """
+
+    def __init__(self, notify: Callable[[], None], discoveries: List[FileDiscovery]):
+        super().__init__()
+        self.notify = notify
+        self.discoveries = discoveries
+
+    def on_any_event(self, event):
+        # Only a moved or deleted directory can change files without file events
+        if event.is_directory and event.event_type not in ("moved", "deleted"):
+            return
+        paths = [event.src_path, getattr(event, "dest_path", "")]
+        if any(
+            discovery.selects(path, event.is_directory)
+            for path in paths
+            if path
+            for discovery in self.discoveries
+        ):
+            self.notify()
+
+
+class IndexWatcher:
+    """
+    Keeps the index of a codebase up to date while files change.
+
+    File events come from watchdog (inotify, FSEvents, ...) when it is
+    installed, otherwise from polling the index key, which only stats the
+    files. Bursts of events, such as a save that touches several files or a
+    branch switch, are debounced into a single incremental update by the
+    ``IndexManager``. Updates are copy-on-write: the new vector store is
+    published with one reference swap, so queries in flight keep using the
+    snapshot they started with.
+    """
+
+    def __init__(
+        self,
+        index_manager: Union[IndexManager, ShardedIndexManager],
+        poll_interval: float = 1.0,
+        debounce: float = 0.5,
+        use_watchdog: bool = True,
+    ):
+        """
+        Initializes the IndexWatcher.
+
+        Args:
+            index_manager (IndexManager): Builds and updates the index; a
+                ``ShardedIndexManager`` updates only the shards that changed.
+            poll_interval (float): Seconds between checks for pending changes.
+            debounce (float): Seconds without events before the index is updated.
+            use_watchdog (bool): Use file system events when watchdog is installed.
+        """
+        self.index_manager = index_manager
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.use_watchdog = use_watchdog and Observer is not None
+        self.updates = 0
+        self.last_update_seconds = 0.0
+        self._snapshot: Optional[Tuple[str, FAISS]] = None
+        self._listeners: List[Callable[[str, FAISS], None]] = []
+        self._pending = False
+        self._last_event = 0.0
+        self._polled_key: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._observer = None
+
+    def snapshot(self) -> Tuple[str, FAISS]:
+        """Returns the index key and vector store of the latest index version."""
+        if self._snapshot is None:
+            raise RuntimeError("IndexWatcher has not been started.")
+        return self._snapshot
+
+    def add_listener(self, listener: Callable[[str, FAISS], None]) -> None:
+        """Calls ``listener(index_key, vector_store)`` after every update."""
+        self._listeners.append(listener)
+
+    def start(self) -> "IndexWatcher":
+        """Indexes the codebase, then watches it in a background thread."""
+        self.refresh()
+        # A sharded manager may index several repositories
+        root_dirs = getattr(
+            self.index_manager, "root_dirs", [self.index_manager.root_dir]
+        )
+        if self.use_watchdog:
+            handler = _EventHandler(self.notify, self._discoveries())
+            self._observer = Observer()
+            for root_dir in root_dirs:
+                self._observer.schedule(handler, root_dir, recursive=True)
+            self._observer.start()
+        self._thread = threading.Thread(
+            target=self._run, name="index-watcher", daemon=True
+        )
+        self._thread.start()
+        logging.info(
+            f"Watching {', '.join(root_dirs)} "
+            f"({'file events' if self.use_watchdog else 'polling'})"
+        )
+        return self
+
+    def _discoveries(self) -> List[FileDiscovery]:
+        # One per shard of a sharded manager, with that shard's rules
+        managers = getattr(self.index_manager, "managers", None)
+        managers = managers.values() if managers else [self.index_manager]
+        return [
+            FileDiscovery(
+                manager.root_dir, include=manager.include, exclude=manager.exclude
+            )
+            for manager in managers
+        ]
+
+    def stop(self) -> None:
+        """Stops watching; the latest snapshot stays available."""
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def notify(self) -> None:
+        """Records a change; the update runs once events have settled."""
+        with self._lock:
+            self._pending = True
+            self._last_event = time.monotonic()
+
+    def refresh(self) -> bool:
+        """
+        Brings the index up to date with the codebase now.
+
+        Returns:
+            bool: Whether a new index version was published.
+        """
+        start = time.perf_counter()
+        vector_store = self.index_manager.get_vector_store()
+        key = self.index_manager.index_key
+        self._polled_key = key
+        if self._snapshot is not None and self._snapshot[0] == key:
+            return False
+        # Readers take either the old or the new tuple, never a mix
+        self._snapshot = (key, vector_store)
+        self.updates += 1
+        self.last_update_seconds = time.perf_counter() - start
+        if isinstance(vector_store, ShardedVectorStore):
+            chunks = vector_store.ntotal
+        else:
+            chunks = vector_store.index.ntotal
+        logging.info(
+            f"Index {key[:12]} published in {self.last_update_seconds:.2f}s "
+            f"({chunks} chunks)"
+        )
+        for listener in self._listeners:
+            listener(key, vector_store)
+        return True
+
+    def _poll(self) -> None:
+        key = self.index_manager.compute_key()
+        if key != self._polled_key:
+            self._polled_key = key
+            self.notify()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                if not self.use_watchdog:
+                    self._poll()
+                with self._lock:
+                    due = (
+                        self._pending
+                        and time.monotonic() - self._last_event >= self.debounce
+                    )
+                    if due:
+                        self._pending = False
+                if due:
+                    self.refresh()
+            except Exception:
+                # A file may vanish mid-update; the next event retries
+                logging.exception("Index update failed")
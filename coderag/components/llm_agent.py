@@ -1,43 +1,94 @@
-from langchain_community.llms import HuggingFaceHub
+from typing import Iterator, Optional
+from langchain_huggingface import HuggingFaceEndpoint
 from langchain.chains import RetrievalQA
+from langchain_core.prompts import format_document
+from components.llm_backend import LOCAL_BACKENDS, get_local_llm
+from components.model_registry import get_model_registry
+from components.query_cache import answer_scope, query_key
 import logging
 
 
 class QAChain:
     """
     A state-of-the-art manager for setting up Retrieval-based QA systems
-    using HuggingFaceHub LLMs and retrievers.
+    using HuggingFace Inference endpoint or local LLMs and retrievers.
     """
 
-    def __init__(self, repo_id: str, temperature: float = 0.5, max_length: int = 500):
+    def __init__(
+        self,
+        repo_id: str,
+        temperature: float = 0.5,
+        max_length: int = 500,
+        backend: str = "endpoint",
+        model_path: Optional[str] = None,
+        max_batch_size: int = 8,
+        batch_wait: float = 0.02,
+    ):
         """
-        Initializes the QAChainManager with an LLM from HuggingFaceHub.
+        Initializes the QAChainManager with an LLM from a HuggingFace endpoint
+        or a local backend.
 
         Parameters:
         - repo_id (str): The HuggingFace repository ID for the model.
         - temperature (float): The sampling temperature for the model.
         - max_length (int): Maximum token length for the model output.
+        - backend (str): ``"endpoint"`` for the HuggingFace Inference API, or one
+          of ``LOCAL_BACKENDS`` to run the model in-process.
+        - model_path (str): GGUF file or model directory of a local backend.
+        - max_batch_size (int): Maximum number of concurrent prompts per batch.
+        - batch_wait (float): Seconds a local backend waits for a batch to fill up.
         """
+        if backend != "endpoint" and backend not in LOCAL_BACKENDS:
+            raise ValueError(f"Unknown LLM backend: {backend}")
         self.repo_id = repo_id
         self.temperature = temperature
         self.max_length = max_length
+        self.backend = backend
+        self.model_path = model_path
+        self.max_batch_size = max_batch_size
+        self.batch_wait = batch_wait
         self.llm = None
         self.qa_chain = None
         logging.info(
-            f"QAChain initialized with model: {repo_id}, "
+            f"QAChain initialized with model: {self.model_name}, "
             f"temperature: {temperature}, max_length: {max_length}"
         )
 
+    @property
+    def model_name(self) -> str:
+        """Names the model that answers, for logs and cache keys."""
+        if self.backend == "endpoint":
+            return self.repo_id
+        return f"{self.backend}:{self.model_path}"
+
     def initialize_llm(self):
-        """Initializes the HuggingFaceHub LLM."""
+        """
+        Initializes the LLM, which supports token streaming.
+
+        LLMs are shared: every chain with the same settings uses one client
+        from the model registry, and the concurrent prompts of a local
+        backend are batched.
+        """
         try:
-            logging.info("Initializing LLM from HuggingFaceHub...")
-            self.llm = HuggingFaceHub(
-                repo_id=self.repo_id,
-                model_kwargs={
-                    "temperature": self.temperature,
-                    "max_length": self.max_length,
-                },
+            if self.backend != "endpoint":
+                logging.info(f"Initializing local LLM: {self.model_name}")
+                self.llm = get_local_llm(
+                    self.backend,
+                    self.model_path,
+                    self.temperature,
+                    self.max_length,
+                    max_batch_size=self.max_batch_size,
+                    max_wait=self.batch_wait,
+                )
+                return self.llm
+            logging.info("Initializing LLM from HuggingFace endpoint...")
+            self.llm = get_model_registry().get(
+                ("endpoint", self.repo_id, self.temperature, self.max_length),
+                lambda: HuggingFaceEndpoint(
+                    repo_id=self.repo_id,
+                    temperature=self.temperature,
+                    max_new_tokens=self.max_length,
+                ),
             )
             logging.info("LLM successfully initialized.")
             return self.llm
@@ -70,4 +121,59 @@ class QAChain:
 
         return self.qa_chain
 
+    def stream(self, query: str) -> Iterator[str]:
+        """
+        Answers a query like the QA chain, yielding tokens as they are generated.
+
+        The documents are retrieved and stuffed into the chain's own prompt,
+        which is then streamed from the LLM, so the answer matches ``run``.
+
+        Parameters:
+        - query (str): The question.
+
+        Yields:
+        - str: Chunks of the answer.
+        """
+        if not self.qa_chain:
+            logging.error("QA chain is not set up. Please call get_qa_chain() first.")
+            raise ValueError("QA chain is not set up.")
+        combine_chain = self.qa_chain.combine_documents_chain
+        docs = self.qa_chain.retriever.invoke(query)
+        context = combine_chain.document_separator.join(
+            format_document(doc, combine_chain.document_prompt) for doc in docs
+        )
+        prompt = combine_chain.llm_chain.prompt.format(
+            **{combine_chain.document_variable_name: context, "question": query}
+        )
+        yield from self.llm.stream(prompt)
+
+    def cache_key(self, query: str, index_key: str) -> str:
+        """
+        Returns the query cache key of a question answered by this chain.
+
+        Parameters:
+        - query (str): The question.
+        - index_key (str): Version of the index the retriever searches.
+
+        Returns:
+        - str: A key covering the query, the index and the model settings.
+        """
+        return query_key(
+            query, index_key, self.model_name, self.temperature, self.max_length
+        )
+
+    def cache_scope(self, index_key: str) -> str:
+        """
+        Returns the semantic cache scope of answers given by this chain.
+
+        Parameters:
+        - index_key (str): Version of the index the retriever searches.
+
+        Returns:
+        - str: A key covering the index and the model settings.
+        """
+        return answer_scope(
+            index_key, self.model_name, self.temperature, self.max_length
+        )
+
     
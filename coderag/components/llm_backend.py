@@ -0,0 +1,665 @@
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from langchain_community.llms.utils import enforce_stop_tokens
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import Generation, GenerationChunk, LLMResult
+from pydantic import ConfigDict
+
+try:
+    from llama_cpp import Llama
+except ImportError:  # Optional: only needed by the llamacpp backend
+    Llama = None
+
+try:
+    from transformers import (
+        AutoModelForCausalLM,
+        AutoTokenizer,
+        StoppingCriteria,
+        StoppingCriteriaList,
+    )
+except ImportError:  # Optional: only needed by the transformers backend
+    AutoModelForCausalLM = AutoTokenizer = StoppingCriteriaList = None
+    StoppingCriteria = object
+
+# Local backends; "endpoint" (the HuggingFace Inference API) is remote.
+LOCAL_BACKENDS = ("llamacpp", "transformers", "stub")
+
+
+class LLMBackend:
+    """
+    A model that completes prompts in-process.
+
+    ``generate`` completes a batch of prompts in one call and
+    ``generate_stream`` yields the text of a batch as it is generated;
+    backends that cannot batch complete the prompts one after the other.
+    The model is loaded on first use. A backend is not thread-safe: its
+    ``RequestBatcher`` is the only caller.
+    """
+
+    name = "backend"
+
+    def __init__(self, model_path: str, temperature: float, max_new_tokens: int):
+        self.model_path = model_path
+        self.temperature = temperature
+        self.max_new_tokens = max_new_tokens
+        self._model = None
+
+    def check(self) -> None:
+        """Raises if the model cannot be loaded, before any request needs it."""
+
+    def load(self):
+        raise NotImplementedError
+
+    @property
+    def model(self):
+        if self._model is None:
+            logging.info(f"Loading {self.name} model: {self.model_path}")
+            self._model = self.load()
+        return self._model
+
+    def warm_up(self) -> None:
+        """Loads the model, so the first request does not pay for it."""
+        self.model
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        raise NotImplementedError
+
+    def generate_stream(self, prompts: List[str]) -> Iterator[Tuple[int, str]]:
+        """Yields (prompt number, text) pieces; whole completions unless overridden."""
+        yield from enumerate(self.generate(prompts))
+
+
+class LlamaCppBackend(LLMBackend):
+    """A GGUF model run on the CPU by llama.cpp."""
+
+    name = "llamacpp"
+
+    def __init__(
+        self,
+        model_path: str,
+        temperature: float,
+        max_new_tokens: int,
+        n_ctx: int = 4096,
+        n_threads: Optional[int] = None,
+    ):
+        super().__init__(model_path, temperature, max_new_tokens)
+        self.n_ctx = n_ctx
+        self.n_threads = n_threads
+
+    def check(self) -> None:
+        if Llama is None:
+            raise ImportError(
+                "The llamacpp backend needs llama-cpp-python: "
+                "pip install llama-cpp-python"
+            )
+        if not os.path.isfile(self.model_path):
+            raise FileNotFoundError(
+                f"GGUF model not found: {self.model_path}. Download one to this "
+                f'path or set "llm_backend" to "endpoint".'
+            )
+
+    def load(self):
+        return Llama(
+            model_path=self.model_path,
+            n_ctx=self.n_ctx,
+            n_threads=self.n_threads,
+            verbose=False,
+        )
+
+    def _complete(self, prompt: str, stream: bool):
+        return self.model.create_completion(
+            prompt,
+            max_tokens=self.max_new_tokens,
+            temperature=self.temperature,
+            stream=stream,
+        )
+
+    def warm_up(self) -> None:
+        # The weights are memory-mapped; one token pages them in
+        self.model.create_completion(" ", max_tokens=1)
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        # One llama.cpp context decodes one sequence; the batch runs in turn
+        return [
+            self._complete(prompt, stream=False)["choices"][0]["text"]
+            for prompt in prompts
+        ]
+
+    def generate_stream(self, prompts: List[str]) -> Iterator[Tuple[int, str]]:
+        for i, prompt in enumerate(prompts):
+            for chunk in self._complete(prompt, stream=True):
+                yield i, chunk["choices"][0]["text"]
+
+
+class _BatchStreamer:
+    """
+    Receives the tokens of every generation step of a batch from
+    ``generate`` and queues the new text of each row.
+    """
+
+    def __init__(self, tokenizer, rows: int):
+        self.tokenizer = tokenizer
+        self.ids: List[List[int]] = [[] for _ in range(rows)]
+        self.texts = [""] * rows
+        self.events: queue.Queue = queue.Queue()
+        self._prompt = True
+        self._ended = False
+
+    def _emit(self, row: int, final: bool = False) -> None:
+        text = self.tokenizer.decode(self.ids[row], skip_special_tokens=True)
+        # An incomplete multi-byte character waits for its next token
+        if len(text) > len(self.texts[row]) and (final or not text.endswith("�")):
+            self.events.put((row, text[len(self.texts[row]) :]))
+            self.texts[row] = text
+
+    def put(self, value) -> None:
+        if self._prompt:
+            # generate passes the prompt ids first
+            self._prompt = False
+            return
+        for row, token in enumerate(value.tolist()):
+            self.ids[row].append(token)
+            self._emit(row)
+
+    def end(self) -> None:
+        if self._ended:
+            return
+        self._ended = True
+        for row in range(len(self.ids)):
+            self._emit(row, final=True)
+        self.events.put(None)
+
+
+class _Cancelled(StoppingCriteria):
+    """Stops ``generate`` after the current step once ``event`` is set."""
+
+    def __init__(self, event: threading.Event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.event.is_set()
+
+
+class TransformersBackend(LLMBackend):
+    """A causal language model loaded by transformers from a local path."""
+
+    name = "transformers"
+
+    def check(self) -> None:
+        if AutoModelForCausalLM is None:
+            raise ImportError(
+                "The transformers backend needs transformers and torch: "
+                "pip install transformers torch"
+            )
+        if not os.path.isdir(self.model_path):
+            raise FileNotFoundError(
+                f"Model directory not found: {self.model_path}. Save a model to "
+                f'this path or set "llm_backend" to "endpoint".'
+            )
+
+    def load(self):
+        # Prompts of a batch are padded on the left, so they all end together
+        self.tokenizer = AutoTokenizer.from_pretrained(
+            self.model_path, local_files_only=True, padding_side="left"
+        )
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        model = AutoModelForCausalLM.from_pretrained(
+            self.model_path, local_files_only=True
+        )
+        model.eval()
+        return model
+
+    def _generate(self, inputs, streamer=None, cancel=None):
+        import torch
+
+        sampling = (
+            {"do_sample": True, "temperature": self.temperature}
+            if self.temperature > 0
+            else {"do_sample": False}
+        )
+        with torch.inference_mode():
+            return self.model.generate(
+                **inputs,
+                max_new_tokens=self.max_new_tokens,
+                pad_token_id=self.tokenizer.pad_token_id,
+                streamer=streamer,
+                stopping_criteria=(
+                    StoppingCriteriaList([_Cancelled(cancel)]) if cancel else None
+                ),
+                **sampling,
+            )
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        self.model
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True)
+        output = self._generate(inputs)
+        new_tokens = output[:, inputs["input_ids"].shape[1] :]
+        return self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+
+    def generate_stream(self, prompts: List[str]) -> Iterator[Tuple[int, str]]:
+        self.model
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True)
+        streamer = _BatchStreamer(self.tokenizer, len(prompts))
+        cancel = threading.Event()
+        errors = []
+
+        def run():
+            try:
+                self._generate(inputs, streamer, cancel)
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                streamer.end()
+
+        thread = threading.Thread(target=run, name="llm-generate", daemon=True)
+        thread.start()
+        try:
+            while True:
+                event = streamer.events.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            # Closing the stream stops generate at its next step; the model
+            # is free again once it has returned
+            cancel.set()
+            thread.join()
+        if errors:
+            raise errors[0]
+
+
+class StubBackend(LLMBackend):
+    """
+    Answers without a model, for tests and offline development.
+
+    Completions cycle through ``responses``; without responses each prompt
+    is answered with a fixed text naming its length. Streams yield one word
+    at a time. ``batches`` records the size of every batch.
+    """
+
+    name = "stub"
+
+    def __init__(
+        self,
+        model_path: str = "stub",
+        temperature: float = 0.0,
+        max_new_tokens: int = 500,
+        responses: Optional[List[str]] = None,
+        latency: float = 0.0,
+    ):
+        super().__init__(model_path, temperature, max_new_tokens)
+        self.responses = responses
+        self.latency = latency
+        self.batches: List[int] = []
+        self._calls = 0
+
+    def load(self):
+        return self
+
+    def generate(self, prompts: List[str]) -> List[str]:
+        self.batches.append(len(prompts))
+        # One forward pass per batch, whatever its size
+        time.sleep(self.latency)
+        completions = []
+        for prompt in prompts:
+            if self.responses:
+                completions.append(self.responses[self._calls % len(self.responses)])
+            else:
+                completions.append(f"Stub answer to a {len(prompt)} char prompt.")
+            self._calls += 1
+        return completions
+
+    def generate_stream(self, prompts: List[str]) -> Iterator[Tuple[int, str]]:
+        words = [completion.split(" ") for completion in self.generate(prompts)]
+        for step in range(max(len(w) for w in words)):
+            for i, completion in enumerate(words):
+                if step < len(completion):
+                    yield i, completion[step] if step == 0 else f" {completion[step]}"
+
+
+def create_backend(
+    name: str, model_path: str, temperature: float, max_new_tokens: int
+) -> LLMBackend:
+    """
+    Creates a local backend by name.
+
+    Args:
+        name (str): One of ``LOCAL_BACKENDS``.
+        model_path (str): GGUF file (llamacpp) or model directory (transformers).
+        temperature (float): The sampling temperature; 0 decodes greedily.
+        max_new_tokens (int): Maximum number of generated tokens.
+
+    Returns:
+        LLMBackend: The backend; its model is loaded on first use.
+
+    Raises:
+        ValueError: If the backend is unknown.
+        ImportError: If the backend's inference library is not installed.
+        FileNotFoundError: If the model is missing.
+    """
+    backends = {
+        "llamacpp": LlamaCppBackend,
+        "transformers": TransformersBackend,
+        "stub": StubBackend,
+    }
+    if name not in backends:
+        raise ValueError(
+            f"Unknown LLM backend {name!r}, expected one of {LOCAL_BACKENDS}."
+        )
+    backend = backends[name](model_path, temperature, max_new_tokens)
+    backend.check()
+    return backend
+
+
+class BatchStats:
+    """Counters of a RequestBatcher."""
+
+    def __init__(self):
+        self.requests = 0
+        self.batches = 0
+        self.seconds = 0.0
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.requests / self.batches if self.batches else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.requests} prompts in {self.batches} batches "
+            f"(mean {self.mean_batch_size:.1f}), {self.seconds:.1f}s generating"
+        )
+
+
+class _Request:
+    """A queued prompt; streamed requests also receive their text piece by piece."""
+
+    def __init__(self, prompt: Optional[str], stream: bool = False):
+        # None asks the worker to warm up the backend
+        self.prompt = prompt
+        self.future: Future = Future()
+        # Pieces of text, then None at the end or the exception of the batch
+        self.pieces: Optional[queue.Queue] = queue.Queue() if stream else None
+        self.cancelled = threading.Event()
+
+
+class RequestBatcher:
+    """
+    Micro-batches concurrent prompts for one backend.
+
+    Prompts are queued and completed by a single worker thread, the only
+    thread that runs the model. Once a prompt arrives the worker waits up
+    to ``max_wait`` seconds for more, up to ``max_batch_size``, and
+    completes them together, so concurrent sessions share forward passes
+    instead of contending for the model. A prompt that arrives alone pays
+    at most ``max_wait`` extra. Streamed prompts are batched the same way
+    and receive their text as the batch generates it; a batch whose
+    streams have all been abandoned stops early.
+    """
+
+    def __init__(
+        self, backend: LLMBackend, max_batch_size: int = 8, max_wait: float = 0.02
+    ):
+        """
+        Initializes the RequestBatcher.
+
+        Args:
+            backend (LLMBackend): Completes the batches.
+            max_batch_size (int): Maximum number of prompts per batch.
+            max_wait (float): Seconds to wait for a batch to fill up.
+        """
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats = BatchStats()
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name=f"llm-{backend.name}", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, prompt: str) -> Future:
+        """Queues a prompt; the future resolves to its completion."""
+        request = _Request(prompt)
+        self._queue.put(request)
+        return request.future
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Queues a prompt and yields its completion as it is generated."""
+        request = _Request(prompt, stream=True)
+        self._queue.put(request)
+        try:
+            while True:
+                piece = request.pieces.get()
+                if piece is None:
+                    return
+                if isinstance(piece, BaseException):
+                    raise piece
+                yield piece
+        finally:
+            # Lets the worker skip the rest of an abandoned stream
+            request.cancelled.set()
+
+    def warm_up(self) -> None:
+        """Loads the model on the worker thread and waits for it."""
+        request = _Request(None)
+        self._queue.put(request)
+        request.future.result()
+
+    def _next_batch(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _complete(self, batch: List[_Request]) -> List[str]:
+        prompts = [request.prompt for request in batch]
+        if not any(request.pieces for request in batch):
+            return self.backend.generate(prompts)
+        texts = [""] * len(batch)
+        pieces = self.backend.generate_stream(prompts)
+        try:
+            for i, piece in pieces:
+                texts[i] += piece
+                if batch[i].pieces is not None:
+                    batch[i].pieces.put(piece)
+                if all(request.cancelled.is_set() for request in batch):
+                    break
+        finally:
+            pieces.close()
+        return texts
+
+    def _run(self) -> None:
+        while True:
+            batch = []
+            for request in self._next_batch():
+                if request.prompt is not None:
+                    batch.append(request)
+                    continue
+                try:
+                    self.backend.warm_up()
+                    request.future.set_result(None)
+                except Exception as e:
+                    request.future.set_exception(e)
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                completions = self._complete(batch)
+            except Exception as e:
+                logging.exception(f"Batch of {len(batch)} prompts failed")
+                for request in batch:
+                    request.future.set_exception(e)
+                    if request.pieces is not None:
+                        request.pieces.put(e)
+                continue
+            self.stats.requests += len(batch)
+            self.stats.batches += 1
+            self.stats.seconds += time.perf_counter() - start
+            for request, completion in zip(batch, completions):
+                request.future.set_result(completion)
+                if request.pieces is not None:
+                    request.pieces.put(None)
+
+
+class LocalLLM(LLM):
+    """
+    A LangChain LLM served by an in-process backend through a RequestBatcher.
+
+    Prompts of one call and of concurrent calls, streamed or not, are
+    batched together.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    batcher: RequestBatcher
+
+    @property
+    def _llm_type(self) -> str:
+        return f"local-{self.batcher.backend.name}"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        backend = self.batcher.backend
+        return {
+            "backend": backend.name,
+            "model_path": backend.model_path,
+            "temperature": backend.temperature,
+            "max_new_tokens": backend.max_new_tokens,
+        }
+
+    def warm_up(self) -> None:
+        """Loads the backend's model."""
+        self.batcher.warm_up()
+
+    def _generate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        # All prompts are queued before waiting, so they share batches
+        futures = [self.batcher.submit(prompt) for prompt in prompts]
+        generations = []
+        for future in futures:
+            text = future.result()
+            if stop:
+                text = enforce_stop_tokens(text, stop)
+            generations.append([Generation(text=text)])
+        return LLMResult(generations=generations)
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        return self._generate([prompt], stop, run_manager).generations[0][0].text
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        for piece in self._stream_text(prompt, stop):
+            chunk = GenerationChunk(text=piece)
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+    def _stream_text(self, prompt: str, stop: Optional[List[str]]) -> Iterator[str]:
+        """Yields the completion up to the first stop sequence, as generated."""
+        stream = self.batcher.stream(prompt)
+        text, sent = "", 0
+        try:
+            for piece in stream:
+                text += piece
+                end, stopped = _split_at_stop(text, stop)
+                if end > sent:
+                    yield text[sent:end]
+                    sent = end
+                if stopped:
+                    return
+        finally:
+            # Stops generating once a stop sequence was reached
+            stream.close()
+        if len(text) > sent:
+            yield text[sent:]
+
+
+def _split_at_stop(text: str, stop: Optional[List[str]]) -> Tuple[int, bool]:
+    """
+    Returns how much of a partial completion can be emitted, and whether it
+    reached a stop sequence. Text that may be the start of a stop sequence
+    is held back until the next piece decides it.
+    """
+    stop = [s for s in stop or [] if s]
+    found = [i for i in (text.find(s) for s in stop) if i >= 0]
+    if found:
+        return min(found), True
+    held = max(
+        (k for s in stop for k in range(1, len(s)) if text.endswith(s[:k])),
+        default=0,
+    )
+    return len(text) - held, False
+
+
+# One warm model per backend and settings in the process, shared by all sessions.
+_LOCAL_LLMS: Dict[tuple, LocalLLM] = {}
+_LOCAL_LLMS_LOCK = threading.Lock()
+
+
+def get_local_llm(
+    backend: str,
+    model_path: str,
+    temperature: float,
+    max_new_tokens: int,
+    max_batch_size: int = 8,
+    max_wait: float = 0.02,
+) -> LocalLLM:
+    """
+    Returns the process-wide LocalLLM of a backend, creating it on first use.
+
+    Args:
+        backend (str): One of ``LOCAL_BACKENDS``.
+        model_path (str): GGUF file (llamacpp) or model directory (transformers).
+        temperature (float): The sampling temperature; 0 decodes greedily.
+        max_new_tokens (int): Maximum number of generated tokens.
+        max_batch_size (int): Maximum number of prompts per batch.
+        max_wait (float): Seconds to wait for a batch to fill up.
+
+    Returns:
+        LocalLLM: The shared LLM.
+
+    Raises:
+        ImportError: If the backend's inference library is not installed.
+        FileNotFoundError: If the model is missing.
+    """
+    key = (backend, model_path, temperature, max_new_tokens, max_batch_size, max_wait)
+    with _LOCAL_LLMS_LOCK:
+        if key not in _LOCAL_LLMS:
+            _LOCAL_LLMS[key] = LocalLLM(
+                batcher=RequestBatcher(
+                    create_backend(backend, model_path, temperature, max_new_tokens),
+                    max_batch_size=max_batch_size,
+                    max_wait=max_wait,
+                )
+            )
+        return _LOCAL_LLMS[key]
@@ -1,24 +1,183 @@
 import os
+import hashlib
+import json
+import logging
+import time
+import shutil
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import chardet
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import DirectoryLoader, TextLoader
+from langchain_core.documents import Document
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
+from config.constants import EMBEDDING_MODEL
+from components.code_splitter import PythonCodeSplitter
+from components.file_discovery import DiscoveryStats, FileDiscovery
+from components.index_manifest import IndexManifest
+from components.metadata_filter import FILTER_FIELDS, path_metadata
+from components.mmap_docstore import OFFSETS_FILE
+from components.streaming_ingest import StreamingIngestor
+from components.symbol_index import SymbolIndex
+from components.vector_store import VectorStore
 
+# Vector stores shared by every session of this process, keyed by cache key
+# (see ``IndexManager.cache_key``).
+_INDEX_CACHE: Dict[str, FAISS] = {}
+# Cache keys currently cached for each index directory.
+_INDEX_DIRS: Dict[str, List[str]] = {}
+_INDEX_LOCKS: Dict[str, threading.Lock] = {}
+_INDEX_LOCKS_GUARD = threading.Lock()
 
-def load_documents(root_dir: str):
-    """Loads documents from a specified directory."""
-    loader = DirectoryLoader(
-        root_dir,
-        glob="**/*.*",
-        loader_cls=TextLoader,
-        loader_kwargs={"autodetect_encoding": True},
+
+# Leading bytes of common binary formats (images, archives, executables, ...)
+BINARY_SIGNATURES = (
+    b"\x89PNG",
+    b"\xff\xd8\xff",
+    b"GIF8",
+    b"%PDF",
+    b"PK\x03\x04",
+    b"\x1f\x8b",
+    b"BZh",
+    b"\xfd7zXZ",
+    b"7z\xbc\xaf",
+    b"\x7fELF",
+    b"MZ",
+    b"\xca\xfe\xba\xbe",
+    b"\xcf\xfa\xed\xfe",
+    b"\x93NUMPY",
+    b"\x80\x04\x95",
+    b"SQLite format 3",
+)
+SNIFF_SIZE = 8192
+MAX_FILE_SIZE = 1024 * 1024
+
+
+def is_binary(sample: bytes) -> bool:
+    """Sniffs the first bytes of a file for binary magic numbers or NUL bytes."""
+    return sample.startswith(BINARY_SIGNATURES) or b"\x00" in sample[:SNIFF_SIZE]
+
+
+def decode_text(data: bytes) -> str:
+    """Decodes file content as UTF-8, falling back to chardet detection."""
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        pass
+    encoding = chardet.detect(data[: 64 * 1024])["encoding"] or "latin-1"
+    return data.decode(encoding, errors="replace")
+
+
+def load_file(path: str) -> List[Document]:
+    """
+    Loads a single file as a list of documents.
+
+    Returns an empty list for binary files and files that cannot be read.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError as e:
+        logging.warning(f"Skipping unreadable file {path}: {e}")
+        return []
+    if is_binary(data[:SNIFF_SIZE]):
+        logging.debug(f"Skipping binary file {path}")
+        return []
+    return [Document(page_content=decode_text(data), metadata={"source": path})]
+
+
+def iter_file_documents(
+    paths: Iterable[str], max_workers: Optional[int] = None
+) -> Iterator[Document]:
+    """
+    Loads files on a thread pool and yields documents as they are read.
+
+    At most a few reads per worker are in flight, so memory use does not
+    depend on the number of files, and documents arrive in completion order.
+
+    Parameters:
+    - paths (Iterable[str]): Files to load.
+    - max_workers (int): Size of the thread pool; defaults to ``min(32, cpus + 4)``.
+    """
+    max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+    max_in_flight = max_workers * 4
+    paths = iter(paths)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for path in paths:
+            pending.add(executor.submit(load_file, path))
+            if len(pending) < max_in_flight:
+                continue
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+        for future in as_completed(pending):
+            yield from future.result()
+
+
+def iter_documents(
+    root_dir: str,
+    include: Sequence[str] = ("*.*",),
+    exclude: Sequence[str] = (),
+    max_file_size: Optional[int] = MAX_FILE_SIZE,
+    max_workers: Optional[int] = None,
+) -> Iterator[Document]:
+    """
+    Streams the documents of a directory as they are loaded.
+
+    Parameters:
+    - root_dir (str): Directory to load.
+    - include (Sequence[str]): Globs a relative path must match to be loaded.
+    - exclude (Sequence[str]): Globs of relative paths to skip.
+    - max_file_size (int): Files larger than this many bytes are skipped (``None``: no limit).
+    - max_workers (int): Size of the file-reading thread pool.
+    """
+    files = list_source_files(
+        root_dir, include=include, exclude=exclude, max_file_size=max_file_size
     )
-    return loader.load()
+    return iter_file_documents(files, max_workers)
 
 
-def split_text(documents):
-    """Splits documents into smaller chunks."""
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+def load_documents(root_dir: str, **kwargs) -> List[Document]:
+    """Loads documents from a specified directory."""
+    return list(iter_documents(root_dir, **kwargs))
+
+
+def list_source_files(root_dir: str, **kwargs) -> List[str]:
+    """
+    Lists the files of ``root_dir`` to index, sorted for stable hashing.
+
+    Discovery honors .gitignore-style files and prunes vendor and build
+    directories; see ``FileDiscovery`` for the keyword arguments.
+    """
+    kwargs.setdefault("max_file_size", MAX_FILE_SIZE)
+    return FileDiscovery(root_dir, **kwargs).discover()
+
+
+def split_text(
+    documents,
+    chunk_size: int = 500,
+    chunk_overlap: int = 50,
+    chunk_mode: str = "recursive",
+):
+    """
+    Splits documents into smaller chunks.
+
+    ``chunk_mode`` is ``"recursive"`` for fixed-size character chunks or
+    ``"ast"`` for one chunk per Python definition (see ``PythonCodeSplitter``).
+    """
+    if chunk_mode == "ast":
+        text_splitter = PythonCodeSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        )
+    elif chunk_mode == "recursive":
+        # start_index lets the context packer merge overlapping neighbours
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True
+        )
+    else:
+        raise ValueError(f"Unknown chunk mode: {chunk_mode}")
     return text_splitter.split_documents(documents)
 
 
@@ -46,6 +205,389 @@ def initialize_vector_store(texts, embeddings, faiss_path="faiss"):
         raise ValueError("No text chunks available to process.")
 
 
-def get_embeddings():
+def get_embeddings(model_name: str = EMBEDDING_MODEL):
     """Initializes HuggingFace embeddings."""
-    return HuggingFaceEmbeddings(model_name="BAAI/bge-small-en-v1.5")
+    return HuggingFaceEmbeddings(model_name=model_name)
+
+
+def compute_index_key(
+    root_dir: str,
+    chunk_size: int = 500,
+    chunk_overlap: int = 50,
+    model_name: str = EMBEDDING_MODEL,
+    files: Optional[List[str]] = None,
+    chunk_mode: str = "recursive",
+) -> str:
+    """
+    Computes the key under which the FAISS index of ``root_dir`` is saved.
+
+    The key hashes the file set (relative path, size and modification time of
+    every file) together with the chunking parameters and the embedding model,
+    so any change to one of them yields a new key. Only ``stat`` calls are
+    made, which keeps the check cheap enough to run on every Streamlit rerun.
+    """
+    digest = hashlib.sha256()
+    settings = {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "chunk_mode": chunk_mode,
+        "model_name": model_name,
+    }
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    if files is None:
+        files = list_source_files(root_dir)
+    for path in files:
+        stat = os.stat(path)
+        relative_path = os.path.relpath(path, root_dir)
+        entry = f"{relative_path}\0{stat.st_size}\0{stat.st_mtime_ns}\n"
+        digest.update(entry.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class IndexManager:
+    """
+    Builds, persists and incrementally updates FAISS indexes for a codebase.
+
+    Each combination of chunking parameters and embedding model gets its own
+    directory under ``faiss_path``. Every save writes the index and an
+    ``IndexManifest`` to a new version directory inside it, then publishes
+    that version through the ``CURRENT`` pointer file. When the index key (see ``compute_index_key``) matches
+    the saved one the index is loaded with ``FAISS.load_local``; otherwise only
+    the added, changed and deleted files are re-chunked, re-embedded or
+    removed. Loaded indexes are kept in a process-wide cache shared by all
+    sessions, and an update never mutates an index another session holds.
+    """
+
+    MANIFEST_FILE = "manifest.json"
+    # Names the published version directory inside an index directory
+    CURRENT_FILE = "CURRENT"
+
+    def __init__(
+        self,
+        root_dir: str,
+        embeddings=None,
+        model_name: str = EMBEDDING_MODEL,
+        chunk_size: int = 500,
+        chunk_overlap: int = 50,
+        chunk_mode: str = "recursive",
+        faiss_path: str = "faiss",
+        vector_store: Optional[VectorStore] = None,
+        mmap: bool = False,
+        symbol_index: Optional[SymbolIndex] = None,
+        ingestor: Optional[StreamingIngestor] = None,
+        include: Sequence[str] = ("*.*",),
+        exclude: Sequence[str] = (),
+    ):
+        """
+        Initializes the IndexManager.
+
+        Parameters:
+        - root_dir (str): Directory holding the codebase to index.
+        - embeddings: Embeddings object; created from ``model_name`` when omitted.
+        - model_name (str): Name of the embedding model, part of the index key.
+        - chunk_size (int): The maximum size of each text chunk.
+        - chunk_overlap (int): The overlap size between consecutive chunks.
+        - chunk_mode (str): ``"recursive"`` or ``"ast"``, see ``split_text``.
+        - faiss_path (str): Directory under which indexes are saved.
+        - vector_store (VectorStore): Builds the index; its index type and build
+          options are part of the index directory. Defaults to a flat index.
+        - mmap (bool): Also save indexes in the memory-mapped layout and serve
+          them read-only from it, so processes share one copy of the pages.
+        - symbol_index (SymbolIndex): Symbol table kept up to date with the
+          indexed files, if any.
+        - ingestor (StreamingIngestor): Builds new indexes by streaming chunks
+          in bounded memory, saved in the memory-mapped layout, instead of
+          holding every chunk and vector at once.
+        - include (Sequence[str]): Globs a relative path must match to be indexed.
+        - exclude (Sequence[str]): Globs of relative paths (or directories) to skip.
+        """
+        self.root_dir = root_dir
+        self.model_name = model_name
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.chunk_mode = chunk_mode
+        self.faiss_path = faiss_path
+        self._embeddings = embeddings
+        self.index_key: Optional[str] = None
+        self.discovery_stats: Optional[DiscoveryStats] = None
+        self.files: List[str] = []
+        self.vector_store = vector_store or VectorStore()
+        self.mmap = mmap
+        self.symbol_index = symbol_index
+        self.ingestor = ingestor
+        self.include = include
+        self.exclude = exclude
+
+    @property
+    def embeddings(self):
+        """Lazily creates the embeddings object."""
+        if self._embeddings is None:
+            self._embeddings = get_embeddings(self.model_name)
+        return self._embeddings
+
+    @property
+    def index_dir(self) -> str:
+        """Directory of the index for the current settings."""
+        settings = json.dumps(
+            [
+                self.model_name,
+                self.chunk_size,
+                self.chunk_overlap,
+                self.chunk_mode,
+                self.vector_store.build_params,
+                # Indexes built before a field was added lack it in their chunks
+                FILTER_FIELDS,
+            ],
+            sort_keys=True,
+        )
+        digest = hashlib.sha256(settings.encode("utf-8")).hexdigest()
+        return os.path.join(self.faiss_path, digest[:16])
+
+    def compute_key(self) -> str:
+        """Computes the index key for the current state of the codebase."""
+        discovery = FileDiscovery(
+            self.root_dir,
+            include=self.include,
+            exclude=self.exclude,
+            max_file_size=MAX_FILE_SIZE,
+        )
+        files = discovery.discover()
+        self.discovery_stats = discovery.stats
+        self.files = files
+        return compute_index_key(
+            self.root_dir,
+            self.chunk_size,
+            self.chunk_overlap,
+            self.model_name,
+            files=files,
+            chunk_mode=self.chunk_mode,
+        )
+
+    def cache_key(self, key: str) -> str:
+        """
+        Returns the process-wide cache key of an index key.
+
+        Managers of the same codebase may build different index types, or
+        serve them memory-mapped or not, so the cache key includes both.
+        """
+        settings = json.dumps([key, self.vector_store.build_params, self.mmap])
+        return hashlib.sha256(settings.encode("utf-8")).hexdigest()
+
+    def get_vector_store(self) -> FAISS:
+        """
+        Returns the vector store for the current state of the codebase.
+
+        The store is taken from the process-wide cache, loaded from disk, or
+        updated/built and saved, in that order of preference.
+
+        Returns:
+        - FAISS: The vector store matching the current index key.
+        """
+        key = self.compute_key()
+        self.index_key = key
+        if self.symbol_index is not None:
+            # Re-parses changed files only, so this is cheap when nothing changed
+            self.symbol_index.update(self.files)
+        cache_key = self.cache_key(key)
+        cached = _INDEX_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+
+        index_dir = self.index_dir
+        with _INDEX_LOCKS_GUARD:
+            lock = _INDEX_LOCKS.setdefault(index_dir, threading.Lock())
+        # Concurrent sessions wait for a single load, update or build
+        with lock:
+            if cache_key not in _INDEX_CACHE:
+                vector_store = self._sync(key, index_dir)
+                # Older versions stay alive only as long as a session holds them
+                for stale_key in _INDEX_DIRS.pop(index_dir, []):
+                    _INDEX_CACHE.pop(stale_key, None)
+                _INDEX_CACHE[cache_key] = vector_store
+                _INDEX_DIRS[index_dir] = [cache_key]
+        return _INDEX_CACHE[cache_key]
+
+    def rebuild(self) -> FAISS:
+        """
+        Discards the saved index for the current settings and builds it again.
+
+        Returns:
+        - FAISS: The rebuilt vector store.
+        """
+        index_dir = self.index_dir
+        with _INDEX_LOCKS_GUARD:
+            lock = _INDEX_LOCKS.setdefault(index_dir, threading.Lock())
+        with lock:
+            for stale_key in _INDEX_DIRS.pop(index_dir, []):
+                _INDEX_CACHE.pop(stale_key, None)
+            shutil.rmtree(index_dir, ignore_errors=True)
+        return self.get_vector_store()
+
+    def _sync(self, key: str, index_dir: str) -> FAISS:
+        live_dir = self._live_dir(index_dir)
+        if live_dir is None:
+            return self._build(key, index_dir)
+
+        manifest_path = os.path.join(live_dir, self.MANIFEST_FILE)
+        manifest = IndexManifest.load(manifest_path, self.root_dir)
+        if manifest.metadata.get("index_key") == key:
+            logging.info(f"Loading FAISS index {key[:12]} from {live_dir}")
+            return self._open(live_dir)
+
+        # Loading from disk gives a private copy that is safe to update
+        if os.path.exists(os.path.join(live_dir, "index.pkl")):
+            vector_store = FAISS.load_local(
+                live_dir, self.embeddings, allow_dangerous_deserialization=True
+            )
+        else:
+            vector_store = self.vector_store.load_mmap(
+                live_dir, self.embeddings, in_memory=True
+            )
+
+        # The files discovered by compute_key, so the tree is walked once
+        changes = manifest.scan(self.files)
+        if changes.to_remove and not self.vector_store.supports_removal:
+            logging.info(
+                f"{self.vector_store.index_type} index cannot remove vectors; rebuilding"
+            )
+            return self._build(key, index_dir)
+        if changes:
+            chunks_by_file = self._chunk_files(changes.to_index)
+            self.vector_store.update_faiss_store(
+                vector_store, manifest, changes, chunks_by_file
+            )
+        manifest.metadata["index_key"] = key
+        version_dir = self._save(vector_store, manifest, index_dir)
+        logging.info(f"Updated FAISS index in {index_dir} to {key[:12]}")
+        return self._open(version_dir) if self.mmap else vector_store
+
+    def _build(self, key: str, index_dir: str) -> FAISS:
+        logging.info(f"No saved FAISS index in {index_dir}, building it.")
+        manifest = IndexManifest(self.root_dir, metadata={"index_key": key})
+        changes = manifest.scan(self.files)
+        if self.ingestor is not None:
+            return self._build_streaming(key, index_dir, manifest, changes.to_index)
+        chunks_by_file = self._chunk_files(changes.to_index)
+
+        texts, ids = [], []
+        for relative_path, chunks in chunks_by_file.items():
+            chunk_ids = IndexManifest.chunk_ids(relative_path, len(chunks))
+            texts.extend(chunks)
+            ids.extend(chunk_ids)
+            manifest.record(relative_path, chunk_ids)
+
+        vector_store = self.vector_store.initialize_faiss_store(
+            texts, self.embeddings, ids=ids, save_dir=None
+        )
+        version_dir = self._save(vector_store, manifest, index_dir)
+        logging.info(f"Saved FAISS index {key[:12]} to {index_dir}")
+        return self._open(version_dir) if self.mmap else vector_store
+
+    def _build_streaming(
+        self,
+        key: str,
+        index_dir: str,
+        manifest: IndexManifest,
+        relative_paths: List[str],
+    ) -> FAISS:
+        def files() -> Iterator[Tuple[List[str], list]]:
+            for relative_path, chunks in self._iter_chunks(relative_paths):
+                chunk_ids = IndexManifest.chunk_ids(relative_path, len(chunks))
+                manifest.record(relative_path, chunk_ids)
+                yield chunk_ids, chunks
+
+        version_dir = self._new_version(index_dir)
+        self.ingestor.ingest(files(), self.embeddings, self.vector_store, version_dir)
+        # Binary and unreadable files are recorded so they are not retried
+        for relative_path in relative_paths:
+            if relative_path not in manifest.files:
+                manifest.record(relative_path, [])
+        manifest.save(os.path.join(version_dir, self.MANIFEST_FILE))
+        self._publish(index_dir, version_dir)
+        logging.info(f"Saved streamed FAISS index {key[:12]} to {index_dir}")
+        return self._open(version_dir)
+
+    def _open(self, index_dir: str) -> FAISS:
+        has_pickle = os.path.exists(os.path.join(index_dir, "index.pkl"))
+        # Streamed indexes only exist in the memory-mapped layout
+        if (self.mmap or not has_pickle) and os.path.exists(
+            os.path.join(index_dir, OFFSETS_FILE)
+        ):
+            return self.vector_store.load_mmap(index_dir, self.embeddings)
+        vector_store = FAISS.load_local(
+            index_dir, self.embeddings, allow_dangerous_deserialization=True
+        )
+        self.vector_store.set_search_params(vector_store)
+        return vector_store
+
+    def _iter_chunks(self, relative_paths: List[str]) -> Iterator[Tuple[str, list]]:
+        paths = [os.path.join(self.root_dir, p) for p in relative_paths]
+        # Split each document as soon as its file has been read
+        for document in iter_file_documents(paths):
+            source = document.metadata["source"]
+            document.metadata.update(path_metadata(source, self.root_dir))
+            yield os.path.relpath(source, self.root_dir), split_text(
+                [document], self.chunk_size, self.chunk_overlap, self.chunk_mode
+            )
+
+    def _chunk_files(self, relative_paths: List[str]) -> Dict[str, list]:
+        chunks_by_file = {relative_path: [] for relative_path in relative_paths}
+        chunks_by_file.update(self._iter_chunks(relative_paths))
+        return chunks_by_file
+
+    def _save(
+        self, vector_store: FAISS, manifest: IndexManifest, index_dir: str
+    ) -> str:
+        version_dir = self._new_version(index_dir)
+        vector_store.save_local(version_dir)
+        if self.mmap:
+            self.vector_store.save_mmap(vector_store, version_dir)
+        manifest.save(os.path.join(version_dir, self.MANIFEST_FILE))
+        self._publish(index_dir, version_dir)
+        return version_dir
+
+    def _live_dir(self, index_dir: str) -> Optional[str]:
+        """Returns the directory of the published index version, if any."""
+        try:
+            with open(os.path.join(index_dir, self.CURRENT_FILE), "r") as f:
+                return os.path.join(index_dir, f.read().strip())
+        except FileNotFoundError:
+            pass
+        # Indexes saved before versioning live directly in the index directory
+        if os.path.exists(os.path.join(index_dir, "index.faiss")):
+            return index_dir
+        return None
+
+    @staticmethod
+    def _new_version(index_dir: str) -> str:
+        # Names sort by creation time
+        return os.path.join(index_dir, f"v-{time.time_ns():020d}-{os.getpid()}")
+
+    def _publish(self, index_dir: str, version_dir: str) -> None:
+        """
+        Makes a fully written version the live index.
+
+        The pointer file is replaced atomically, so readers in other
+        processes see either the previous version or the new one, never a
+        half-written or missing index.
+        """
+        version = os.path.basename(version_dir)
+        pointer = os.path.join(index_dir, self.CURRENT_FILE)
+        tmp_pointer = f"{pointer}.tmp-{os.getpid()}"
+        with open(tmp_pointer, "w") as f:
+            f.write(version)
+        os.replace(tmp_pointer, pointer)
+
+        # A reader that read the old pointer may still be opening the previous
+        # version; older ones and files of the unversioned layout are unused
+        older = sorted(
+            name
+            for name in os.listdir(index_dir)
+            if name.startswith("v-") and name < version
+        )
+        for name in older[:-1]:
+            shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+        for name in os.listdir(index_dir):
+            path = os.path.join(index_dir, name)
+            if not name.startswith(self.CURRENT_FILE) and os.path.isfile(path):
+                os.remove(path)
@@ -0,0 +1,212 @@
+import os
+import logging
+from fnmatch import fnmatch
+from typing import Dict, List, Optional, Sequence, Union
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+from components.vector_store import search_index
+
+# Chunk metadata that can be filtered on.
+FILTER_FIELDS = ("path", "extension", "language", "package", "kind")
+FIELD_ALIASES = {
+    "ext": "extension",
+    "lang": "language",
+    "pkg": "package",
+    "file": "path",
+}
+
+LANGUAGES = {
+    ".py": "python",
+    ".pyi": "python",
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".ts": "typescript",
+    ".tsx": "typescript",
+    ".java": "java",
+    ".go": "go",
+    ".rs": "rust",
+    ".c": "c",
+    ".h": "c",
+    ".cpp": "cpp",
+    ".hpp": "cpp",
+    ".cs": "csharp",
+    ".rb": "ruby",
+    ".php": "php",
+    ".sh": "shell",
+    ".sql": "sql",
+    ".md": "markdown",
+    ".rst": "rst",
+    ".json": "json",
+    ".yaml": "yaml",
+    ".yml": "yaml",
+    ".toml": "toml",
+}
+
+MetadataFilter = Dict[str, Union[str, List[str]]]
+
+
+def path_metadata(path: str, root_dir: str) -> Dict[str, str]:
+    """
+    Returns the filterable metadata of a file of a codebase.
+
+    Args:
+        path (str): Path of the file.
+        root_dir (str): Root of the codebase.
+
+    Returns:
+        Dict[str, str]: ``path`` (relative, with ``/``), ``extension``,
+        ``language`` and ``package`` (the top-level directory, or ``""``).
+    """
+    relative_path = os.path.relpath(path, root_dir).replace(os.sep, "/")
+    extension = os.path.splitext(relative_path)[1].lower()
+    parts = relative_path.split("/")
+    return {
+        "path": relative_path,
+        "extension": extension,
+        "language": LANGUAGES.get(extension, extension.lstrip(".")),
+        "package": parts[0] if len(parts) > 1 else "",
+    }
+
+
+def parse_filter(text: str) -> MetadataFilter:
+    """
+    Parses a filter expression such as ``package:components ext:.py,.pyi``.
+
+    Terms are ``field:value`` pairs separated by whitespace; comma-separated
+    values match any of them, and ``path`` values are globs.
+
+    Args:
+        text (str): The filter expression.
+
+    Returns:
+        MetadataFilter: Values by field.
+
+    Raises:
+        ValueError: If a term is not ``field:value`` or names an unknown field.
+    """
+    metadata_filter: MetadataFilter = {}
+    for term in text.split():
+        field, sep, value = term.partition(":")
+        field = FIELD_ALIASES.get(field.lower(), field.lower())
+        if not sep or not value:
+            raise ValueError(f"Invalid filter term: {term!r}. Expected 'field:value'.")
+        if field not in FILTER_FIELDS:
+            raise ValueError(
+                f"Unknown filter field: {field!r}. Expected one of {FILTER_FIELDS}."
+            )
+        values = value.split(",")
+        metadata_filter[field] = values if len(values) > 1 else values[0]
+    return metadata_filter
+
+
+class MetadataIndex:
+    """
+    Columns of chunk metadata by FAISS index position.
+
+    Every field is stored inverted, as the positions of each distinct
+    value, built once per index version. A filter is matched against the
+    distinct values only, and the mask is set from the position arrays of
+    the values that match, so a query never walks every chunk in Python.
+    """
+
+    def __init__(self, metadatas: Sequence[dict]):
+        """
+        Builds the columns.
+
+        Args:
+            metadatas (Sequence[dict]): Chunk metadata in index order.
+        """
+        self.size = len(metadatas)
+        # field -> distinct value -> positions holding it
+        self.positions: Dict[str, Dict[str, np.ndarray]] = {}
+        for field in FILTER_FIELDS:
+            values, inverse = np.unique(
+                np.asarray(
+                    [str(metadata.get(field, "")) for metadata in metadatas],
+                    dtype=object,
+                ),
+                return_inverse=True,
+            )
+            order = np.argsort(inverse, kind="stable")
+            bounds = np.cumsum(np.bincount(inverse, minlength=len(values)))[:-1]
+            self.positions[field] = dict(zip(values, np.split(order, bounds)))
+
+    @classmethod
+    def from_vector_store(cls, vector_store: FAISS) -> "MetadataIndex":
+        """Builds the columns from the documents of a FAISS store."""
+        metadatas = [
+            vector_store.docstore.search(vector_store.index_to_docstore_id[i]).metadata
+            for i in range(vector_store.index.ntotal)
+        ]
+        return cls(metadatas)
+
+    def mask(self, metadata_filter: Optional[MetadataFilter]) -> Optional[np.ndarray]:
+        """
+        Returns the positions matching a filter as a boolean mask.
+
+        Args:
+            metadata_filter (MetadataFilter): Values by field; lists match any value.
+
+        Returns:
+            Optional[np.ndarray]: The mask, or None for an empty filter.
+        """
+        if not metadata_filter:
+            return None
+        mask = np.ones(self.size, dtype=bool)
+        for field, values in metadata_filter.items():
+            values = [values] if isinstance(values, str) else list(values)
+            positions = self.positions[field]
+            if field == "path":
+                # Globs, and plain directory prefixes such as "coderag/components"
+                matched = [
+                    path
+                    for path in positions
+                    if any(
+                        fnmatch(path, value) or path.startswith(value.rstrip("/") + "/")
+                        for value in values
+                    )
+                ]
+            else:
+                matched = [value for value in values if value in positions]
+            field_mask = np.zeros(self.size, dtype=bool)
+            for value in matched:
+                field_mask[positions[value]] = True
+            mask &= field_mask
+        logging.info(f"Metadata filter {metadata_filter} selects {mask.sum()} chunks")
+        return mask
+
+
+class FilteredRetriever(BaseRetriever):
+    """
+    Dense retrieval restricted to the chunks matching a metadata filter.
+
+    The filter is applied inside the FAISS search through an ID selector,
+    so a scoped query returns ``k`` matching chunks without over-fetching.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vector_store: FAISS
+    metadata_index: MetadataIndex
+    metadata_filter: Optional[MetadataFilter] = None
+    k: int = 4
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        embedding = self.vector_store.embedding_function.embed_query(query)
+        _, positions = search_index(
+            self.vector_store.index,
+            np.asarray([embedding], dtype=np.float32),
+            self.k,
+            self.metadata_index.mask(self.metadata_filter),
+        )
+        return [
+            self.vector_store.docstore.search(self.vector_store.index_to_docstore_id[i])
+            for i in positions[0]
+            if i >= 0
+        ]
@@ -0,0 +1,123 @@
+import os
+import json
+from collections.abc import Mapping
+from typing import Iterator, Optional, Union
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+DOCS_FILE = "docs.bin"
+OFFSETS_FILE = "docs.offsets.npy"
+
+
+class MmapDocstoreWriter:
+    """
+    Writes documents to the compact docstore layout read by ``MmapDocstore``.
+
+    Each document is appended to ``docs.bin`` as one UTF-8 JSON record; the
+    byte offsets of the records are written to ``docs.offsets.npy`` on close.
+    Records are streamed to disk, so writing does not hold the corpus in memory.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Opens the writer.
+
+        Args:
+            directory (str): Directory receiving the docstore files.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._file = open(os.path.join(directory, DOCS_FILE), "wb")
+        self._offsets = [0]
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def add(self, document: Document, doc_id: Optional[str] = None) -> int:
+        """Appends a document and returns its row number."""
+        record = {
+            "id": doc_id if doc_id is not None else document.id,
+            "page_content": document.page_content,
+            "metadata": document.metadata,
+        }
+        data = json.dumps(record, ensure_ascii=False).encode("utf-8")
+        self._file.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+        return len(self._offsets) - 2
+
+    def close(self) -> None:
+        self._file.close()
+        np.save(
+            os.path.join(self.directory, OFFSETS_FILE),
+            np.asarray(self._offsets, dtype=np.int64),
+        )
+
+    def __enter__(self) -> "MmapDocstoreWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class MmapDocstore(Docstore):
+    """
+    A read-only docstore backed by memory-mapped files.
+
+    Documents are addressed by their row number, which is also their
+    position in the FAISS index, so nothing is unpickled or copied when the
+    store is opened and processes opening the same files share the pages
+    through the OS cache.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Opens the docstore files written by ``MmapDocstoreWriter``.
+
+        Args:
+            directory (str): Directory holding the docstore files.
+        """
+        self.directory = directory
+        self._offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode="r")
+        docs_path = os.path.join(directory, DOCS_FILE)
+        if os.path.getsize(docs_path):
+            self._data = np.memmap(docs_path, dtype=np.uint8, mode="r")
+        else:
+            self._data = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def search(self, search: Union[int, str]) -> Union[str, Document]:
+        """Returns the document at the given row, or an error string if missing."""
+        try:
+            row = int(search)
+        except (TypeError, ValueError):
+            return f"ID {search} not found."
+        if not 0 <= row < len(self):
+            return f"ID {search} not found."
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        record = json.loads(self._data[start:end].tobytes().decode("utf-8"))
+        return Document(
+            id=record["id"],
+            page_content=record["page_content"],
+            metadata=record["metadata"],
+        )
+
+
+class RowIds(Mapping):
+    """Maps FAISS positions to ``MmapDocstore`` rows without storing them."""
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def __getitem__(self, position: int) -> int:
+        if not 0 <= position < self.size:
+            raise KeyError(position)
+        return int(position)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.size))
+
+    def __len__(self) -> int:
+        return self.size
@@ -0,0 +1,172 @@
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar, Union
+from langchain_core.language_models.llms import BaseLLM
+from langchain_ollama.llms import OllamaLLM
+from components.get_embeddings import Embedding
+
+T = TypeVar("T")
+
+
+class SharedOllamaLLM(OllamaLLM):
+    """
+    An Ollama client that is safe to share across threads and event loops.
+
+    OllamaLLM's async client binds its connections to the event loop it was
+    first used on, so a client shared process-wide would fail on any other
+    loop. This one serves async calls with the sync client on a worker
+    thread, the LangChain default.
+    """
+
+    _agenerate = BaseLLM._agenerate
+    _astream = BaseLLM._astream
+
+
+class ModelRegistry:
+    """
+    A process-wide pool of LLM and embedding clients.
+
+    Every client is created on first use, once per key, and shared by all
+    callers: the agent, the QA chain and every Streamlit session. Clients
+    are created under a per-key lock, so concurrent callers wait for the
+    one instance instead of building their own, while different models load
+    in parallel. A shared Ollama client also shares its HTTP connection
+    pool, so requests to the local server reuse open connections; only its
+    sync client is used, since the async one is bound to one event loop.
+    """
+
+    def __init__(self):
+        self._clients: Dict[Hashable, Any] = {}
+        self._locks: Dict[Hashable, threading.Lock] = {}
+        self._guard = threading.Lock()
+        self.warm_up_seconds: Dict[str, float] = {}
+
+    def get(self, key: Hashable, factory: Callable[[], T]) -> T:
+        """
+        Returns the client of ``key``, creating it with ``factory`` on first use.
+
+        Args:
+            key (Hashable): Identifies the model and every setting of the client.
+            factory (Callable[[], T]): Creates the client.
+
+        Returns:
+            T: The shared client.
+        """
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._clients:
+                start = time.perf_counter()
+                self._clients[key] = factory()
+                logging.info(
+                    f"Created model client {key} in {time.perf_counter() - start:.2f}s"
+                )
+        return self._clients[key]
+
+    def ollama_llm(
+        self,
+        model: str,
+        base_url: Optional[str] = None,
+        keep_alive: Optional[Union[int, str]] = None,
+    ) -> OllamaLLM:
+        """
+        Returns the shared client of a model served by Ollama.
+
+        Args:
+            model (str): Name of the Ollama model.
+            base_url (Optional[str]): URL of the Ollama server (default: local).
+            keep_alive (Optional[Union[int, str]]): How long the server keeps
+                the model loaded after a request, e.g. ``"30m"``.
+
+        Returns:
+            OllamaLLM: The shared client; async calls run the sync client on
+            a thread.
+        """
+        return self.get(
+            ("ollama", model, base_url, keep_alive),
+            lambda: SharedOllamaLLM(
+                model=model, base_url=base_url, keep_alive=keep_alive
+            ),
+        )
+
+    def embedding_engine(
+        self,
+        model_name: str,
+        batch_size: int,
+        cache_dir: Optional[str] = None,
+        cache_max_bytes: int = 1 << 30,
+    ):
+        """
+        Returns the shared, cached embedding engine of a model.
+
+        Args:
+            model_name (str): Name of the embedding model.
+            batch_size (int): Number of texts per forward pass.
+            cache_dir (Optional[str]): Directory of the persistent embedding cache.
+            cache_max_bytes (int): Size bound of the cached vectors.
+
+        Returns:
+            The embeddings object returned by ``Embedding.get_embedding_engine``.
+        """
+        return self.get(
+            ("embeddings", model_name, batch_size, cache_dir, cache_max_bytes),
+            lambda: Embedding(
+                model_name=model_name,
+                cache_dir=cache_dir,
+                cache_max_bytes=cache_max_bytes,
+            ).get_embedding_engine(batch_size=batch_size),
+        )
+
+    def warm_up(self, name: str, probe: Callable[[], Any]) -> bool:
+        """
+        Runs ``probe`` once per name to load a model before the first request.
+
+        A failed warm-up is logged and not recorded, so it is retried on the
+        next call; the request that needs the model then reports the error.
+
+        Args:
+            name (str): Names the warmed-up client.
+            probe (Callable[[], Any]): A cheap call that loads the model.
+
+        Returns:
+            bool: Whether the probe ran and succeeded.
+        """
+        with self._guard:
+            if name in self.warm_up_seconds:
+                return False
+            # Claimed while the probe runs, so concurrent callers skip it
+            self.warm_up_seconds[name] = 0.0
+        start = time.perf_counter()
+        try:
+            probe()
+        except Exception:
+            logging.warning(f"Warm-up of {name} failed", exc_info=True)
+            with self._guard:
+                self.warm_up_seconds.pop(name, None)
+            return False
+        self.warm_up_seconds[name] = time.perf_counter() - start
+        logging.info(f"Warmed up {name} in {self.warm_up_seconds[name]:.2f}s")
+        return True
+
+    def summary(self) -> str:
+        warmed = ", ".join(
+            f"{name} {seconds:.1f}s" for name, seconds in self.warm_up_seconds.items()
+        )
+        return f"{len(self._clients)} clients, warmed up: {warmed or 'none'}"
+
+
+def warm_up_ollama(llm: OllamaLLM) -> None:
+    """Loads an Ollama model on the server with a one-token completion."""
+    llm.invoke("Hi", options={"num_predict": 1})
+
+
+_REGISTRY = ModelRegistry()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Returns the model registry of the process."""
+    return _REGISTRY
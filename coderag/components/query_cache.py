@@ -0,0 +1,211 @@
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+
+def normalize_query(query: str) -> str:
+    """Collapses whitespace and case so trivially different questions share a key."""
+    return " ".join(query.split()).casefold()
+
+
+def answer_scope(
+    index_key: str, repo_id: str, temperature: float, max_length: int
+) -> str:
+    """
+    Returns a digest of everything besides the question that an answer depends on.
+
+    Args:
+        index_key (str): Version of the index the answer was retrieved from.
+        repo_id (str): The model repository ID.
+        temperature (float): The sampling temperature of the model.
+        max_length (int): Maximum token length of the model output.
+
+    Returns:
+        str: A sha256 hex digest.
+    """
+    payload = json.dumps([index_key, repo_id, temperature, max_length])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def query_key(
+    query: str,
+    index_key: str,
+    repo_id: str,
+    temperature: float,
+    max_length: int,
+) -> str:
+    """
+    Returns the cache key of a question asked against an index and a model.
+
+    Args:
+        query (str): The question as typed by the user.
+        index_key (str): Version of the index the answer was retrieved from.
+        repo_id (str): The model repository ID.
+        temperature (float): The sampling temperature of the model.
+        max_length (int): Maximum token length of the model output.
+
+    Returns:
+        str: A sha256 hex digest.
+    """
+    scope = answer_scope(index_key, repo_id, temperature, max_length)
+    payload = json.dumps([normalize_query(query), scope])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class QueryCache:
+    """
+    A TTL and LRU bounded cache of query results.
+
+    Entries are held in memory, in least recently used order, and optionally
+    in an SQLite database under ``cache_dir`` so they survive restarts and
+    are shared by the processes serving the same index. Values must be JSON
+    serializable when the disk backend is used.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: Optional[float] = 3600,
+        cache_dir: Optional[str] = None,
+        max_disk_entries: int = 10_000,
+    ):
+        """
+        Initializes the QueryCache.
+
+        Args:
+            max_entries (int): Number of entries kept in memory.
+            ttl (Optional[float]): Seconds an entry stays valid; None never expires.
+            cache_dir (Optional[str]): Directory of the on-disk backend, if any.
+            max_disk_entries (int): Number of entries kept on disk.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._db = sqlite3.connect(
+                os.path.join(cache_dir, "queries.sqlite"), check_same_thread=False
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries "
+                "(key TEXT PRIMARY KEY, value TEXT, expires REAL, last_used REAL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)"
+            )
+            self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expires(self) -> Optional[float]:
+        return time.time() + self.ttl if self.ttl is not None else None
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value of a key, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self._entries.pop(key, None)
+
+            value = self._get_disk(key, now)
+            if value is None:
+                self.misses += 1
+                return None
+            self._set_memory(key, value[0], value[1])
+            self.hits += 1
+            return value[0]
+
+    def _get_disk(self, key: str, now: float) -> Optional[tuple]:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT value, expires FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] is not None and row[1] <= now:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+        self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (now, key))
+        self._db.commit()
+        return json.loads(row[0]), row[1]
+
+    def put(self, key: str, value: Any) -> None:
+        """Stores a value, evicting the least recently used entries if full."""
+        expires = self._expires()
+        with self._lock:
+            self._set_memory(key, value, expires)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, expires, last_used) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), expires, time.time()),
+                )
+                self._db.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM entries "
+                    "ORDER BY last_used DESC, rowid DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,),
+                )
+                self._db.commit()
+
+    def _set_memory(self, key: str, value: Any, expires: Optional[float]) -> None:
+        self._entries[key] = (value, expires)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        """
+        Returns the cached value of a key, computing and storing it on a miss.
+
+        Args:
+            key (str): The cache key, usually from ``query_key``.
+            compute (Callable[[], Any]): Produces the value on a miss.
+
+        Returns:
+            Any: The cached or computed value.
+        """
+        value = self.get(key)
+        if value is not None:
+            logging.info(f"Query cache hit for {key[:12]}")
+            return value
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM entries")
+                self._db.commit()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> str:
+        return f"{self.hits} hits, {self.misses} misses ({self.hit_rate:.1%} hit rate)"
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
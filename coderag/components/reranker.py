@@ -0,0 +1,111 @@
+import time
+import logging
+from typing import List, Optional
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+from sentence_transformers import CrossEncoder
+
+
+def load_cross_encoder(model_name: str, max_length: int = 512) -> CrossEncoder:
+    """Loads a sentence-transformers cross-encoder on the CPU."""
+    logging.info(f"Loading cross-encoder: {model_name}")
+    return CrossEncoder(model_name, max_length=max_length, device="cpu")
+
+
+class RerankStats:
+    """What the last re-ranking did."""
+
+    def __init__(self, candidates: int = 0, scored: int = 0, seconds: float = 0.0):
+        self.candidates = candidates
+        self.scored = scored
+        self.seconds = seconds
+
+    @property
+    def complete(self) -> bool:
+        return self.scored == self.candidates
+
+    def summary(self) -> str:
+        return (
+            f"scored {self.scored}/{self.candidates} candidates "
+            f"in {self.seconds * 1000:.0f}ms"
+        )
+
+
+class RerankingRetriever(BaseRetriever):
+    """
+    Re-ranks the candidates of another retriever with a cross-encoder.
+
+    The wrapped retriever fetches a large candidate set; (query, chunk)
+    pairs are scored in batches and only the ``top_n`` best go on. Scoring
+    stops before a batch that would overrun ``time_budget``: the scored
+    candidates are ranked by score and the unscored ones keep the order of
+    the wrapped retriever behind them, so a slow query degrades to the
+    dense order instead of stalling.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    retriever: BaseRetriever
+    cross_encoder: object
+    top_n: int = 4
+    batch_size: int = 16
+    # Seconds per query
+    time_budget: float = 0.3
+    last_stats: Optional[RerankStats] = None
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        candidates = self.retriever.invoke(
+            query, config={"callbacks": run_manager.get_child()}
+        )
+        start = time.perf_counter()
+        scores: List[float] = []
+        batch_seconds = 0.0
+        for i in range(0, len(candidates), self.batch_size):
+            elapsed = time.perf_counter() - start
+            if elapsed + batch_seconds > self.time_budget:
+                break
+            batch_start = time.perf_counter()
+            pairs = [
+                (query, document.page_content)
+                for document in candidates[i : i + self.batch_size]
+            ]
+            scores.extend(
+                float(score)
+                for score in self.cross_encoder.predict(
+                    pairs, batch_size=self.batch_size, show_progress_bar=False
+                )
+            )
+            # The slowest batch so far predicts the cost of the next one
+            batch_seconds = max(batch_seconds, time.perf_counter() - batch_start)
+
+        self.last_stats = RerankStats(
+            len(candidates), len(scores), time.perf_counter() - start
+        )
+        if not self.last_stats.complete:
+            logging.info(
+                f"Re-ranking hit its {self.time_budget * 1000:.0f}ms budget: "
+                f"{self.last_stats.summary()}"
+            )
+        scored = sorted(
+            range(len(scores)), key=lambda position: scores[position], reverse=True
+        )
+        order = scored + list(range(len(scores), len(candidates)))
+
+        documents = []
+        for position in order[: self.top_n]:
+            document = candidates[position]
+            metadata = dict(document.metadata)
+            if position < len(scores):
+                metadata["rerank_score"] = scores[position]
+            documents.append(
+                Document(
+                    id=document.id,
+                    page_content=document.page_content,
+                    metadata=metadata,
+                )
+            )
+        return documents
@@ -0,0 +1,231 @@
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Optional, Tuple
+import faiss
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# A backticked span, or a word with an optional call parenthesis
+_NAME = re.compile(r"`([^`]+)`|([A-Za-z_][\w.]*)(\()?")
+# Candidates compared for their identifiers, best match first
+_CANDIDATES = 8
+
+
+def code_identifiers(text: str) -> FrozenSet[str]:
+    """
+    Returns the code identifiers a question names.
+
+    Backticked names, calls (``load()``), dotted names (``demo.py``),
+    snake_case and camelCase or PascalCase compounds count; plain words do
+    not, since they cannot be told apart from prose.
+
+    Args:
+        text (str): The question.
+
+    Returns:
+        FrozenSet[str]: The identifiers.
+    """
+    identifiers = set()
+    for quoted, word, call in _NAME.findall(text):
+        if quoted:
+            identifiers.add(quoted.strip())
+            continue
+        word = word.rstrip(".")
+        if (
+            call
+            or "_" in word
+            or "." in word
+            or re.search(r"[a-z][A-Z]|[A-Z][a-z0-9]+[A-Z]", word)
+        ):
+            identifiers.add(word)
+    return frozenset(identifiers)
+
+
+class SemanticCacheStats:
+    """Hit counters and latency saved by a SemanticCache."""
+
+    def __init__(self):
+        self.lookups = 0
+        self.hits = 0
+        self.lookup_seconds = 0.0
+        self.saved_seconds = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hit_rate,
+            "lookup_seconds": self.lookup_seconds,
+            "saved_seconds": self.saved_seconds,
+        }
+
+    def summary(self) -> str:
+        return (
+            f"{self.hits}/{self.lookups} hits ({self.hit_rate:.1%}), "
+            f"{self.saved_seconds:.1f}s saved, "
+            f"{self.lookup_seconds:.2f}s spent in lookups"
+        )
+
+
+class SemanticCache:
+    """
+    Caches answers by the meaning of the question rather than its text.
+
+    Each question is embedded with the query embedding model and looked up
+    in a small inner-product FAISS index of past questions, one index per
+    scope (the index version and model settings the answer depends on). An
+    answer is reused when the cosine similarity of the questions reaches
+    ``threshold`` and both name the same code identifiers: questions that
+    differ only in a name ("what does load_file do?" and "what does
+    save_file do?") embed close together but have different answers. The
+    least recently used entries are evicted beyond ``max_entries``.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        threshold: float = 0.9,
+        max_entries: int = 1024,
+    ):
+        """
+        Initializes the SemanticCache.
+
+        Args:
+            embeddings (Embeddings): Model used to embed the questions.
+            threshold (float): Minimum cosine similarity for a hit.
+            max_entries (int): Number of questions kept across all scopes.
+        """
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.stats = SemanticCacheStats()
+        self._indexes: Dict[str, faiss.IndexIDMap2] = {}
+        # id -> (scope, query, value, seconds it took to compute)
+        self._entries: "OrderedDict[int, Tuple[str, str, Any, float]]" = OrderedDict()
+        self._identifiers: Dict[int, FrozenSet[str]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _embed(self, query: str) -> np.ndarray:
+        vector = np.asarray([self.embeddings.embed_query(query)], dtype=np.float32)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _search(
+        self, vector: np.ndarray, scope: str, identifiers: FrozenSet[str]
+    ) -> Optional[Tuple[int, float]]:
+        index = self._indexes.get(scope)
+        if index is None or index.ntotal == 0:
+            return None
+        scores, ids = index.search(vector, min(_CANDIDATES, index.ntotal))
+        for entry_id, score in zip(ids[0], scores[0]):
+            if entry_id < 0 or score < self.threshold:
+                break
+            if self._identifiers[int(entry_id)] == identifiers:
+                return int(entry_id), float(score)
+        return None
+
+    def lookup(self, query: str, scope: str) -> Optional[Any]:
+        """
+        Returns the answer of the most similar past question, if similar enough.
+
+        Args:
+            query (str): The incoming question.
+            scope (str): The index version and model settings of the answer.
+
+        Returns:
+            Optional[Any]: The cached answer, or None on a miss.
+        """
+        value, _ = self._lookup(query, scope)
+        return value
+
+    def _lookup(self, query: str, scope: str) -> Tuple[Optional[Any], np.ndarray]:
+        start = time.perf_counter()
+        vector = self._embed(query)
+        with self._lock:
+            match = self._search(vector, scope, code_identifiers(query))
+            self.stats.lookups += 1
+            if match is not None:
+                entry_id, score = match
+                _, cached_query, value, seconds = self._entries[entry_id]
+                self._entries.move_to_end(entry_id)
+                self.stats.hits += 1
+                self.stats.saved_seconds += seconds
+            self.stats.lookup_seconds += time.perf_counter() - start
+        if match is None:
+            return None, vector
+        logging.info(
+            f"Semantic cache hit ({score:.3f}): {query!r} ~ {cached_query!r}"
+        )
+        return value, vector
+
+    def store(
+        self,
+        query: str,
+        scope: str,
+        value: Any,
+        seconds: float = 0.0,
+        vector: Optional[np.ndarray] = None,
+    ) -> None:
+        """
+        Stores the answer of a question.
+
+        Args:
+            query (str): The question.
+            scope (str): The index version and model settings of the answer.
+            value (Any): The answer.
+            seconds (float): Time it took to compute, counted as saved on hits.
+            vector (Optional[np.ndarray]): The normalized question embedding, if known.
+        """
+        if vector is None:
+            vector = self._embed(query)
+        with self._lock:
+            index = self._indexes.get(scope)
+            if index is None:
+                index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+                self._indexes[scope] = index
+            entry_id = self._next_id
+            self._next_id += 1
+            index.add_with_ids(vector, np.asarray([entry_id], dtype=np.int64))
+            self._entries[entry_id] = (scope, query, value, seconds)
+            self._identifiers[entry_id] = code_identifiers(query)
+            while len(self._entries) > self.max_entries:
+                self._evict()
+
+    def _evict(self) -> None:
+        entry_id, (scope, _, _, _) = self._entries.popitem(last=False)
+        del self._identifiers[entry_id]
+        index = self._indexes[scope]
+        index.remove_ids(np.asarray([entry_id], dtype=np.int64))
+        if index.ntotal == 0:
+            del self._indexes[scope]
+
+    def get_or_compute(self, query: str, scope: str, compute: Callable[[], Any]) -> Any:
+        """
+        Returns the answer of a similar past question, computing it on a miss.
+
+        Args:
+            query (str): The incoming question.
+            scope (str): The index version and model settings of the answer.
+            compute (Callable[[], Any]): Produces the answer on a miss.
+
+        Returns:
+            Any: The cached or computed answer.
+        """
+        value, vector = self._lookup(query, scope)
+        if value is not None:
+            return value
+        start = time.perf_counter()
+        value = compute()
+        self.store(query, scope, value, time.perf_counter() - start, vector)
+        return value
@@ -0,0 +1,454 @@
+import os
+import heapq
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore as LangChainVectorStore
+from pydantic import ConfigDict
+from components.file_discovery import DiscoveryStats
+from components.hybrid_retriever import reciprocal_rank_fusion
+from components.load_document import IndexManager, list_source_files
+from components.metadata_filter import MetadataFilter, MetadataIndex
+from components.vector_store import search_index
+
+# Shard of the files at the top of a codebase, in directory sharding.
+ROOT_SHARD = "_root"
+
+
+class ShardedVectorStore(LangChainVectorStore):
+    """
+    Searches several FAISS stores as one.
+
+    A query is embedded once, searched in every shard on a thread pool, and
+    the per-shard top ``k`` are merged by L2 distance into the global top
+    ``k``, so results are the same as with a single index over all chunks.
+    Shards are replaced copy-on-write with ``replace_shard``: searches in
+    flight keep the shards they started with.
+    """
+
+    def __init__(
+        self,
+        shards: Mapping[str, FAISS],
+        embeddings: Embeddings,
+        max_workers: Optional[int] = None,
+        keys: Optional[Mapping[str, str]] = None,
+    ):
+        """
+        Initializes the ShardedVectorStore.
+
+        Args:
+            shards (Mapping[str, FAISS]): Stores by shard name; all must hold
+                vectors of ``embeddings`` in L2 indexes.
+            embeddings (Embeddings): Embeds the queries.
+            max_workers (Optional[int]): Threads searching shards; defaults to
+                one per shard.
+            keys (Optional[Mapping[str, str]]): Index key of each shard, for
+                caching per-shard structures such as BM25 indexes.
+        """
+        self._shards = dict(shards)
+        self.keys = dict(keys or {})
+        self._embeddings = embeddings
+        self.max_workers = max_workers
+        self._metadata_indexes: Dict[int, MetadataIndex] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embeddings
+
+    @property
+    def shards(self) -> Dict[str, FAISS]:
+        return dict(self._shards)
+
+    @property
+    def ntotal(self) -> int:
+        """Number of vectors in all shards."""
+        return sum(store.index.ntotal for store in self._shards.values())
+
+    def replace_shard(
+        self, name: str, store: Optional[FAISS], key: Optional[str] = None
+    ) -> "ShardedVectorStore":
+        """
+        Returns a store with one shard replaced (or removed if ``store`` is None).
+
+        The other shards are shared with this store, not copied.
+        """
+        shards, keys = dict(self._shards), dict(self.keys)
+        shards.pop(name, None)
+        keys.pop(name, None)
+        if store is not None:
+            shards[name] = store
+            if key is not None:
+                keys[name] = key
+        return ShardedVectorStore(shards, self._embeddings, self.max_workers, keys)
+
+    def _metadata_index(self, store: FAISS) -> MetadataIndex:
+        with self._lock:
+            metadata_index = self._metadata_indexes.get(id(store))
+            if metadata_index is None:
+                metadata_index = MetadataIndex.from_vector_store(store)
+                self._metadata_indexes[id(store)] = metadata_index
+            return metadata_index
+
+    def _search_shard(
+        self,
+        name: str,
+        store: FAISS,
+        vector: np.ndarray,
+        k: int,
+        metadata_filter: Optional[MetadataFilter],
+    ) -> List[Tuple[float, str, int]]:
+        mask = None
+        if metadata_filter:
+            mask = self._metadata_index(store).mask(metadata_filter)
+        distances, positions = search_index(store.index, vector, k, mask)
+        return [
+            (float(distance), name, int(position))
+            for distance, position in zip(distances[0], positions[0])
+            if position >= 0
+        ]
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        metadata_filter: Optional[MetadataFilter] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Returns the ``k`` chunks of all shards nearest to an embedding.
+
+        Args:
+            embedding (List[float]): The query embedding.
+            k (int): Number of results.
+            metadata_filter (Optional[MetadataFilter]): Restricts every shard's
+                search, see ``MetadataIndex.mask``.
+
+        Returns:
+            List[Tuple[Document, float]]: Chunks with their L2 distance, nearest
+            first; each chunk's metadata names its ``shard``.
+        """
+        shards = self._shards
+        if not shards:
+            return []
+        vector = np.asarray([embedding], dtype=np.float32)
+        workers = self.max_workers or len(shards)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    self._search_shard, name, store, vector, k, metadata_filter
+                )
+                for name, store in shards.items()
+            ]
+            hits = heapq.nsmallest(
+                k, (hit for future in futures for hit in future.result())
+            )
+        results = []
+        for distance, name, position in hits:
+            store = shards[name]
+            document = store.docstore.search(store.index_to_docstore_id[position])
+            results.append(
+                (
+                    Document(
+                        id=document.id,
+                        page_content=document.page_content,
+                        metadata=dict(document.metadata, shard=name),
+                    ),
+                    distance,
+                )
+            )
+        return results
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        embedding = self._embeddings.embed_query(query)
+        return self.similarity_search_with_score_by_vector(embedding, k, **kwargs)
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            document
+            for document, _ in self.similarity_search_with_score_by_vector(
+                embedding, k, **kwargs
+            )
+        ]
+
+    def similarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Document]:
+        return [
+            document
+            for document, _ in self.similarity_search_with_score(query, k, **kwargs)
+        ]
+
+    def add_texts(self, texts: Iterable[str], metadatas=None, **kwargs) -> List[str]:
+        raise NotImplementedError("Shards are built by their IndexManager.")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("Shards are built by their IndexManager.")
+
+
+class ShardedRetriever(BaseRetriever):
+    """
+    Hybrid retrieval over shards, fused once across all of them.
+
+    Every shard's ``HybridRetriever`` returns its dense and BM25 candidates
+    in parallel. The dense candidates are merged by L2 distance and the
+    BM25 candidates by score into two global rankings, which are fused
+    with reciprocal rank fusion, so the results are ranked as if the shards
+    were one index. (Fusing per shard first would tie every shard's best
+    result.) BM25 scores use per-shard term statistics.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    # HybridRetriever of every shard, by shard name
+    retrievers: Dict[str, BaseRetriever]
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+    max_workers: Optional[int] = None
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        if not self.retrievers:
+            return []
+        # The shards share one embedding model; the query is embedded once
+        first = next(iter(self.retrievers.values()))
+        embedding = first.vector_store.embedding_function.embed_query(query)
+        workers = self.max_workers or len(self.retrievers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                name: executor.submit(retriever.rankings, query, embedding)
+                for name, retriever in self.retrievers.items()
+            }
+            rankings = {name: future.result() for name, future in futures.items()}
+        dense = heapq.nsmallest(
+            self.fetch_k,
+            (
+                ((name, doc_id), distance)
+                for name, (shard_dense, _) in rankings.items()
+                for doc_id, distance in shard_dense
+            ),
+            key=lambda item: item[1],
+        )
+        sparse = heapq.nlargest(
+            self.fetch_k,
+            (
+                ((name, doc_id), score)
+                for name, (_, shard_sparse) in rankings.items()
+                for doc_id, score in shard_sparse
+            ),
+            key=lambda item: item[1],
+        )
+        fused = reciprocal_rank_fusion(
+            [[key for key, _ in dense], [key for key, _ in sparse]], self.rrf_k
+        )
+        return [
+            self.retrievers[name].get_document(doc_id, rrf_score=score, shard=name)
+            for (name, doc_id), score in fused[: self.k]
+        ]
+
+
+class ShardedIndexManager:
+    """
+    Builds and updates one index per shard of a codebase or of several.
+
+    Every shard is an ``IndexManager`` with its own saved index, manifest and
+    incremental updates, so a change rebuilds or updates only the shards
+    holding changed files. Shards are either repositories (``by_repository``)
+    or the top-level directories of one codebase (``by_directory``).
+    """
+
+    def __init__(
+        self,
+        managers: Mapping[str, IndexManager],
+        symbol_index=None,
+        max_workers: Optional[int] = None,
+    ):
+        """
+        Initializes the ShardedIndexManager.
+
+        Args:
+            managers (Mapping[str, IndexManager]): Index managers by shard name.
+            symbol_index (SymbolIndex): Symbol table kept up to date with the
+                files of every shard, if any.
+            max_workers (Optional[int]): Threads searching shards.
+        """
+        self.managers = dict(managers)
+        self.symbol_index = symbol_index
+        self.max_workers = max_workers
+        self.index_key: Optional[str] = None
+        self._store: Optional[ShardedVectorStore] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def by_repository(
+        cls, root_dirs: Mapping[str, str], faiss_path: str = "faiss", **kwargs
+    ) -> "ShardedIndexManager":
+        """
+        Creates one shard per repository.
+
+        Args:
+            root_dirs (Mapping[str, str]): Repository directories by shard name.
+            faiss_path (str): Directory under which each shard saves its index.
+            **kwargs: ``IndexManager`` arguments shared by the shards.
+        """
+        return cls(
+            {
+                name: IndexManager(
+                    root_dir, faiss_path=os.path.join(faiss_path, name), **kwargs
+                )
+                for name, root_dir in root_dirs.items()
+            }
+        )
+
+    @classmethod
+    def by_directory(
+        cls,
+        root_dir: str,
+        faiss_path: str = "faiss",
+        symbol_index=None,
+        **kwargs,
+    ) -> "ShardedIndexManager":
+        """
+        Creates one shard per top-level directory of a codebase.
+
+        Files at the top of the codebase, and in directories created later,
+        go to the ``_root`` shard. Chunk paths stay relative to ``root_dir``.
+
+        Args:
+            root_dir (str): Directory holding the codebase.
+            faiss_path (str): Directory under which each shard saves its index.
+            symbol_index (SymbolIndex): Symbol table of the codebase, if any.
+            **kwargs: ``IndexManager`` arguments shared by the shards.
+        """
+        directories = sorted(
+            {
+                os.path.relpath(path, root_dir).replace(os.sep, "/").split("/")[0]
+                for path in list_source_files(root_dir)
+                if os.sep in os.path.relpath(path, root_dir)
+            }
+        )
+        managers = {
+            name: IndexManager(
+                root_dir,
+                faiss_path=os.path.join(faiss_path, name),
+                include=(f"{name}/*.*",),
+                # Pruning the other directories keeps each shard's walk short
+                exclude=tuple(other for other in directories if other != name),
+                **kwargs,
+            )
+            for name in directories
+        }
+        managers[ROOT_SHARD] = IndexManager(
+            root_dir,
+            faiss_path=os.path.join(faiss_path, ROOT_SHARD),
+            exclude=tuple(directories),
+            **kwargs,
+        )
+        return cls(managers, symbol_index=symbol_index)
+
+    @property
+    def root_dirs(self) -> List[str]:
+        return sorted({manager.root_dir for manager in self.managers.values()})
+
+    @property
+    def root_dir(self) -> str:
+        return os.path.commonpath(self.root_dirs)
+
+    @property
+    def embeddings(self):
+        return next(iter(self.managers.values())).embeddings
+
+    @property
+    def discovery_stats(self) -> DiscoveryStats:
+        """Discovery statistics summed over the shards."""
+        stats = DiscoveryStats()
+        for manager in self.managers.values():
+            if manager.discovery_stats is not None:
+                stats.files += manager.discovery_stats.files
+                stats.bytes += manager.discovery_stats.bytes
+                stats.skipped_files += manager.discovery_stats.skipped_files
+                stats.skipped_bytes += manager.discovery_stats.skipped_bytes
+                stats.pruned_dirs += manager.discovery_stats.pruned_dirs
+        return stats
+
+    @staticmethod
+    def _combine(keys: Mapping[str, str]) -> str:
+        digest = hashlib.sha256()
+        for name in sorted(keys):
+            digest.update(f"{name}\0{keys[name]}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    def compute_key(self) -> str:
+        """Computes a key covering the index keys of every shard."""
+        return self._combine(
+            {name: manager.compute_key() for name, manager in self.managers.items()}
+        )
+
+    def get_vector_store(self) -> ShardedVectorStore:
+        """
+        Returns a store searching every shard, up to date with the files.
+
+        Shards are synced one after the other, since they share the embedding
+        model; unchanged shards are taken from the cache without work. Shards
+        without files are left out.
+        """
+        with self._lock:
+            stores, keys, files = {}, {}, []
+            for name, manager in self.managers.items():
+                keys[name] = manager.compute_key()
+                files.extend(manager.files)
+                if manager.files:
+                    stores[name] = manager.get_vector_store()
+                    keys[name] = manager.index_key
+            self.index_key = self._combine(keys)
+            if self.symbol_index is not None:
+                self.symbol_index.update(files)
+            current = self._store.shards if self._store is not None else {}
+            # Unchanged shards keep the store, and the searches, of the last call
+            if current.keys() != stores.keys() or any(
+                current[name] is not shard for name, shard in stores.items()
+            ):
+                self._store = ShardedVectorStore(
+                    stores,
+                    self.embeddings,
+                    self.max_workers,
+                    {name: keys[name] for name in stores},
+                )
+            return self._store
+
+    def rebuild_shard(self, name: str) -> ShardedVectorStore:
+        """
+        Rebuilds one shard from scratch and swaps it in.
+
+        The other shards and their saved indexes are not touched.
+
+        Args:
+            name (str): The shard to rebuild.
+
+        Returns:
+            ShardedVectorStore: The store with the rebuilt shard.
+        """
+        with self._lock:
+            manager = self.managers[name]
+            store = manager.rebuild()
+            current = self._store or ShardedVectorStore(
+                {}, self.embeddings, self.max_workers
+            )
+            self._store = current.replace_shard(name, store, manager.index_key)
+            logging.info(f"Rebuilt shard {name}: {store.index.ntotal} chunks")
+            return self._store
@@ -1,10 +1,11 @@
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from typing import List, Dict, Any
+from components.code_splitter import PythonCodeSplitter
 
 class TextSplitter:
     """A state-of-the-art text splitting utility for handling large documents."""
 
-    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50, logger: Any = None):
+    def __init__(self, chunk_size: int = 500, chunk_overlap: int = 50, logger: Any = None, mode: str = "recursive"):
         """
         Initialize the TextSplitter with configurable parameters.
         
@@ -12,10 +13,15 @@ class TextSplitter:
             chunk_size (int): The maximum size of each text chunk.
             chunk_overlap (int): The overlap size between consecutive chunks.
             logger (Any): Optional logger for tracking the process.
+            mode (str): "recursive" for fixed-size character chunks, or "ast" for one
+                        chunk per Python function, method or class.
         """
+        if mode not in ("recursive", "ast"):
+            raise ValueError(f"Invalid mode: {mode!r}. Expected 'recursive' or 'ast'.")
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.logger = logger or self._default_logger
+        self.mode = mode
+        self.logger = logger or self._default_logger()
 
     def split(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -32,14 +38,20 @@ class TextSplitter:
         if not documents or not isinstance(documents, list):
             raise ValueError("Invalid input: 'documents' should be a non-empty list.")
 
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size, 
-            chunk_overlap=self.chunk_overlap
-        )
+        if self.mode == "ast":
+            text_splitter = PythonCodeSplitter(
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap
+            )
+        else:
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=self.chunk_size, 
+                chunk_overlap=self.chunk_overlap
+            )
 
         try:
             if self.logger:
-                self.logger.info(f"Splitting {len(documents)} documents with chunk_size={self.chunk_size} and chunk_overlap={self.chunk_overlap}.")
+                self.logger.info(f"Splitting {len(documents)} documents in {self.mode} mode with chunk_size={self.chunk_size} and chunk_overlap={self.chunk_overlap}.")
 
             chunks = text_splitter.split_documents(documents)
 
@@ -0,0 +1,269 @@
+import os
+import time
+import queue
+import logging
+import threading
+from typing import Iterable, List, Optional, Tuple
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from components.mmap_docstore import MmapDocstoreWriter
+from components.vector_store import VectorStore
+
+# Marks the end of a stage's output.
+_DONE = object()
+
+
+class MemoryBudget:
+    """
+    Bounds the bytes held by batches between ingestion stages.
+
+    ``acquire`` blocks while the batches in flight would exceed the
+    ceiling, which throttles the stages upstream of the slowest one. A
+    single batch larger than the ceiling is still let through alone, so
+    ingestion cannot deadlock.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.in_flight = 0
+        self.peak = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, size: int, stop: threading.Event) -> bool:
+        """Waits for room for ``size`` bytes; returns False if ``stop`` is set."""
+        with self._condition:
+            while self.in_flight and self.in_flight + size > self.max_bytes:
+                if stop.is_set():
+                    return False
+                self._condition.wait(0.1)
+            self.in_flight += size
+            self.peak = max(self.peak, self.in_flight)
+            return True
+
+    def add(self, size: int) -> None:
+        """Counts bytes produced by a stage that already holds a reservation."""
+        with self._condition:
+            self.in_flight += size
+            self.peak = max(self.peak, self.in_flight)
+
+    def release(self, size: int) -> None:
+        with self._condition:
+            self.in_flight -= size
+            self._condition.notify_all()
+
+
+class IngestStats:
+    """Counters and timings of a streaming ingestion."""
+
+    def __init__(self):
+        self.files = 0
+        self.chunks = 0
+        self.batches = 0
+        self.embed_seconds = 0.0
+        self.seconds = 0.0
+        self.peak_bytes = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "files": self.files,
+            "chunks": self.chunks,
+            "batches": self.batches,
+            "embed_seconds": self.embed_seconds,
+            "seconds": self.seconds,
+            "peak_bytes": self.peak_bytes,
+        }
+
+    def summary(self) -> str:
+        return (
+            f"{self.chunks} chunks of {self.files} files in {self.batches} batches, "
+            f"{self.seconds:.1f}s ({self.embed_seconds:.1f}s embedding), "
+            f"peak {self.peak_bytes / 1024 / 1024:.1f} MiB in flight"
+        )
+
+
+class StreamingIngestor:
+    """
+    Builds an index from a stream of chunks in bounded memory.
+
+    Chunks flow from the caller's generator (reading and splitting files)
+    through an embedding thread to the index in fixed-size batches. Stages
+    are connected by short queues and share a ``MemoryBudget``, so a slow
+    embedder holds back reading instead of letting chunks pile up. Batches
+    are large enough for the embedding engine to spread each one over its
+    process pool. Documents
+    are streamed to the ``MmapDocstore`` files and vectors added to the
+    index batch by batch; the only state that grows with the corpus is the
+    FAISS index itself (use ``ivf_pq`` or ``sq`` to keep it small) and, for
+    trained index types, a training sample of up to ``train_size`` vectors.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 4096,
+        max_memory_bytes: int = 256 * 1024 * 1024,
+        queue_size: int = 2,
+    ):
+        """
+        Initializes the StreamingIngestor.
+
+        Args:
+            batch_size (int): Chunks per embedding batch. Keep it at or above
+                the embedding engine's ``min_parallel_chunks``, or every batch
+                is encoded in-process instead of on the process pool.
+            max_memory_bytes (int): Ceiling on the bytes of batches in flight.
+            queue_size (int): Batches buffered between two stages.
+        """
+        self.batch_size = batch_size
+        self.max_memory_bytes = max_memory_bytes
+        self.queue_size = queue_size
+
+    def ingest(
+        self,
+        files: Iterable[Tuple[List[str], List[Document]]],
+        embeddings,
+        vector_store: VectorStore,
+        directory: str,
+    ) -> IngestStats:
+        """
+        Embeds and indexes a stream of chunks into ``directory``.
+
+        The directory receives the layout written by ``VectorStore.save_mmap``
+        and is opened with ``VectorStore.load_mmap``.
+
+        Args:
+            files (Iterable[Tuple[List[str], List[Document]]]): Vector IDs and
+                chunks, one item per file; consumed lazily on a worker thread.
+            embeddings: The embeddings object used to embed the chunks.
+            vector_store (VectorStore): Creates and trains the index.
+            directory (str): Target directory.
+
+        Returns:
+            IngestStats: Counters and timings of the ingestion.
+
+        Raises:
+            ValueError: If the stream holds no chunks.
+        """
+        start = time.perf_counter()
+        stats = IngestStats()
+        budget = MemoryBudget(self.max_memory_bytes)
+        stop = threading.Event()
+        chunks_queue = queue.Queue(self.queue_size)
+        vectors_queue = queue.Queue(self.queue_size)
+        errors = []
+
+        def put(q: queue.Queue, item) -> bool:
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(q: queue.Queue):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return _DONE
+
+        def produce():
+            batch, size = [], 0
+            try:
+                for ids, chunks in files:
+                    stats.files += 1
+                    for doc_id, chunk in zip(ids, chunks):
+                        batch.append((doc_id, chunk))
+                        size += len(chunk.page_content.encode("utf-8"))
+                        if len(batch) < self.batch_size:
+                            continue
+                        if not budget.acquire(size, stop) or not put(
+                            chunks_queue, (batch, size)
+                        ):
+                            return
+                        batch, size = [], 0
+                if batch and budget.acquire(size, stop):
+                    put(chunks_queue, (batch, size))
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                put(chunks_queue, _DONE)
+
+        def embed():
+            try:
+                while True:
+                    item = get(chunks_queue)
+                    if item is _DONE:
+                        break
+                    batch, size = item
+                    embed_start = time.perf_counter()
+                    vectors = np.asarray(
+                        embeddings.embed_documents([c.page_content for _, c in batch]),
+                        dtype=np.float32,
+                    )
+                    stats.embed_seconds += time.perf_counter() - embed_start
+                    # The reading stage is held back by the vectors too
+                    budget.add(vectors.nbytes)
+                    size += vectors.nbytes
+                    if not put(vectors_queue, (batch, size, vectors)):
+                        return
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                put(vectors_queue, _DONE)
+
+        workers = [
+            threading.Thread(target=produce, name="ingest-split", daemon=True),
+            threading.Thread(target=embed, name="ingest-embed", daemon=True),
+        ]
+        for worker in workers:
+            worker.start()
+        index: Optional[faiss.Index] = None
+        # Vectors held back until a trained index type has its training sample
+        pending: List[np.ndarray] = []
+        try:
+            with MmapDocstoreWriter(directory) as writer:
+                while True:
+                    item = get(vectors_queue)
+                    if item is _DONE:
+                        break
+                    batch, size, vectors = item
+                    for doc_id, chunk in batch:
+                        writer.add(chunk, doc_id)
+                    stats.chunks += len(batch)
+                    stats.batches += 1
+                    if index is None and vector_store.index_type == "flat":
+                        index = vector_store.create_index(vectors)
+                    if index is None:
+                        pending.append(vectors)
+                        if sum(len(v) for v in pending) >= vector_store.train_size:
+                            index = self._train(vector_store, pending)
+                            pending = []
+                    else:
+                        index.add(vectors)
+                    budget.release(size)
+                    logging.debug(f"Ingested {stats.chunks} chunks")
+            if errors:
+                raise errors[0]
+            if pending:
+                index = self._train(vector_store, pending)
+            if index is None:
+                raise ValueError("No text chunks available to process.")
+            faiss.write_index(index, os.path.join(directory, "index.faiss"))
+        finally:
+            stop.set()
+            for worker in workers:
+                worker.join()
+        stats.seconds = time.perf_counter() - start
+        stats.peak_bytes = budget.peak
+        logging.info(f"Streaming ingestion: {stats.summary()}")
+        return stats
+
+    @staticmethod
+    def _train(vector_store: VectorStore, pending: List[np.ndarray]) -> faiss.Index:
+        sample = np.concatenate(pending)
+        index = vector_store.create_index(sample)
+        index.add(sample)
+        return index
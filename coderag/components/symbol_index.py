@@ -0,0 +1,374 @@
+import os
+import re
+import ast
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+
+PYTHON_EXTENSIONS = (".py", ".pyw", ".pyi")
+
+_IDENTIFIER = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(?:\.[A-Za-z_][A-Za-z0-9_]*)*")
+_LOCATION_QUESTION = re.compile(
+    r"\b(where|which file|find|locate|show)\b.*"
+    r"\b(defined|declared|implemented|used|called|imported|referenced|definition)\b"
+    r"|\b(callers|usages|references|definition) of\b",
+    re.IGNORECASE,
+)
+_USAGE_QUESTION = re.compile(
+    r"\b(used|called|referenced|callers|usages|references)\b", re.IGNORECASE
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files
+    (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER);
+CREATE TABLE IF NOT EXISTS symbols
+    (path TEXT, name TEXT, qualname TEXT, kind TEXT, line INTEGER, end_line INTEGER);
+CREATE TABLE IF NOT EXISTS imports
+    (path TEXT, module TEXT, name TEXT, alias TEXT, line INTEGER);
+CREATE TABLE IF NOT EXISTS refs (path TEXT, name TEXT, line INTEGER);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name);
+CREATE INDEX IF NOT EXISTS symbols_qualname ON symbols (qualname);
+CREATE INDEX IF NOT EXISTS symbols_path ON symbols (path);
+CREATE INDEX IF NOT EXISTS imports_name ON imports (name);
+CREATE INDEX IF NOT EXISTS imports_module ON imports (module);
+CREATE INDEX IF NOT EXISTS imports_path ON imports (path);
+CREATE INDEX IF NOT EXISTS refs_name ON refs (name);
+CREATE INDEX IF NOT EXISTS refs_path ON refs (path);
+"""
+
+
+class _SymbolVisitor(ast.NodeVisitor):
+    def __init__(self):
+        self.definitions: List[Tuple[str, str, str, int, int]] = []
+        self.imports: List[Tuple[Optional[str], str, Optional[str], int]] = []
+        self.references: List[Tuple[str, int]] = []
+        self._scopes: List[Tuple[str, str]] = []
+
+    def _define(self, node, kind: str):
+        qualname = ".".join([name for name, _ in self._scopes] + [node.name])
+        self.definitions.append(
+            (node.name, qualname, kind, node.lineno, node.end_lineno)
+        )
+        self._scopes.append((node.name, kind))
+        self.generic_visit(node)
+        self._scopes.pop()
+
+    def visit_ClassDef(self, node):
+        self._define(node, "class")
+
+    def visit_FunctionDef(self, node):
+        in_class = self._scopes and self._scopes[-1][1] == "class"
+        self._define(node, "method" if in_class else "function")
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Assign(self, node):
+        # Module-level names, e.g. constants, are definitions too
+        if not self._scopes:
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    self.definitions.append(
+                        (target.id, target.id, "variable", node.lineno, node.end_lineno)
+                    )
+        self.generic_visit(node)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.imports.append((alias.name, alias.name, alias.asname, node.lineno))
+
+    def visit_ImportFrom(self, node):
+        module = "." * node.level + (node.module or "")
+        for alias in node.names:
+            self.imports.append((module, alias.name, alias.asname, node.lineno))
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Name):
+            self.references.append((node.func.id, node.lineno))
+        elif isinstance(node.func, ast.Attribute):
+            self.references.append((node.func.attr, node.lineno))
+        self.generic_visit(node)
+
+
+def extract_symbols(source: str) -> Optional[_SymbolVisitor]:
+    """
+    Extracts the definitions, imports and call sites of a Python source.
+
+    Args:
+        source (str): The Python source code.
+
+    Returns:
+        Optional[_SymbolVisitor]: The extracted symbols, or None if the
+        source does not parse.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    visitor = _SymbolVisitor()
+    visitor.visit(tree)
+    return visitor
+
+
+class SymbolIndex:
+    """
+    A persistent symbol and cross-reference table of a codebase.
+
+    Definitions (classes, functions, methods and module-level names),
+    imports and call sites of every Python file are stored in an SQLite
+    database, so "where is X defined/used" questions are answered with
+    indexed lookups instead of a vector search and an LLM call. ``update``
+    only re-parses files whose size or modification time changed.
+    """
+
+    def __init__(self, root_dir: str, db_path: str):
+        """
+        Opens or creates the symbol index.
+
+        Args:
+            root_dir (str): Directory of the codebase; paths are stored relative to it.
+            db_path (str): Path of the SQLite database.
+        """
+        self.root_dir = root_dir
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+        # Guards the connection: readers must not see a file half re-indexed
+        self._lock = threading.Lock()
+
+    def _query(self, sql: str, parameters: tuple) -> List[dict]:
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, parameters)]
+
+    def _forget(self, relative_path: str) -> None:
+        for table in ("files", "symbols", "imports", "refs"):
+            self._db.execute(f"DELETE FROM {table} WHERE path = ?", (relative_path,))
+
+    def _index_file(self, path: str, relative_path: str, stat) -> None:
+        self._forget(relative_path)
+        self._db.execute(
+            "INSERT INTO files (path, size, mtime_ns) VALUES (?, ?, ?)",
+            (relative_path, stat.st_size, stat.st_mtime_ns),
+        )
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                symbols = extract_symbols(f.read())
+        except OSError:
+            symbols = None
+        if symbols is None:
+            return
+        self._db.executemany(
+            "INSERT INTO symbols (path, name, qualname, kind, line, end_line) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(relative_path, *definition) for definition in symbols.definitions],
+        )
+        self._db.executemany(
+            "INSERT INTO imports (path, module, name, alias, line) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(relative_path, *imported) for imported in symbols.imports],
+        )
+        self._db.executemany(
+            "INSERT INTO refs (path, name, line) VALUES (?, ?, ?)",
+            [(relative_path, *reference) for reference in symbols.references],
+        )
+
+    def update(self, paths: Sequence[str]) -> Dict[str, int]:
+        """
+        Brings the index in line with the given files.
+
+        Files that are new or whose size or modification time changed are
+        re-parsed; indexed files missing from ``paths`` are removed.
+
+        Args:
+            paths (Sequence[str]): The current files of the codebase.
+
+        Returns:
+            Dict[str, int]: Number of files ``indexed`` and ``removed``.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            known = {
+                row["path"]: (row["size"], row["mtime_ns"])
+                for row in self._db.execute("SELECT path, size, mtime_ns FROM files")
+            }
+            indexed = 0
+            current = set()
+            for path in paths:
+                if not path.endswith(PYTHON_EXTENSIONS):
+                    continue
+                relative_path = os.path.relpath(path, self.root_dir)
+                current.add(relative_path)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if known.get(relative_path) != (stat.st_size, stat.st_mtime_ns):
+                    self._index_file(path, relative_path, stat)
+                    indexed += 1
+            removed = [path for path in known if path not in current]
+            for relative_path in removed:
+                self._forget(relative_path)
+            self._db.commit()
+        if indexed or removed:
+            logging.info(
+                f"Symbol index: {indexed} files indexed, {len(removed)} removed "
+                f"in {time.perf_counter() - start:.2f}s"
+            )
+        return {"indexed": indexed, "removed": len(removed)}
+
+    def definitions(self, name: str) -> List[dict]:
+        """Returns the definitions of a name or qualified name."""
+        column = "qualname" if "." in name else "name"
+        return self._query(
+            f"SELECT path, name, qualname, kind, line, end_line FROM symbols "
+            f"WHERE {column} = ? ORDER BY path, line",
+            (name,),
+        )
+
+    def references(self, name: str) -> List[dict]:
+        """Returns the call sites of a name (the last part of a qualified name)."""
+        return self._query(
+            "SELECT path, name, line FROM refs WHERE name = ? ORDER BY path, line",
+            (name.rsplit(".", 1)[-1],),
+        )
+
+    def importers(self, name: str) -> List[dict]:
+        """Returns the imports of a name or of a module."""
+        return self._query(
+            "SELECT path, module, name, alias, line FROM imports "
+            "WHERE name = ? OR module = ? ORDER BY path, line",
+            (name.rsplit(".", 1)[-1], name),
+        )
+
+    def symbols_in(self, text: str) -> List[str]:
+        """Returns the identifiers of a text that are defined in the codebase."""
+        candidates = list(dict.fromkeys(_IDENTIFIER.findall(text)))
+        found = []
+        for candidate in candidates:
+            if self.definitions(candidate):
+                found.append(candidate)
+        return found
+
+    def lookup(self, query: str) -> Dict[str, dict]:
+        """
+        Resolves the symbols mentioned in a query.
+
+        Args:
+            query (str): A question such as "where is IndexManager used?".
+
+        Returns:
+            Dict[str, dict]: For every defined symbol of the query, its
+            ``definitions``, ``references`` and ``imports``.
+        """
+        return {
+            symbol: {
+                "definitions": self.definitions(symbol),
+                "references": self.references(symbol),
+                "imports": self.importers(symbol),
+            }
+            for symbol in self.symbols_in(query)
+        }
+
+    def answer(self, query: str, limit: int = 20) -> Optional[str]:
+        """
+        Answers a symbol location question directly, without an LLM.
+
+        Args:
+            query (str): The question.
+            limit (int): Maximum number of locations listed per section.
+
+        Returns:
+            Optional[str]: A markdown answer, or None if the query is not a
+            location question about a known symbol.
+        """
+        if not _LOCATION_QUESTION.search(query):
+            return None
+        results = self.lookup(query)
+        if not results:
+            return None
+        lines = []
+        for symbol, found in results.items():
+            lines.append(f"**`{symbol}`**")
+            sections = [
+                ("Defined in", found["definitions"], "kind"),
+                ("Imported in", found["imports"], None),
+                ("Called in", found["references"], None),
+            ]
+            for title, rows, kind in sections:
+                if not rows:
+                    continue
+                lines.append(f"{title}:")
+                for row in rows[:limit]:
+                    suffix = f" ({row[kind]})" if kind else ""
+                    lines.append(f"- `{row['path']}:{row['line']}`{suffix}")
+                if len(rows) > limit:
+                    lines.append(f"- ... and {len(rows) - limit} more")
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class SymbolRetriever(BaseRetriever):
+    """
+    Retrieves the source of the symbols named in a query from a SymbolIndex.
+
+    Definitions are returned as their full source; call sites as a few lines
+    of context. Questions about usage list call sites first.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    symbol_index: SymbolIndex
+    k: int = 4
+    context_lines: int = 2
+
+    def _read_lines(self, relative_path: str) -> List[str]:
+        path = os.path.join(self.symbol_index.root_dir, relative_path)
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                return f.read().splitlines(keepends=True)
+        except OSError:
+            return []
+
+    def _document(self, row: dict, start: int, end: int, kind: str) -> Document:
+        lines = self._read_lines(row["path"])
+        return Document(
+            page_content="".join(lines[max(start, 1) - 1 : end]),
+            metadata={
+                "source": os.path.join(self.symbol_index.root_dir, row["path"]),
+                "symbol": row.get("qualname", row["name"]),
+                "kind": kind,
+                "start_line": max(start, 1),
+                "end_line": end,
+            },
+        )
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        definitions, references = [], []
+        for found in self.symbol_index.lookup(query).values():
+            for row in found["definitions"]:
+                definitions.append(
+                    self._document(row, row["line"], row["end_line"], row["kind"])
+                )
+            for row in found["references"]:
+                references.append(
+                    self._document(
+                        row,
+                        row["line"] - self.context_lines,
+                        row["line"] + self.context_lines,
+                        "call",
+                    )
+                )
+        if _USAGE_QUESTION.search(query):
+            return (references + definitions)[: self.k]
+        return (definitions + references)[: self.k]
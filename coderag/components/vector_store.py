@@ -1,28 +1,124 @@
+import os
+import math
+import time
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
-from typing import List, Any
+from typing import Dict, List, Any, Optional
 from config.constants import DOCS_DIR
+from components.index_manifest import FileChanges, IndexManifest
+from components.mmap_docstore import MmapDocstore, MmapDocstoreWriter, RowIds
+
+# Index types supported by ``VectorStore``; "flat" is exact search.
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "sq")
 
 
 class VectorStore:
     """
     A state-of-the-art utility for initializing vector stores using FAISS.
+
+    Besides the exact ``flat`` index, approximate indexes trade accuracy for
+    memory and latency on large codebases: ``hnsw`` (IndexHNSWFlat),
+    ``ivf_flat`` (IndexIVFFlat), ``ivf_pq`` (IndexIVFPQ) and ``sq``
+    (IndexScalarQuantizer). IVF and quantized indexes are trained on a sample
+    of the vectors; ``nprobe`` and ``ef_search`` tune search-time accuracy.
     """
 
-    def __init__(self, logger: Any = None):
+    def __init__(
+        self,
+        logger: Any = None,
+        index_type: str = "flat",
+        nlist: Optional[int] = None,
+        hnsw_m: int = 32,
+        ef_construction: int = 200,
+        pq_m: Optional[int] = None,
+        pq_nbits: int = 8,
+        sq_type: str = "QT_8bit",
+        train_size: int = 100_000,
+        nprobe: int = 16,
+        ef_search: int = 64,
+        recall_queries: int = 0,
+        recall_sample: int = 10_000,
+    ):
         """
-        Initializes the VectorStore with an optional logger.
+        Initializes the VectorStore with an optional logger and index options.
 
         Args:
             logger (Any): Optional logger for tracking the process.
+            index_type (str): One of ``INDEX_TYPES``.
+            nlist (Optional[int]): IVF cells; defaults to ``4 * sqrt(n)``.
+            hnsw_m (int): Neighbors per HNSW node.
+            ef_construction (int): HNSW build-time search depth.
+            pq_m (Optional[int]): PQ sub-quantizers; defaults to one per 8 dimensions.
+            pq_nbits (int): Bits per PQ code.
+            sq_type (str): Scalar quantizer type, e.g. ``QT_8bit`` or ``QT_fp16``.
+            train_size (int): Maximum number of vectors used for training.
+            nprobe (int): IVF cells visited per query.
+            ef_search (int): HNSW search depth.
+            recall_queries (int): Held-out queries used to report recall@k after
+                building an approximate index; 0 (the default) disables the report.
+            recall_sample (int): Maximum number of indexed vectors the recall
+                report searches exactly.
         """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(
+                f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}."
+            )
         self.logger = logger or self._default_logger()
+        self.index_type = index_type
+        self.nlist = nlist
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+        self.sq_type = sq_type
+        self.train_size = train_size
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.recall_queries = recall_queries
+        self.recall_sample = recall_sample
+
+    @property
+    def build_params(self) -> Dict[str, Any]:
+        """Options that change the content of a built index."""
+        params = {"index_type": self.index_type}
+        if self.index_type == "hnsw":
+            params.update(hnsw_m=self.hnsw_m, ef_construction=self.ef_construction)
+        if self.index_type in ("ivf_flat", "ivf_pq"):
+            params.update(nlist=self.nlist)
+        if self.index_type == "ivf_pq":
+            params.update(pq_m=self.pq_m, pq_nbits=self.pq_nbits)
+        if self.index_type == "sq":
+            params.update(sq_type=self.sq_type)
+        return params
 
-    def initialize_faiss_store(self, texts: List[str], embeddings=List[str]) -> FAISS:
+    @property
+    def supports_removal(self) -> bool:
+        """
+        Whether vectors can be removed from the index in place.
+
+        HNSW cannot remove vectors, and IVF indexes keep the IDs of the
+        remaining vectors while the LangChain wrapper renumbers them, so
+        removals on those indexes require a rebuild.
+        """
+        return self.index_type in ("flat", "sq")
+
+    def initialize_faiss_store(
+        self,
+        texts: List[str],
+        embeddings=None,
+        ids: Optional[List[str]] = None,
+        save_dir: Optional[str] = DOCS_DIR,
+    ) -> FAISS:
         """
         Sets up the FAISS vector store with the provided texts and embeddings.
 
         Args:
             texts (List[str]): A list of textual documents to be embedded and stored.
+            embeddings: The embeddings object used to embed the texts.
+            ids (Optional[List[str]]): Vector IDs for the texts, e.g. from an IndexManifest.
+            save_dir (Optional[str]): Where to save the store; ``None`` skips saving.
 
         Returns:
             FAISS: The initialized FAISS vector store.
@@ -37,14 +133,20 @@ class VectorStore:
 
         if self.logger:
             self.logger.info(
-                f"Initializing FAISS with {len(texts)} documents using embeddings: {self.embeddings}."
+                f"Initializing FAISS with {len(texts)} documents using embeddings: {embeddings}."
             )
 
         try:
             # Initialize FAISS vector store
-            vector_store = FAISS.from_documents(documents=texts, embedding=embeddings)
+            if self.index_type == "flat":
+                vector_store = FAISS.from_documents(
+                    documents=texts, embedding=embeddings, ids=ids
+                )
+            else:
+                vector_store = self._build_approximate_store(texts, embeddings, ids)
 
-            vector_store.save_local(DOCS_DIR)
+            if save_dir:
+                vector_store.save_local(save_dir)
 
             if self.logger:
                 self.logger.info(
@@ -57,6 +159,330 @@ class VectorStore:
                 self.logger.error(f"Error initializing FAISS vector store: {e}")
             raise
 
+    def _build_approximate_store(self, texts, embeddings, ids) -> FAISS:
+        vectors = np.asarray(
+            embeddings.embed_documents([t.page_content for t in texts]),
+            dtype=np.float32,
+        )
+        return self.build_from_vectors(texts, vectors, embeddings, ids)
+
+    def build_from_vectors(
+        self,
+        texts: List[Any],
+        vectors: np.ndarray,
+        embeddings=None,
+        ids: Optional[List[str]] = None,
+    ) -> FAISS:
+        """
+        Builds a FAISS store of ``self.index_type`` from precomputed vectors.
+
+        Args:
+            texts (List[Document]): The documents, in the order of ``vectors``.
+            vectors (np.ndarray): Their embeddings, shape (n, d).
+            embeddings: The embeddings object used to embed queries.
+            ids (Optional[List[str]]): Vector IDs for the documents.
+
+        Returns:
+            FAISS: The vector store.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        index = self.create_index(vectors)
+        vector_store = FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=InMemoryDocstore(),
+            index_to_docstore_id={},
+        )
+        vector_store.add_embeddings(
+            text_embeddings=[(t.page_content, v) for t, v in zip(texts, vectors)],
+            metadatas=[t.metadata for t in texts],
+            ids=ids,
+        )
+        self.set_search_params(vector_store)
+        if self.index_type != "flat" and self.recall_queries and self.logger:
+            report = self.evaluate_recall(vector_store, vectors)
+            self.logger.info(f"{self.index_type} index quality: {report}")
+        return vector_store
+
+    def create_index(self, vectors: np.ndarray) -> faiss.Index:
+        """
+        Creates and, if needed, trains an empty index of ``self.index_type``.
+
+        Args:
+            vectors (np.ndarray): The vectors to index; a sample is used for training.
+
+        Returns:
+            faiss.Index: The trained, still empty index.
+        """
+        n, dim = vectors.shape
+        if self.index_type == "flat":
+            return faiss.IndexFlatL2(dim)
+        if self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, self.hnsw_m)
+            index.hnsw.efConstruction = self.ef_construction
+            return index
+
+        if self.index_type == "sq":
+            index = faiss.IndexScalarQuantizer(
+                dim, getattr(faiss.ScalarQuantizer, self.sq_type), faiss.METRIC_L2
+            )
+        else:
+            # Each IVF cell needs enough training points (faiss asks for ~39)
+            nlist = self.nlist or int(4 * math.sqrt(n))
+            nlist = max(1, min(nlist, n // 39 or 1))
+            quantizer = faiss.IndexFlatL2(dim)
+            if self.index_type == "ivf_flat":
+                index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_L2)
+            else:
+                pq_m = self.pq_m or _largest_divisor(dim, max(1, dim // 8))
+                # PQ codebooks need at least 2**nbits training points
+                nbits = min(self.pq_nbits, max(1, int(math.log2(max(n, 2)))))
+                index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, nbits)
+
+        sample = vectors
+        if n > self.train_size:
+            rows = np.random.default_rng(0).choice(n, self.train_size, replace=False)
+            sample = vectors[rows]
+        start = time.perf_counter()
+        index.train(sample)
+        if self.logger:
+            self.logger.info(
+                f"Trained {self.index_type} index on {len(sample)} vectors "
+                f"in {time.perf_counter() - start:.2f}s"
+            )
+        return index
+
+    def set_search_params(
+        self,
+        vector_store: FAISS,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> None:
+        """
+        Sets the search-time accuracy knobs of an approximate index.
+
+        Args:
+            vector_store (FAISS): The store whose index is tuned.
+            nprobe (Optional[int]): IVF cells visited per query.
+            ef_search (Optional[int]): HNSW search depth.
+        """
+        index = vector_store.index
+        if isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efSearch = ef_search or self.ef_search
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = min(nprobe or self.nprobe, ivf.nlist)
+
+    def evaluate_recall(
+        self,
+        vector_store: FAISS,
+        vectors: np.ndarray,
+        k: int = 10,
+        queries: Optional[np.ndarray] = None,
+    ) -> Dict[str, float]:
+        """
+        Measures recall@k of a store's index against exact flat search.
+
+        Both searches are restricted to a random sample of at most
+        ``recall_sample`` indexed vectors, so the exact baseline stays small
+        on large corpora. Default queries are held out: indexed vectors left
+        out of the sample, so no query finds itself.
+
+        Args:
+            vector_store (FAISS): The store to evaluate.
+            vectors (np.ndarray): The indexed vectors, in index order.
+            k (int): Number of neighbors compared.
+            queries (Optional[np.ndarray]): Query vectors; defaults to
+                ``recall_queries`` held-out indexed vectors.
+
+        Returns:
+            Dict[str, float]: ``recall@k``, per-query latencies of both
+            indexes in milliseconds, the sample size and the index size in
+            bytes.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        n = len(vectors)
+        rng = np.random.default_rng(1)
+        if queries is None:
+            count = max(1, min(self.recall_queries or 100, n // 2))
+            rows = rng.choice(n, min(n, count + self.recall_sample), replace=False)
+            queries, rows = vectors[rows[:count]], rows[count:]
+        else:
+            rows = rng.choice(n, min(n, self.recall_sample), replace=False)
+        rows = np.sort(rows).astype(np.int64)
+        queries = np.asarray(queries, dtype=np.float32)
+        k = min(k, len(rows))
+
+        baseline = faiss.IndexFlatL2(vectors.shape[1])
+        baseline.add(vectors[rows])
+        start = time.perf_counter()
+        _, expected = baseline.search(queries, k)
+        flat_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        expected = rows[expected]
+        selector = faiss.IDSelectorBatch(rows)
+        start = time.perf_counter()
+        _, found = vector_store.index.search(
+            queries, k, params=self._search_params(vector_store.index, selector)
+        )
+        ann_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        hits = sum(
+            len(set(e) & set(f)) for e, f in zip(expected.tolist(), found.tolist())
+        )
+        return {
+            f"recall@{k}": hits / (len(queries) * k),
+            "ann_ms": ann_ms,
+            "flat_ms": flat_ms,
+            "sample": len(rows),
+            "index_bytes": int(faiss.serialize_index(vector_store.index).nbytes),
+            "flat_bytes": int(vectors.nbytes),
+        }
+
+    @staticmethod
+    def _search_params(index: faiss.Index, selector) -> faiss.SearchParameters:
+        # Per-call parameters replace the index's own, so carry them over
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+        if isinstance(index, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(
+                sel=selector, efSearch=index.hnsw.efSearch
+            )
+        return faiss.SearchParameters(sel=selector)
+
+    def save_mmap(self, vector_store: FAISS, directory: str) -> None:
+        """
+        Saves a store in the memory-mappable layout read by ``load_mmap``.
+
+        The index is written with ``faiss.write_index`` to ``index.faiss`` and
+        the documents, in index order, to the compact ``MmapDocstore`` files
+        instead of a pickle.
+
+        Args:
+            vector_store (FAISS): The store to save.
+            directory (str): Target directory; may also hold a ``save_local`` copy.
+        """
+        os.makedirs(directory, exist_ok=True)
+        faiss.write_index(vector_store.index, os.path.join(directory, "index.faiss"))
+        with MmapDocstoreWriter(directory) as writer:
+            for position in range(vector_store.index.ntotal):
+                doc_id = vector_store.index_to_docstore_id[position]
+                writer.add(vector_store.docstore.search(doc_id), doc_id)
+        if self.logger:
+            self.logger.info(
+                f"Saved {vector_store.index.ntotal} vectors in mmap layout to {directory}"
+            )
+
+    def load_mmap(self, directory: str, embeddings, in_memory: bool = False) -> FAISS:
+        """
+        Opens a store saved by ``save_mmap`` without reading it into memory.
+
+        The index is opened with ``IO_FLAG_MMAP`` and the docstore is memory
+        mapped, so processes serving the same index share its pages through
+        the OS cache. The returned store is read-only.
+
+        Args:
+            directory (str): Directory written by ``save_mmap``.
+            embeddings: The embeddings object used to embed queries.
+            in_memory (bool): Read the index and documents into memory instead,
+                giving a private store that can be updated.
+
+        Returns:
+            FAISS: A read-only vector store, or an updatable one if ``in_memory``.
+        """
+        if in_memory:
+            index = faiss.read_index(os.path.join(directory, "index.faiss"))
+            docstore = MmapDocstore(directory)
+            documents = [docstore.search(row) for row in range(len(docstore))]
+            ids = [document.id for document in documents]
+            vector_store = FAISS(
+                embedding_function=embeddings,
+                index=index,
+                docstore=InMemoryDocstore(dict(zip(ids, documents))),
+                index_to_docstore_id=dict(enumerate(ids)),
+            )
+            self.set_search_params(vector_store)
+            return vector_store
+        start = time.perf_counter()
+        path = os.path.join(directory, "index.faiss")
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+        try:
+            # Flat code arrays are only mapped with this flag in recent faiss
+            # versions, which reject it for IVF lists (mapped by IO_FLAG_MMAP)
+            ifc_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+            index = faiss.read_index(path, flags | ifc_flag)
+        except RuntimeError:
+            index = faiss.read_index(path, flags)
+        docstore = MmapDocstore(directory)
+        vector_store = FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=RowIds(len(docstore)),
+        )
+        self.set_search_params(vector_store)
+        if self.logger:
+            self.logger.info(
+                f"Opened mmap index with {index.ntotal} vectors from {directory} "
+                f"in {(time.perf_counter() - start) * 1000:.1f}ms"
+            )
+        return vector_store
+
+    def update_faiss_store(
+        self,
+        vector_store: FAISS,
+        manifest: IndexManifest,
+        changes: FileChanges,
+        chunks_by_file: Dict[str, List[Any]],
+    ) -> FAISS:
+        """
+        Applies file-level changes to an existing FAISS vector store in place.
+
+        Vectors of changed and deleted files are removed by the IDs recorded in
+        the manifest, and the chunks of added and changed files are embedded in
+        a single batch and added under new IDs. The manifest is updated to match.
+
+        Args:
+            vector_store (FAISS): The store to update.
+            manifest (IndexManifest): The manifest the store was built from.
+            changes (FileChanges): The result of ``manifest.scan``.
+            chunks_by_file (Dict[str, List[Any]]): Chunks of every file in
+                ``changes.to_index``, keyed by relative path.
+
+        Returns:
+            FAISS: The updated vector store.
+        """
+        stale_ids = manifest.ids_for(changes.to_remove)
+        if self.logger:
+            self.logger.info(
+                f"Updating FAISS store: {changes}, removing {len(stale_ids)} vectors."
+            )
+
+        try:
+            if stale_ids:
+                vector_store.delete(stale_ids)
+            for relative_path in changes.deleted:
+                manifest.forget(relative_path)
+
+            documents, ids = [], []
+            for relative_path in changes.to_index:
+                chunks = chunks_by_file.get(relative_path, [])
+                chunk_ids = IndexManifest.chunk_ids(relative_path, len(chunks))
+                documents.extend(chunks)
+                ids.extend(chunk_ids)
+                manifest.record(relative_path, chunk_ids)
+
+            if documents:
+                vector_store.add_documents(documents, ids=ids)
+
+            if self.logger:
+                self.logger.info(f"Added {len(documents)} vectors to the FAISS store.")
+            return vector_store
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"Error updating FAISS vector store: {e}")
+            raise
+
     @staticmethod
     def _default_logger():
         """Fallback logger for basic logging."""
@@ -64,3 +490,52 @@ class VectorStore:
 
         logging.basicConfig(level=logging.INFO)
         return logging.getLogger(__name__)
+
+
+def _largest_divisor(n: int, limit: int) -> int:
+    """Largest divisor of ``n`` that is not greater than ``limit``."""
+    for candidate in range(limit, 0, -1):
+        if n % candidate == 0:
+            return candidate
+    return 1
+
+
+def search_index(
+    index: faiss.Index,
+    vectors: np.ndarray,
+    k: int,
+    mask: Optional[np.ndarray] = None,
+):
+    """
+    Searches a FAISS index, optionally restricted to a subset of positions.
+
+    The subset is passed to FAISS as an ``IDSelectorBitmap``, so excluded
+    vectors are skipped during the search itself rather than filtered out
+    of an over-fetched result. The index's own ``nprobe``/``efSearch``
+    settings are kept.
+
+    Args:
+        index (faiss.Index): The index to search.
+        vectors (np.ndarray): Query vectors, shape (n, d).
+        k (int): Number of neighbours per query.
+        mask (Optional[np.ndarray]): Boolean array over index positions.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Distances and positions; -1 pads
+        results when fewer than ``k`` vectors are selected.
+    """
+    if mask is None:
+        return index.search(vectors, k)
+    # The selector only holds a pointer to the bitmap, which must outlive the search
+    bitmap = np.packbits(mask.astype(np.uint8), bitorder="little")
+    selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+    elif isinstance(index, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(
+            sel=selector, efSearch=index.hnsw.efSearch
+        )
+    else:
+        params = faiss.SearchParameters(sel=selector)
+    return index.search(vectors, k, params=params)
@@ -12,3 +12,48 @@ REPO_ID = CONFIG["repo_id"]
 EMBEDDING_MODEL = CONFIG["embedding_model"]
 CODEBASE_DIR = CONFIG["codebase_dir"]
 DOCS_DIR = CONFIG["docs_dir"]
+CHUNK_MODE = CONFIG["chunk_mode"]
+CHUNK_SIZE = CONFIG["chunk_size"]
+CHUNK_OVERLAP = CONFIG["chunk_overlap"]
+EMBEDDING_BATCH_SIZE = CONFIG["embedding_batch_size"]
+EMBEDDING_CACHE_DIR = CONFIG["embedding_cache_dir"]
+EMBEDDING_CACHE_MAX_MB = CONFIG["embedding_cache_max_mb"]
+INDEX_TYPE = CONFIG["index_type"]
+INDEX_NPROBE = CONFIG["index_nprobe"]
+INDEX_EF_SEARCH = CONFIG["index_ef_search"]
+INDEX_RECALL_QUERIES = CONFIG["index_recall_queries"]
+INDEX_MMAP = CONFIG["index_mmap"]
+QUERY_CACHE_DIR = CONFIG["query_cache_dir"]
+QUERY_CACHE_MAX_ENTRIES = CONFIG["query_cache_max_entries"]
+QUERY_CACHE_TTL = CONFIG["query_cache_ttl"]
+SEMANTIC_CACHE_THRESHOLD = CONFIG["semantic_cache_threshold"]
+SEMANTIC_CACHE_MAX_ENTRIES = CONFIG["semantic_cache_max_entries"]
+AGENT_PARALLEL = CONFIG["agent_parallel"]
+AGENT_MAX_WORKERS = CONFIG["agent_max_workers"]
+HYBRID_RETRIEVAL = CONFIG["hybrid_retrieval"]
+RETRIEVAL_K = CONFIG["retrieval_k"]
+RETRIEVAL_FETCH_K = CONFIG["retrieval_fetch_k"]
+SYMBOL_INDEX_DIR = CONFIG["symbol_index_dir"]
+MODEL_CONTEXT_TOKENS = CONFIG["model_context_tokens"]
+RERANK = CONFIG["rerank"]
+RERANKER_MODEL = CONFIG["reranker_model"]
+RERANK_CANDIDATES = CONFIG["rerank_candidates"]
+RERANK_BATCH_SIZE = CONFIG["rerank_batch_size"]
+RERANK_TIME_BUDGET_MS = CONFIG["rerank_time_budget_ms"]
+
+INDEX_WATCH = CONFIG["index_watch"]
+INDEX_WATCH_INTERVAL = CONFIG["index_watch_interval"]
+INDEX_WATCH_DEBOUNCE = CONFIG["index_watch_debounce"]
+PIPELINE_OUTPUT_DIR = CONFIG["pipeline_output_dir"]
+EMBEDDING_SHARD_SIZE = CONFIG["embedding_shard_size"]
+INGEST_STREAMING = CONFIG["ingest_streaming"]
+INGEST_BATCH_SIZE = CONFIG["ingest_batch_size"]
+INGEST_MAX_MEMORY_MB = CONFIG["ingest_max_memory_mb"]
+INDEX_SHARDING = CONFIG["index_sharding"]
+LLM_BACKEND = CONFIG["llm_backend"]
+LLM_MODEL_PATH = CONFIG["llm_model_path"]
+LLM_MAX_BATCH_SIZE = CONFIG["llm_max_batch_size"]
+LLM_BATCH_WAIT_MS = CONFIG["llm_batch_wait_ms"]
+OLLAMA_BASE_URL = CONFIG["ollama_base_url"]
+OLLAMA_KEEP_ALIVE = CONFIG["ollama_keep_alive"]
+MODEL_WARM_UP = CONFIG["model_warm_up"]
\ No newline at end of file
@@ -1,53 +1,353 @@
 import os
+import json
+import time
+import shutil
+import hashlib
 import logging
-from coderag.config.constants import HUGGINGFACE_TOKEN, CODEBASE_DIR, EMBEDDING_MODEL
-from coderag.components.load_document import DocumentLoader, DocumentLoaderConfig
-from coderag.components.split_text import TextSplitter
-from coderag.components.llm_agent import QAChain
-from coderag.components.get_embeddings import Embedding
-from coderag.components.codellama_agent import CodeLlamaAgent
-from coderag.components.vector_store import VectorStore
-
-# Set up environment variables and logging
-os.environ["HUGGINGFACEHUB_API_TOKEN"] = HUGGINGFACE_TOKEN
+from typing import Iterator, List, Optional
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+from config.constants import (
+    CHUNK_MODE,
+    CHUNK_OVERLAP,
+    CHUNK_SIZE,
+    CODEBASE_DIR,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_CACHE_MAX_MB,
+    EMBEDDING_MODEL,
+    EMBEDDING_SHARD_SIZE,
+    INDEX_TYPE,
+    PIPELINE_OUTPUT_DIR,
+)
+from components.index_manifest import IndexManifest
+from components.load_document import (
+    compute_index_key,
+    iter_file_documents,
+    list_source_files,
+    split_text,
+)
+from components.metadata_filter import path_metadata
+from components.model_registry import get_model_registry
+from components.vector_store import VectorStore
+
 logging.basicConfig(level=logging.INFO)
 
+# Stages of the pipeline, in order; each one reads the output of the previous.
+STAGES = ("discover", "load", "split", "embed", "index")
+
+
+class StageReport:
+    """Outcome of one pipeline stage."""
+
+    def __init__(self, name: str, items: int, seconds: float, resumed: bool):
+        self.name = name
+        self.items = items
+        self.seconds = seconds
+        self.resumed = resumed
+
+    def as_dict(self) -> dict:
+        return {"items": self.items, "seconds": self.seconds}
+
+    def summary(self) -> str:
+        if self.resumed:
+            return f"{self.name}: {self.items} items (checkpoint)"
+        return f"{self.name}: {self.items} items in {self.seconds:.2f}s"
+
 
 class CodeAnalysisPipeline:
-    def __init__(self):
-        self.config = DocumentLoaderConfig(
-            root_dir=CODEBASE_DIR,
-            file_types=[".py"],  # Add your file extensions here
+    """
+    Batch indexing of a codebase in resumable stages.
+
+    ``discover`` lists the source files, ``load`` reads them, ``split``
+    chunks them, ``embed`` embeds the chunks in shards and ``index`` builds
+    and saves the FAISS index. Every stage writes its output under
+    ``output_dir`` and records its completion in a state file, so a rerun
+    after a crash starts from the first unfinished stage, and an interrupted
+    ``embed`` stage from its first missing shard. When the files or settings
+    change, the checkpoints are discarded and the pipeline starts over.
+    """
+
+    STATE_FILE = "pipeline.json"
+    FILES_FILE = "files.json"
+    DOCUMENTS_FILE = "documents.jsonl"
+    CHUNKS_FILE = "chunks.jsonl"
+    EMBEDDINGS_DIR = "embeddings"
+    INDEX_DIR = "index"
+
+    def __init__(
+        self,
+        root_dir: str = CODEBASE_DIR,
+        output_dir: str = PIPELINE_OUTPUT_DIR,
+        embeddings=None,
+        model_name: str = EMBEDDING_MODEL,
+        chunk_size: int = CHUNK_SIZE,
+        chunk_overlap: int = CHUNK_OVERLAP,
+        chunk_mode: str = CHUNK_MODE,
+        vector_store: Optional[VectorStore] = None,
+        shard_size: int = EMBEDDING_SHARD_SIZE,
+    ):
+        """
+        Initializes the CodeAnalysisPipeline.
+
+        Args:
+            root_dir (str): Directory holding the codebase to index.
+            output_dir (str): Directory of the stage outputs.
+            embeddings: Embeddings object; the batched embedding engine of
+                ``model_name`` is created when omitted.
+            model_name (str): Name of the embedding model.
+            chunk_size (int): The maximum size of each text chunk.
+            chunk_overlap (int): The overlap size between consecutive chunks.
+            chunk_mode (str): ``"recursive"`` or ``"ast"``, see ``split_text``.
+            vector_store (Optional[VectorStore]): Builds the index.
+            shard_size (int): Chunks per embedding shard.
+        """
+        self.root_dir = root_dir
+        self.output_dir = output_dir
+        self.model_name = model_name
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.chunk_mode = chunk_mode
+        self.vector_store = vector_store or VectorStore(index_type=INDEX_TYPE)
+        self.shard_size = shard_size
+        self._embeddings = embeddings
+        self.reports: List[StageReport] = []
+        self._state: Optional[dict] = None
+
+    @property
+    def embeddings(self):
+        """Lazily creates the embedding engine."""
+        if self._embeddings is None:
+            self._embeddings = get_model_registry().embedding_engine(
+                self.model_name,
+                batch_size=EMBEDDING_BATCH_SIZE,
+                cache_dir=EMBEDDING_CACHE_DIR,
+                cache_max_bytes=EMBEDDING_CACHE_MAX_MB * 1024 * 1024,
+            )
+        return self._embeddings
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.output_dir, name)
+
+    def _key(self, files: List[str]) -> str:
+        key = compute_index_key(
+            self.root_dir,
+            self.chunk_size,
+            self.chunk_overlap,
+            self.model_name,
+            files=files,
+            chunk_mode=self.chunk_mode,
         )
-        self.document_loader = DocumentLoader(self.config)
-        self.text_splitter = TextSplitter()
-        self.embedding = Embedding(model_name=EMBEDDING_MODEL)
-        self.vector_store = VectorStore()
-        self.qa_chain = QAChain()
-        self.code_llama_agent = CodeLlamaAgent()
+        settings = json.dumps([key, self.vector_store.build_params], sort_keys=True)
+        return hashlib.sha256(settings.encode("utf-8")).hexdigest()
+
+    def _load_state(self) -> dict:
+        if self._state is None:
+            try:
+                with open(self._path(self.STATE_FILE), "r", encoding="utf-8") as f:
+                    self._state = json.load(f)
+            except (OSError, ValueError):
+                self._state = {"key": None, "stages": {}}
+        return self._state
+
+    def _save_state(self) -> None:
+        os.makedirs(self.output_dir, exist_ok=True)
+        _write_json(self._path(self.STATE_FILE), self._state)
+
+    def completed_stages(self) -> List[str]:
+        """Returns the stages whose checkpoints are valid."""
+        return [name for name in STAGES if name in self._load_state()["stages"]]
+
+    def run_stage(self, name: str) -> StageReport:
+        """
+        Runs one stage, or reuses its checkpoint when it has already completed.
+
+        ``discover`` always lists the files, which only needs ``stat`` calls,
+        to check that the checkpoints still match the codebase.
+
+        Args:
+            name (str): One of ``STAGES``; the previous stages must be complete.
+
+        Returns:
+            StageReport: Item count and timing of the stage.
+
+        Raises:
+            ValueError: If the stage is unknown or a previous stage is missing.
+        """
+        if name not in STAGES:
+            raise ValueError(f"Unknown stage {name!r}, expected one of {STAGES}.")
+        state = self._load_state()
+        previous = STAGES[: STAGES.index(name)]
+        missing = [stage for stage in previous if stage not in state["stages"]]
+        if missing:
+            raise ValueError(f"Stage {name!r} needs the {missing[0]!r} stage first.")
+
+        start = time.perf_counter()
+        if name == "discover":
+            items = self._discover(state)
+        elif name in state["stages"]:
+            report = StageReport(name, state["stages"][name]["items"], 0.0, True)
+            logging.info(f"Stage {report.summary()}")
+            self.reports.append(report)
+            return report
+        else:
+            items = getattr(self, f"_{name}")()
+        report = StageReport(name, items, time.perf_counter() - start, False)
+        state["stages"][name] = report.as_dict()
+        self._save_state()
+        logging.info(f"Stage {report.summary()}")
+        self.reports.append(report)
+        return report
+
+    def run(self) -> List[StageReport]:
+        """Runs the stages that have not completed yet, in order."""
+        return [self.run_stage(name) for name in STAGES]
+
+    def _discover(self, state: dict) -> int:
+        files = list_source_files(self.root_dir)
+        key = self._key(files)
+        if state["key"] != key:
+            if state["key"] is not None:
+                logging.info("Codebase or settings changed; discarding checkpoints")
+            shutil.rmtree(self._path(self.EMBEDDINGS_DIR), ignore_errors=True)
+            state["key"] = key
+            state["stages"] = {}
+        relative_paths = [os.path.relpath(path, self.root_dir) for path in files]
+        os.makedirs(self.output_dir, exist_ok=True)
+        _write_json(self._path(self.FILES_FILE), relative_paths)
+        return len(relative_paths)
+
+    def _load(self) -> int:
+        with open(self._path(self.FILES_FILE), "r", encoding="utf-8") as f:
+            relative_paths = json.load(f)
+        paths = [os.path.join(self.root_dir, path) for path in relative_paths]
+        count = 0
+        with _AtomicWriter(self._path(self.DOCUMENTS_FILE)) as f:
+            for document in iter_file_documents(paths):
+                f.write(json.dumps(document.metadata | {"text": document.page_content}))
+                f.write("\n")
+                count += 1
+        return count
+
+    def _split(self) -> int:
+        count = 0
+        with _AtomicWriter(self._path(self.CHUNKS_FILE)) as f:
+            for document in _read_jsonl(self._path(self.DOCUMENTS_FILE)):
+                source = document.pop("source")
+                text = document.pop("text")
+                metadata = dict(document, source=source)
+                metadata.update(path_metadata(source, self.root_dir))
+                chunks = split_text(
+                    [Document(page_content=text, metadata=metadata)],
+                    self.chunk_size,
+                    self.chunk_overlap,
+                    self.chunk_mode,
+                )
+                ids = IndexManifest.chunk_ids(metadata["path"], len(chunks))
+                for chunk_id, chunk in zip(ids, chunks):
+                    entry = {
+                        "id": chunk_id,
+                        "text": chunk.page_content,
+                        "metadata": chunk.metadata,
+                    }
+                    f.write(json.dumps(entry) + "\n")
+                count += len(chunks)
+        return count
+
+    def _shard_path(self, shard: int) -> str:
+        return os.path.join(self._path(self.EMBEDDINGS_DIR), f"{shard:05d}.npy")
+
+    def _embed(self) -> int:
+        os.makedirs(self._path(self.EMBEDDINGS_DIR), exist_ok=True)
+        count = 0
+        for shard, texts in enumerate(
+            _batched(
+                (c["text"] for c in _read_jsonl(self._path(self.CHUNKS_FILE))),
+                self.shard_size,
+            )
+        ):
+            count += len(texts)
+            path = self._shard_path(shard)
+            if os.path.exists(path):
+                # Finished before an interruption
+                continue
+            vectors = np.asarray(self.embeddings.embed_documents(texts), np.float32)
+            tmp_path = f"{path[:-4]}.tmp.npy"
+            np.save(tmp_path, vectors)
+            os.replace(tmp_path, path)
+            logging.info(f"Embedded shard {shard} ({count} chunks)")
+        return count
+
+    def _index(self) -> int:
+        chunks = list(_read_jsonl(self._path(self.CHUNKS_FILE)))
+        if not chunks:
+            raise ValueError("No text chunks available to process.")
+        shards = -(-len(chunks) // self.shard_size)
+        vectors = np.concatenate(
+            [np.load(self._shard_path(shard)) for shard in range(shards)]
+        )
+        texts = [
+            Document(page_content=c["text"], metadata=c["metadata"]) for c in chunks
+        ]
+        vector_store = self.vector_store.build_from_vectors(
+            texts, vectors, self.embeddings, ids=[c["id"] for c in chunks]
+        )
+        vector_store.save_local(self._path(self.INDEX_DIR))
+        return vector_store.index.ntotal
+
+    def load_vector_store(self) -> FAISS:
+        """Loads the index built by the ``index`` stage."""
+        vector_store = FAISS.load_local(
+            self._path(self.INDEX_DIR),
+            self.embeddings,
+            allow_dangerous_deserialization=True,
+        )
+        self.vector_store.set_search_params(vector_store)
+        return vector_store
+
+
+class _AtomicWriter:
+    """Writes a text file under a temporary name and renames it when complete."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+
+    def __enter__(self):
+        self.file = open(self.tmp_path, "w", encoding="utf-8")
+        return self.file
+
+    def __exit__(self, exc_type, exc, tb):
+        self.file.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.path)
+        else:
+            os.remove(self.tmp_path)
 
-    def run_pipeline(self):
-        logging.info("Starting the code analysis pipeline...")
-        documents = self.document_loader.load_documents()
-        logging.info(f"Loaded {len(documents)} documents.")
 
-        split_texts = self.text_splitter.split(documents)
-        logging.info(f"Split documents into {len(split_texts)} chunks.")
+def _write_json(path: str, value) -> None:
+    with _AtomicWriter(path) as f:
+        json.dump(value, f)
 
-        embeddings = self.embedding.get_embeddings(split_texts)
-        logging.info("Generated embeddings for the text chunks.")
 
-        self.vector_store.store_embeddings(embeddings)
-        logging.info("Stored embeddings in the vector store.")
+def _read_jsonl(path: str) -> Iterator[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
 
-        # Example query processing
-        query = "Explain the purpose of the provided code"
-        response = self.qa_chain.process_query(query)
-        logging.info(f"Query response: {response}")
 
-        return response
+def _batched(items, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
 if __name__ == "__main__":
     pipeline = CodeAnalysisPipeline()
-    pipeline.run_pipeline()
+    pipeline.run()
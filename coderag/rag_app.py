@@ -1,11 +1,16 @@
-import sys
 import os
 import logging
-
-# Add the root directory to sys.path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
-
-from coderag.pipeline.rag_pipeline import CodeAnalysisPipeline
+from dotenv import load_dotenv
+from components.llm_agent import QAChain
+from config.constants import (
+    LLM_BACKEND,
+    LLM_BATCH_WAIT_MS,
+    LLM_MAX_BATCH_SIZE,
+    LLM_MODEL_PATH,
+)
+from pipeline.rag_pipeline import STAGES, CodeAnalysisPipeline
+
+load_dotenv()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -14,37 +19,35 @@ logging.basicConfig(level=logging.INFO)
 def main():
     pipeline = CodeAnalysisPipeline()
 
-    try:
-        phase_name = "Load and preprocess documents"
-        logging.info(f">>>>>> phase {phase_name} started <<<<<<")
-        pipeline.load_and_preprocess_documents()
-    except Exception as e:
-        logging.error(f"Error in phase {phase_name}: {e}")
-        return
-
-    try:
-        phase_name = "Create embeddings and vector store"
-        logging.info(f">>>>>> phase {phase_name} started <<<<<<")
-        pipeline.create_embeddings_and_vector_store()
-    except Exception as e:
-        logging.error(f"Error in phase {phase_name}: {e}")
-        return
-
-    try:
-        phase_name = "Initialize QA chain and explanation chain"
-        logging.info(f">>>>>> phase {phase_name} started <<<<<<")
-        pipeline.initialize_qa_chain()
-        pipeline.initialize_agent_and_explanation_chain()
-    except Exception as e:
-        logging.error(f"Error in phase {phase_name}: {e}")
-        return
+    # Completed stages are loaded from their checkpoints, so a rerun after a
+    # failure continues where the previous run stopped
+    for phase_name in STAGES:
+        try:
+            logging.info(f">>>>>> phase {phase_name} started <<<<<<")
+            pipeline.run_stage(phase_name)
+        except Exception as e:
+            logging.error(f"Error in phase {phase_name}: {e}")
+            return
+    logging.info(
+        "Pipeline: " + "; ".join(report.summary() for report in pipeline.reports)
+    )
 
     try:
         phase_name = "Process user query"
         logging.info(f">>>>>> phase {phase_name} started <<<<<<")
+        qa = QAChain(
+            repo_id=os.getenv("REPO_ID"),
+            backend=LLM_BACKEND,
+            model_path=LLM_MODEL_PATH,
+            max_batch_size=LLM_MAX_BATCH_SIZE,
+            batch_wait=LLM_BATCH_WAIT_MS / 1000,
+        )
+        qa.initialize_llm()
+        qa.get_qa_chain(pipeline.load_vector_store().as_retriever())
         user_query = "Explain the purpose of the provided code"  # Consider getting this from a config file or environment variable
         if user_query:
-            pipeline.process_query(user_query)
+            response = qa.qa_chain.invoke({"query": user_query})
+            logging.info(f"Query response: {response['result']}")
     except Exception as e:
         logging.error(f"Error in phase {phase_name}: {e}")
         return
@@ -0,0 +1,167 @@
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+import pytest
+from langchain_core.language_models.fake import FakeListLLM
+from coderag.components import codellama_agent
+from coderag.components.codellama_agent import (
+    iter_codellama_agent,
+    run_codellama_agent,
+    stream_codellama_agent,
+)
+from coderag.components.model_registry import ModelRegistry
+
+
+class SlowLLM(FakeListLLM):
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        time.sleep(0.1)
+        return f"response to {len(prompt)} chars"
+
+
+@pytest.fixture
+def slow_llm():
+    with patch.object(codellama_agent, "llm", SlowLLM(responses=[""])):
+        yield
+
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    """Answers /api/generate like Ollama, streaming one token per line."""
+
+    # Connections stay open between requests, as with a real Ollama server
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        time.sleep(0.05)
+        lines = [
+            {"model": request["model"], "response": token, "done": False}
+            for token in ("stub ", f"answer {len(request['prompt'])}")
+        ]
+        lines.append({"model": request["model"], "response": "", "done": True})
+        body = "".join(json.dumps(line) + "\n" for line in lines).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def ollama_llm():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _OllamaHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    llm = ModelRegistry().ollama_llm(
+        "stub", base_url=f"http://127.0.0.1:{server.server_port}"
+    )
+    with patch.object(codellama_agent, "llm", llm):
+        yield llm
+    server.shutdown()
+    server.server_close()
+
+
+def test_parallel_agent_overlaps_explanation_and_improvements(slow_llm):
+    serial = run_codellama_agent("def add(a, b): return a + b")
+    parallel = run_codellama_agent("def add(a, b): return a + b", parallel=True)
+    for result in (serial, parallel):
+        assert result["analysis"] and result["explanation"] and result["improvements"]
+        assert set(result["timings"]) == {
+            "analyze_code",
+            "explain_result",
+            "suggest_improvements",
+            "total",
+        }
+    # Three sequential calls against two rounds of calls
+    assert serial["timings"]["total"] >= 0.3
+    assert parallel["timings"]["total"] < 0.3
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_iter_agent_runs_distinct_inputs_concurrently(slow_llm, parallel):
+    codes = ["def a(): pass", "def b(): pass", "def a(): pass", "def c(): pass"]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # A deadlock fails the test instead of hanging it
+        results = executor.submit(
+            lambda: dict(iter_codellama_agent(codes, max_workers=4, parallel=parallel))
+        ).result(timeout=10)
+    elapsed = time.perf_counter() - start
+
+    assert sorted(results) == [0, 1, 2, 3]
+    assert results[0] is results[2]
+    # Three distinct inputs of three sequential calls each, run side by side
+    assert elapsed < 0.6
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_stream_agent_yields_every_section(slow_llm, parallel):
+    events = list(stream_codellama_agent("def add(a, b): return a + b", parallel))
+    sections = [section for section, _ in events]
+    assert sections[0] == "analysis"
+    assert sections[-1] == "timings"
+    assert set(sections) == {"analysis", "explanation", "improvements", "timings"}
+    timings = events[-1][1]
+    assert timings["analyze_code_first_token"] <= timings["total"]
+    if parallel:
+        assert timings["total"] < 0.3
+
+
+class TokenLLM(FakeListLLM):
+    """Streams 100 tokens slowly, counting the ones pulled from the model."""
+
+    pulled: list = []
+
+    def _stream(self, prompt, stop=None, run_manager=None, **kwargs):
+        from langchain_core.outputs import GenerationChunk
+
+        for i in range(100):
+            time.sleep(0.01)
+            self.pulled.append(i)
+            yield GenerationChunk(text=f"t{i} ")
+
+
+def test_abandoned_parallel_stream_stops_the_model():
+    llm = TokenLLM(responses=[""], pulled=[])
+    with patch.object(codellama_agent, "llm", llm):
+        events = stream_codellama_agent("def add(a, b): return a + b", True)
+        for section, _ in events:
+            if section != "analysis":
+                break
+        events.close()
+        time.sleep(0.1)
+        pulled = len(llm.pulled)
+        time.sleep(0.2)
+    # The analysis and at most a token or two of each parallel step
+    assert len(llm.pulled) == pulled
+    assert pulled < 110
+
+
+def test_shared_ollama_client_serves_repeated_parallel_runs(ollama_llm):
+    # One long-lived client, as the model registry shares it across sessions
+    for _ in range(3):
+        result = run_codellama_agent("def add(a, b): return a + b", parallel=True)
+        assert result["analysis"].startswith("stub answer")
+        assert result["improvements"].startswith("stub answer")
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        results = executor.submit(
+            lambda: dict(
+                iter_codellama_agent(
+                    ["def a(): pass", "def b(): pass"], max_workers=2, parallel=True
+                )
+            )
+        ).result(timeout=10)
+    assert sorted(results) == [0, 1]
+    assert all(result["explanation"] for result in results.values())
+
+
+def test_shared_ollama_client_serves_every_event_loop(ollama_llm):
+    # Each asyncio.run is a new event loop on the same long-lived client
+    for _ in range(3):
+        assert asyncio.run(ollama_llm.ainvoke("Hi")).startswith("stub answer")
@@ -0,0 +1,74 @@
+import pytest
+from langchain_core.documents import Document
+from coderag.components.code_splitter import PythonCodeSplitter
+
+SOURCE = '''import os
+
+CONSTANT = 1
+
+
+def helper(x):
+    """Doubles x."""
+    return x * 2
+
+
+class Greeter(object):
+    """Greets people."""
+
+    greeting = "Hello"
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def message(self):
+        return f"{self.greeting}, {self.name}"
+'''
+
+
+@pytest.fixture
+def splitter():
+    return PythonCodeSplitter(chunk_size=1500)
+
+
+def test_one_chunk_per_definition(splitter):
+    chunks = splitter.split_source(SOURCE, {"source": "greeter.py"})
+    symbols = [(c.metadata["symbol"], c.metadata["kind"]) for c in chunks]
+    assert symbols == [
+        ("<module>", "module"),
+        ("helper", "function"),
+        ("Greeter", "class"),
+        ("Greeter.__init__", "method"),
+        ("Greeter.message", "method"),
+    ]
+    assert all(c.metadata["source"] == "greeter.py" for c in chunks)
+
+
+def test_methods_carry_the_class_signature(splitter):
+    chunks = splitter.split_source(SOURCE)
+    method = next(c for c in chunks if c.metadata["symbol"] == "Greeter.message")
+    assert method.page_content.startswith("class Greeter(object):\n    @property\n")
+    assert method.metadata["start_line"] == 19
+
+    outline = next(c for c in chunks if c.metadata["kind"] == "class")
+    assert "self.name = name" not in outline.page_content
+    assert "def __init__(self, name):" in outline.page_content
+
+
+def test_oversized_definitions_are_sub_split():
+    body = "".join(f"    value_{i} = {i}\n" for i in range(100))
+    source = f"def big():\n{body}    return value_0\n"
+    chunks = PythonCodeSplitter(chunk_size=300, chunk_overlap=0).split_source(source)
+    assert len(chunks) > 1
+    assert all(c.metadata["symbol"] == "big" for c in chunks)
+    assert all(c.page_content.startswith("def big():") for c in chunks)
+
+
+def test_non_python_and_invalid_sources_fall_back(splitter):
+    documents = [
+        Document(page_content="# Title\n\nSome text.", metadata={"source": "README.md"}),
+        Document(page_content="def broken(:\n", metadata={"source": "broken.py"}),
+    ]
+    chunks = splitter.split_documents(documents)
+    assert [c.metadata["source"] for c in chunks] == ["README.md", "broken.py"]
+    assert "symbol" not in chunks[1].metadata
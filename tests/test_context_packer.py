@@ -0,0 +1,93 @@
+import pytest
+from langchain_core.documents import Document
+from coderag.components.context_packer import (
+    ContextPacker,
+    PackingRetriever,
+    hamming_distance,
+    simhash,
+)
+
+SOURCE = "".join(f"line {i}: value = compute({i})\n" for i in range(40))
+
+
+def chunk(start, end, **metadata):
+    return Document(
+        page_content=SOURCE[start:end],
+        metadata=dict(source="a.py", start_index=start, **metadata),
+    )
+
+
+@pytest.fixture
+def packer():
+    return ContextPacker(max_tokens=10_000)
+
+
+def test_overlapping_chunks_of_a_file_are_merged(packer):
+    documents = [chunk(200, 500), chunk(0, 250), chunk(600, 700)]
+    merged = packer.merge(documents)
+    assert [d.page_content for d in merged] == [SOURCE[0:500], SOURCE[600:700]]
+
+
+def test_chunks_without_positions_merge_on_text_overlap(packer):
+    first = Document(page_content=SOURCE[0:300], metadata={"source": "b.py"})
+    second = Document(page_content=SOURCE[250:600], metadata={"source": "b.py"})
+    merged = packer.merge([second, first])
+    assert [d.page_content for d in merged] == [SOURCE[0:600]]
+
+
+def test_adjacent_definitions_are_merged(packer):
+    documents = [
+        Document(
+            page_content="def b():\n    pass\n",
+            metadata={"source": "c.py", "start_line": 3, "end_line": 4},
+        ),
+        Document(
+            page_content="def a():\n    pass\n",
+            metadata={"source": "c.py", "start_line": 1, "end_line": 2},
+        ),
+    ]
+    [merged] = packer.merge(documents)
+    assert merged.page_content == "def a():\n    pass\ndef b():\n    pass\n"
+    assert (merged.metadata["start_line"], merged.metadata["end_line"]) == (1, 4)
+
+
+def test_near_duplicates_are_dropped(packer):
+    original = SOURCE[:800]
+    copy = original.replace("line 3:", "line three:")
+    assert hamming_distance(simhash(original), simhash(copy)) <= 3
+    documents = [
+        Document(page_content=original, metadata={"source": "a.py"}),
+        Document(page_content=copy, metadata={"source": "vendored/a.py"}),
+        Document(page_content="class Other:\n    pass\n", metadata={"source": "b.py"}),
+    ]
+    kept = packer.deduplicate(documents)
+    assert [d.metadata["source"] for d in kept] == ["a.py", "b.py"]
+
+
+def test_pack_respects_the_token_budget():
+    packer = ContextPacker(max_tokens=100)
+    documents = [
+        Document(page_content="x = 1\n" * 50, metadata={"source": "big.py"}),
+        Document(page_content="def f():\n    return 2\n", metadata={"source": "f.py"}),
+        Document(page_content="y = 2\n" * 100, metadata={"source": "huge.py"}),
+    ]
+    packed = packer.pack(documents)
+    assert [d.metadata["source"] for d in packed] == ["big.py", "f.py"]
+
+    [truncated] = ContextPacker(max_tokens=10).pack(documents[:1])
+    assert packer.count_tokens(truncated.page_content) <= 10
+
+
+def test_for_model_reserves_answer_and_prompt_tokens():
+    assert ContextPacker.for_model(4096, 500).max_tokens == 4096 - 500 - 512
+
+
+def test_packing_retriever_wraps_a_retriever(packer):
+    from langchain_core.retrievers import BaseRetriever
+
+    class ListRetriever(BaseRetriever):
+        def _get_relevant_documents(self, query, *, run_manager):
+            return [chunk(0, 250), chunk(200, 500)]
+
+    retriever = PackingRetriever(retriever=ListRetriever(), packer=packer)
+    assert [d.page_content for d in retriever.invoke("q")] == [SOURCE[0:500]]
@@ -0,0 +1,50 @@
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from coderag.components.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class RecordingEmbedding(DeterministicFakeEmbedding):
+    calls: list = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def model():
+    return RecordingEmbedding(size=4, calls=[])
+
+
+def test_only_misses_reach_the_model(model, tmp_path):
+    cached = CachedEmbeddings(model, "fake-model", str(tmp_path), dtype="float32")
+    first = cached.embed_documents(["a", "b", "a"])
+    assert first[0] == first[2]
+    assert (cached.hits, cached.misses) == (1, 2)
+
+    # A new process reuses the vectors saved on disk
+    reopened = CachedEmbeddings(model, "fake-model", str(tmp_path), dtype="float32")
+    second = reopened.embed_documents(["b", "c", "a"])
+    assert model.calls == [["a", "b"], ["c"]]
+    assert second[0] == first[1]
+    assert second[2] == first[0]
+
+
+def test_cache_key_includes_model_and_normalize_flag(model, tmp_path):
+    CachedEmbeddings(model, "fake-model", str(tmp_path)).embed_documents(["a"])
+    other = CachedEmbeddings(model, "fake-model", str(tmp_path), normalize=True)
+    other.embed_documents(["a"])
+    assert other.misses == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    # Room for exactly two float32 vectors of dimension 2
+    cache = EmbeddingCache(str(tmp_path), dim=2, max_bytes=16, dtype="float32")
+    cache.put_many({"a": [1, 1], "b": [2, 2]})
+    cache.get_many(["a"])
+    cache.put_many({"c": [3, 3]})
+
+    assert len(cache) == 2
+    found = cache.get_many(["a", "b", "c"])
+    assert sorted(found) == ["a", "c"]
+    assert found["c"].tolist() == [3.0, 3.0]
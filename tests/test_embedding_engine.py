@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+from coderag.components.embedding_engine import EmbeddingEngine
+
+
+class FakeTokenizer:
+    def __call__(self, texts, **kwargs):
+        return {"input_ids": [text.split() for text in texts]}
+
+
+class FakeModel:
+    max_seq_length = 512
+
+    def __init__(self):
+        self.tokenizer = FakeTokenizer()
+        self.encoded = []
+
+    def encode(self, texts, **kwargs):
+        self.encoded.append(list(texts))
+        return np.array([[float(len(t.split())), 1.0] for t in texts])
+
+    def encode_multi_process(self, texts, pool, **kwargs):
+        return self.encode(texts)
+
+    def start_multi_process_pool(self, target_devices):
+        return MagicMock()
+
+
+@pytest.fixture
+def model():
+    fake = FakeModel()
+    with patch(
+        "coderag.components.embedding_engine.SentenceTransformer",
+        return_value=fake,
+    ):
+        yield fake
+
+
+def test_embeds_sorted_by_length_and_restores_order(model):
+    engine = EmbeddingEngine("dummy-model", batch_size=2, num_workers=1)
+    texts = ["a b c d", "a", "a b"]
+    vectors = engine.embed_documents(texts)
+
+    assert [v[0] for v in vectors] == [4.0, 1.0, 2.0]
+    assert model.encoded == [["a", "a b", "a b c d"]]
+    assert engine.stats.chunks == 3
+    assert engine.stats.tokens == 7
+    # Batches [1, 2] and [4] pad to 2 * 2 + 4 * 1 positions
+    assert engine.stats.padded_tokens == 8
+
+
+def test_large_inputs_use_the_process_pool(model):
+    engine = EmbeddingEngine("dummy-model", num_workers=4, min_parallel_chunks=2)
+    with patch.object(
+        model, "encode_multi_process", wraps=model.encode_multi_process
+    ) as mock_parallel:
+        engine.embed_documents(["x", "y"])
+        mock_parallel.assert_called_once()
+        engine.embed_query("z")
+        assert mock_parallel.call_count == 1
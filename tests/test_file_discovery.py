@@ -0,0 +1,83 @@
+import os
+import pytest
+from coderag.components.file_discovery import FileDiscovery, IgnoreRule
+
+
+@pytest.fixture
+def repo(tmp_path):
+    files = {
+        "app.py": "print('app')\n",
+        "debug.log": "noise\n",
+        "keep.log": "important\n",
+        "src/core.py": "x = 1\n",
+        "src/generated/schema.py": "y = 2\n",
+        "src/.gitignore": "generated/\n",
+        "node_modules/lib/index.js": "module.exports = {}\n",
+        "build/out.py": "z = 3\n",
+        "data/dump.csv": "a,b\n" * 100,
+        ".gitignore": "*.log\n!keep.log\n/data/\n",
+        ".git/info/exclude": "secrets.py\n",
+        "secrets.py": "TOKEN = 'x'\n",
+        ".coderagignore": "docs/\n",
+        "docs/guide.md": "# Guide\n",
+    }
+    for relative_path, content in files.items():
+        path = tmp_path / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return tmp_path
+
+
+def test_discovery_honors_ignore_files_and_prunes_dirs(repo):
+    discovery = FileDiscovery(str(repo))
+    files = [os.path.relpath(p, repo).replace(os.sep, "/") for p in discovery.discover()]
+    assert files == ["app.py", "keep.log", "src/core.py"]
+
+    stats = discovery.stats
+    assert stats.pruned_dirs["vendor"] == 3
+    assert stats.pruned_dirs["gitignore"] == 3
+    assert stats.skipped_files["gitignore"] == 2
+    assert stats.skipped_bytes["gitignore"] == len("noise\n") + len("TOKEN = 'x'\n")
+
+
+def test_discovery_size_limit_is_reported(repo):
+    discovery = FileDiscovery(str(repo), max_file_size=8)
+    discovery.discover()
+    assert discovery.stats.skipped_files["size"] == 2
+
+
+@pytest.mark.parametrize(
+    "pattern, path, is_dir, expected",
+    [
+        ("*.pyc", "pkg/mod.pyc", False, True),
+        ("/build", "build", True, True),
+        ("/build", "pkg/build", True, False),
+        ("logs/", "logs", False, False),
+        ("docs/**/*.md", "docs/a/b/c.md", False, True),
+        ("**/fixtures", "tests/unit/fixtures", True, True),
+    ],
+)
+def test_ignore_rule_matching(pattern, path, is_dir, expected):
+    assert IgnoreRule(pattern).matches(path, is_dir) is expected
+
+
+def test_selects_agrees_with_discover(repo):
+    discovery = FileDiscovery(str(repo))
+    discovered = set(discovery.discover())
+    for dirpath, _, filenames in os.walk(repo):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            relative_path = os.path.relpath(path, repo).replace(os.sep, "/")
+            if name in (".gitignore", ".coderagignore") or relative_path == (
+                ".git/info/exclude"
+            ):
+                # Ignore files change the rules, so their changes always count
+                assert discovery.selects(path)
+            else:
+                assert discovery.selects(path) == (path in discovered), relative_path
+
+    assert discovery.selects(str(repo / "src" / "deleted.py"))
+    assert discovery.selects(str(repo / "src"), is_dir=True)
+    assert not discovery.selects(str(repo / "node_modules"), is_dir=True)
+    assert not discovery.selects(str(repo / ".git" / "HEAD"))
+    assert not discovery.selects(str(repo.parent / "elsewhere.py"))
@@ -1,5 +1,5 @@
 import pytest
-from coderag.components.get_embeddings import Embedding
+from coderag.components.get_embeddings import Embedding, describe_embeddings
 from unittest.mock import patch
 
 
@@ -12,3 +12,18 @@ def test_get_embeddings():
     # Mock the embedding response
     embeddings = embedder.get_embeddings()
     assert embeddings == [0.1, 0.2, 0.3]
+
+
+@pytest.mark.parametrize("cache_dir", [None, ""])
+def test_describe_embeddings_without_cache(cache_dir):
+    engine = Embedding(model_name="dummy-model", cache_dir=cache_dir)
+    engine = engine.get_embedding_engine()
+    assert describe_embeddings(engine) == []
+    engine.stats.record(chunks=2, tokens=10, padded_tokens=12, seconds=1.0)
+    assert describe_embeddings(engine) == [f"Embedding: {engine.stats.summary()}"]
+
+
+def test_describe_embeddings_with_cache(tmp_path):
+    engine = Embedding(model_name="dummy-model", cache_dir=str(tmp_path))
+    engine = engine.get_embedding_engine()
+    assert describe_embeddings(engine) == [f"Embedding cache: {engine.summary()}"]
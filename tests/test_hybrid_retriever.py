@@ -0,0 +1,62 @@
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+from coderag.components.hybrid_retriever import (
+    BM25Index,
+    HybridRetriever,
+    reciprocal_rank_fusion,
+    tokenize_code,
+)
+
+
+def test_tokenize_code_keeps_identifiers_and_splits_compounds():
+    tokens = tokenize_code("def parse_ignore_file(path): return HTTPServerError")
+    assert "parse_ignore_file" in tokens
+    assert {"parse", "ignore", "file"} <= set(tokens)
+    assert "httpservererror" in tokens
+    assert {"http", "server", "error"} <= set(tokens)
+    assert tokenize_code("path") == ["path"]
+
+
+def test_bm25_ranks_exact_identifier_first():
+    index = BM25Index(
+        [
+            "def load_file(path): return open(path).read()",
+            "def parse_ignore_file(path): return []",
+            "class IndexManager: pass",
+        ]
+    )
+    results = index.search("parse_ignore_file", k=3)
+    assert results[0][0] == 1
+    assert index.search("nothing_matches_this") == []
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]])
+    assert fused[0][0] == "b"
+    assert {key for key, _ in fused} == {"a", "b", "c", "d"}
+
+
+@pytest.fixture
+def vector_store():
+    documents = [
+        Document(page_content=f"def helper_{i}(x): return x + {i}", metadata={"i": i})
+        for i in range(50)
+    ]
+    documents.append(
+        Document(
+            page_content="raise IndexBuildError('manifest is corrupt')",
+            metadata={"i": 50},
+        )
+    )
+    return FAISS.from_documents(documents, DeterministicFakeEmbedding(size=16))
+
+
+def test_hybrid_retriever_finds_exact_error_string(vector_store):
+    retriever = HybridRetriever.from_vector_store(vector_store, k=2, fetch_k=10)
+    docs = retriever.invoke("Where is IndexBuildError raised?")
+    assert len(docs) == 2
+    # The error string only matches lexically; RRF keeps it in the top k
+    assert 50 in [doc.metadata["i"] for doc in docs]
+    assert all("rrf_score" in doc.metadata for doc in docs)
@@ -0,0 +1,210 @@
+import pytest
+from unittest.mock import patch
+
+
+@pytest.fixture
+def codebase(tmp_path):
+    root = tmp_path / "codebase"
+    root.mkdir()
+    (root / "main.py").write_text("def main():\n    return 42\n")
+    (root / "utils.py").write_text("def helper(x):\n    return x * 2\n")
+    return root
+
+
+def test_index_key_changes_with_files_and_settings(codebase):
+    from coderag.components.load_document import compute_index_key
+
+    key = compute_index_key(str(codebase))
+    assert key == compute_index_key(str(codebase))
+    assert key != compute_index_key(str(codebase), chunk_size=1000)
+    assert key != compute_index_key(str(codebase), model_name="other-model")
+
+    (codebase / "new.py").write_text("x = 1\n")
+    assert key != compute_index_key(str(codebase))
+
+
+def test_index_manager_reuses_saved_index(codebase, tmp_path):
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from coderag.components import load_document
+
+    embeddings = DeterministicFakeEmbedding(size=8)
+    faiss_path = str(tmp_path / "faiss")
+    manager = load_document.IndexManager(
+        str(codebase), embeddings=embeddings, faiss_path=faiss_path
+    )
+    store = manager.get_vector_store()
+    assert manager.get_vector_store() is store
+
+    # A fresh process only has the saved index on disk
+    load_document._INDEX_CACHE.clear()
+    with patch.object(load_document, "load_file") as mock_load:
+        reloaded = load_document.IndexManager(
+            str(codebase), embeddings=embeddings, faiss_path=faiss_path
+        ).get_vector_store()
+        mock_load.assert_not_called()
+    assert reloaded.index.ntotal == store.index.ntotal
+
+
+def test_index_manager_reindexes_only_changed_files(codebase, tmp_path):
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from coderag.components import load_document
+
+    embeddings = DeterministicFakeEmbedding(size=8)
+    faiss_path = str(tmp_path / "faiss")
+    load_document.IndexManager(
+        str(codebase), embeddings=embeddings, faiss_path=faiss_path
+    ).get_vector_store()
+
+    (codebase / "utils.py").write_text("def helper(x):\n    return x * 3\n")
+    (codebase / "main.py").unlink()
+    with patch.object(
+        load_document, "load_file", wraps=load_document.load_file
+    ) as mock_load_file:
+        store = load_document.IndexManager(
+            str(codebase), embeddings=embeddings, faiss_path=faiss_path
+        ).get_vector_store()
+        mock_load_file.assert_called_once_with(str(codebase / "utils.py"))
+
+    sources = {doc.metadata["source"] for doc in store.docstore._dict.values()}
+    assert sources == {str(codebase / "utils.py")}
+    # Chunks carry the metadata that retrieval filters match on
+    metadata = next(iter(store.docstore._dict.values())).metadata
+    assert metadata["path"] == "utils.py"
+    assert metadata["language"] == "python"
+
+
+def test_index_manager_serves_mmap_layout(codebase, tmp_path):
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from coderag.components import load_document
+
+    embeddings = DeterministicFakeEmbedding(size=8)
+    faiss_path = str(tmp_path / "faiss")
+    store = load_document.IndexManager(
+        str(codebase), embeddings=embeddings, faiss_path=faiss_path, mmap=True
+    ).get_vector_store()
+    assert type(store.docstore).__name__ == "MmapDocstore"
+
+    load_document._INDEX_CACHE.clear()
+    (codebase / "extra.py").write_text("def extra():\n    return 1\n")
+    updated = load_document.IndexManager(
+        str(codebase), embeddings=embeddings, faiss_path=faiss_path, mmap=True
+    ).get_vector_store()
+    assert type(updated.docstore).__name__ == "MmapDocstore"
+    assert updated.index.ntotal > store.index.ntotal
+    sources = {
+        updated.docstore.search(i).metadata["source"]
+        for i in range(updated.index.ntotal)
+    }
+    assert str(codebase / "extra.py") in sources
+
+
+def test_index_manager_updates_symbol_index(codebase, tmp_path):
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from coderag.components import load_document
+    from coderag.components.symbol_index import SymbolIndex
+
+    symbol_index = SymbolIndex(str(codebase), str(tmp_path / "symbols.sqlite"))
+    load_document.IndexManager(
+        str(codebase),
+        embeddings=DeterministicFakeEmbedding(size=8),
+        faiss_path=str(tmp_path / "faiss"),
+        symbol_index=symbol_index,
+    ).get_vector_store()
+    assert symbol_index.definitions("helper")[0]["path"] == "utils.py"
+
+
+def test_index_types_do_not_share_cached_stores(codebase, tmp_path):
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from coderag.components import load_document
+    from coderag.components.vector_store import VectorStore
+
+    options = dict(
+        embeddings=DeterministicFakeEmbedding(size=8),
+        faiss_path=str(tmp_path / "faiss"),
+    )
+    flat = load_document.IndexManager(str(codebase), **options).get_vector_store()
+    hnsw = load_document.IndexManager(
+        str(codebase), vector_store=VectorStore(index_type="hnsw"), **options
+    ).get_vector_store()
+    mapped = load_document.IndexManager(
+        str(codebase), mmap=True, **options
+    ).get_vector_store()
+    assert type(flat.index).__name__ == "IndexFlatL2"
+    assert type(hnsw.index).__name__ == "IndexHNSWFlat"
+    # The same saved index, served once per mmap setting
+    assert flat is not mapped
+
+
+def test_saved_versions_are_published_atomically(codebase, tmp_path):
+    import os
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from coderag.components import load_document
+
+    embeddings = DeterministicFakeEmbedding(size=8)
+    manager = load_document.IndexManager(
+        str(codebase), embeddings=embeddings, faiss_path=str(tmp_path / "faiss")
+    )
+    manager.get_vector_store()
+    index_dir = manager.index_dir
+    first = manager._live_dir(index_dir)
+    assert os.path.exists(os.path.join(first, "index.faiss"))
+
+    # Until the pointer is replaced, readers keep getting the complete old index
+    publish = manager._publish
+    live_before = []
+
+    def checked_publish(index_dir, version_dir):
+        live_before.append(manager._live_dir(index_dir))
+        assert os.path.exists(os.path.join(version_dir, "index.faiss"))
+        publish(index_dir, version_dir)
+
+    discover = load_document.FileDiscovery.discover
+    walks = []
+
+    def counted_discover(self):
+        walks.append(self.root_dir)
+        return discover(self)
+
+    (codebase / "extra.py").write_text("def extra():\n    return 1\n")
+    with patch.object(manager, "_publish", checked_publish), patch.object(
+        load_document.FileDiscovery, "discover", counted_discover
+    ):
+        manager.get_vector_store()
+    # The files found by compute_key are reused by the update
+    assert len(walks) == 1
+    assert live_before == [first]
+    second = manager._live_dir(index_dir)
+    assert second != first
+    assert sorted(os.listdir(index_dir)) == sorted(
+        ["CURRENT", os.path.basename(first), os.path.basename(second)]
+    )
+
+
+def test_unversioned_index_is_migrated(codebase, tmp_path):
+    import os
+    import shutil
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from coderag.components import load_document
+
+    embeddings = DeterministicFakeEmbedding(size=8)
+    manager = load_document.IndexManager(
+        str(codebase), embeddings=embeddings, faiss_path=str(tmp_path / "faiss")
+    )
+    store = manager.get_vector_store()
+    index_dir = manager.index_dir
+    # Lay the index out as releases without versioning saved it
+    version = manager._live_dir(index_dir)
+    for name in os.listdir(version):
+        shutil.move(os.path.join(version, name), index_dir)
+    os.rmdir(version)
+    os.remove(os.path.join(index_dir, "CURRENT"))
+
+    load_document._INDEX_CACHE.clear()
+    reloaded = manager.get_vector_store()
+    assert reloaded.index.ntotal == store.index.ntotal
+
+    (codebase / "extra.py").write_text("def extra():\n    return 1\n")
+    manager.get_vector_store()
+    names = os.listdir(index_dir)
+    assert "index.faiss" not in names
+    assert os.path.exists(os.path.join(manager._live_dir(index_dir), "index.faiss"))
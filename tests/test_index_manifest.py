@@ -0,0 +1,41 @@
+import os
+import pytest
+from coderag.components.index_manifest import IndexManifest
+
+
+@pytest.fixture
+def codebase(tmp_path):
+    (tmp_path / "a.py").write_text("a = 1\n")
+    (tmp_path / "b.py").write_text("b = 2\n")
+    return tmp_path
+
+
+def test_scan_detects_added_changed_and_deleted(codebase, tmp_path):
+    manifest = IndexManifest(str(codebase))
+    changes = manifest.scan(["a.py", "b.py"])
+    assert sorted(changes.added) == ["a.py", "b.py"]
+    for relative_path in changes.to_index:
+        manifest.record(relative_path, IndexManifest.chunk_ids(relative_path, 1))
+
+    manifest_path = str(tmp_path / "manifest.json")
+    manifest.save(manifest_path)
+    manifest = IndexManifest.load(manifest_path, str(codebase))
+
+    (codebase / "a.py").write_text("a = 10\n")
+    (codebase / "c.py").write_text("c = 3\n")
+    os.remove(codebase / "b.py")
+    changes = manifest.scan(["a.py", "c.py"])
+    assert changes.added == ["c.py"]
+    assert changes.changed == ["a.py"]
+    assert changes.deleted == ["b.py"]
+    assert manifest.ids_for(changes.to_remove) == ["a.py::0", "b.py::0"]
+
+
+def test_scan_ignores_touched_but_identical_files(codebase):
+    manifest = IndexManifest(str(codebase))
+    for relative_path in manifest.scan(["a.py"]).to_index:
+        manifest.record(relative_path, ["a.py::0"])
+
+    stat = os.stat(codebase / "a.py")
+    os.utime(codebase / "a.py", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert not manifest.scan(["a.py"])
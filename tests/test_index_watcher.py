@@ -0,0 +1,116 @@
+import time
+from types import SimpleNamespace
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from coderag.components import load_document
+from coderag.components.index_watcher import IndexWatcher, _EventHandler
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out")
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    root = tmp_path / "codebase"
+    root.mkdir()
+    (root / "main.py").write_text("def main():\n    return 42\n")
+    (root / "utils.py").write_text("def helper(x):\n    return x * 2\n")
+    return load_document.IndexManager(
+        str(root),
+        embeddings=DeterministicFakeEmbedding(size=8),
+        faiss_path=str(tmp_path / "faiss"),
+    )
+
+
+def test_watcher_publishes_updates_and_keeps_old_snapshots(manager):
+    watcher = IndexWatcher(
+        manager, poll_interval=0.05, debounce=0.1, use_watchdog=False
+    ).start()
+    try:
+        old_key, old_store = watcher.snapshot()
+        old_contents = sorted(d.page_content for d in old_store.docstore._dict.values())
+
+        root = manager.root_dir
+        with open(f"{root}/new.py", "w") as f:
+            f.write("def added():\n    pass\n")
+        with open(f"{root}/utils.py", "w") as f:
+            f.write("def helper(x):\n    return x * 3\n")
+        wait_for(lambda: watcher.snapshot()[0] != old_key)
+
+        key, store = watcher.snapshot()
+        contents = [d.page_content for d in store.docstore._dict.values()]
+        assert any("added" in content for content in contents)
+        assert any("x * 3" in content for content in contents)
+        # Queries holding the old snapshot still see a consistent index
+        assert old_store.index.ntotal == len(old_contents)
+        assert (
+            sorted(d.page_content for d in old_store.docstore._dict.values())
+            == old_contents
+        )
+    finally:
+        watcher.stop()
+
+
+def test_watcher_debounces_bursts(manager):
+    watcher = IndexWatcher(
+        manager, poll_interval=0.05, debounce=0.3, use_watchdog=False
+    ).start()
+    published = []
+    watcher.add_listener(lambda key, store: published.append(key))
+    try:
+        for i in range(5):
+            watcher.notify()
+            with open(f"{manager.root_dir}/burst.py", "w") as f:
+                f.write(f"x = {i}\n")
+            time.sleep(0.05)
+        wait_for(lambda: published)
+        time.sleep(0.5)
+        assert len(published) == 1
+        assert watcher.refresh() is False
+    finally:
+        watcher.stop()
+
+
+def test_snapshot_requires_start(manager):
+    with pytest.raises(RuntimeError):
+        IndexWatcher(manager).snapshot()
+
+
+def test_events_outside_indexed_files_are_dropped(manager):
+    root = manager.root_dir
+    with open(f"{root}/.gitignore", "w") as f:
+        f.write("generated/\n")
+    notified = []
+    handler = _EventHandler(
+        lambda: notified.append(True), IndexWatcher(manager)._discoveries()
+    )
+
+    def event(path, event_type="modified", is_directory=False, dest_path=""):
+        handler.on_any_event(
+            SimpleNamespace(
+                src_path=f"{root}/{path}",
+                dest_path=f"{root}/{dest_path}" if dest_path else "",
+                event_type=event_type,
+                is_directory=is_directory,
+            )
+        )
+        return bool(notified and notified.pop())
+
+    # A branch switch, a build and a virtualenv install touch no indexed file
+    assert not event(".git/HEAD")
+    assert not event(".git/refs/heads", "deleted", is_directory=True)
+    assert not event("build/lib/main.py", "created")
+    assert not event(".venv/lib/site.py", "created")
+    assert not event("generated/schema.py", "created")
+    assert not event("src", "created", is_directory=True)
+
+    assert event("main.py")
+    assert event("src/new.py", "created")
+    assert event("pkg", "deleted", is_directory=True)
+    assert event(".gitignore")
+    assert event("build/main.py", "moved", dest_path="main2.py")
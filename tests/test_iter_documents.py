@@ -0,0 +1,33 @@
+import os
+import pytest
+
+
+@pytest.fixture
+def codebase(tmp_path):
+    root = tmp_path / "codebase"
+    root.mkdir()
+    (root / "main.py").write_text("def main():\n    return 42\n")
+    (root / "utils.py").write_text("def helper(x):\n    return x * 2\n")
+    return root
+
+
+def test_iter_documents_filters_and_decodes(codebase):
+    from coderag.components.load_document import iter_documents
+
+    (codebase / "logo.png").write_bytes(b"\x89PNG\r\n\x1a\n" + b"\x00" * 32)
+    (codebase / "legacy.txt").write_bytes("caf\xe9 cr\xe8me".encode("latin-1"))
+    (codebase / "big.py").write_text("x = 1\n" * 1000)
+    (codebase / "tests").mkdir()
+    (codebase / "tests" / "test_main.py").write_text("assert True\n")
+
+    documents = list(
+        iter_documents(
+            str(codebase), exclude=["tests/*"], max_file_size=1024, max_workers=2
+        )
+    )
+    by_name = {os.path.basename(d.metadata["source"]): d for d in documents}
+    assert sorted(by_name) == ["legacy.txt", "main.py", "utils.py"]
+    assert "caf" in by_name["legacy.txt"].page_content
+
+    python_only = list(iter_documents(str(codebase), include=["*.py"]))
+    assert len(python_only) == 4
@@ -17,3 +17,46 @@ def test_get_qa_chain(qachain):
     mock_retriever = MagicMock()
     qa_chain = qachain.get_qa_chain(retriever=mock_retriever)
     assert qa_chain is not None
+
+
+def test_cache_key_covers_model_settings(qachain):
+    key = qachain.cache_key("What does main do?", "index-1")
+    assert key == qachain.cache_key("what does  main do?", "index-1")
+    assert key != qachain.cache_key("What does main do?", "index-2")
+    assert key != QAChain(repo_id="other-repo").cache_key("What does main do?", "index-1")
+    assert qachain.cache_scope("index-1") != qachain.cache_scope("index-2")
+
+
+def test_stream_yields_the_answer_in_chunks(qachain):
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from langchain_core.language_models.fake import FakeStreamingListLLM
+
+    vector_store = FAISS.from_texts(
+        ["def add(a, b): return a + b"], DeterministicFakeEmbedding(size=8)
+    )
+    qachain.llm = FakeStreamingListLLM(responses=["It adds two numbers."])
+    qachain.get_qa_chain(vector_store.as_retriever(search_kwargs={"k": 1}))
+
+    chunks = list(qachain.stream("What does add do?"))
+    assert len(chunks) > 1
+    assert "".join(chunks) == "It adds two numbers."
+
+
+def test_local_backend_answers_offline():
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    qachain = QAChain(repo_id="dummy-repo", backend="stub", model_path="stub")
+    llm = qachain.initialize_llm()
+    assert type(llm).__name__ == "LocalLLM"
+    other = QAChain(repo_id="other", backend="stub", model_path="stub")
+    assert other.initialize_llm() is llm
+    vector_store = FAISS.from_texts(
+        ["def add(a, b): return a + b"], DeterministicFakeEmbedding(size=8)
+    )
+    qachain.get_qa_chain(vector_store.as_retriever(search_kwargs={"k": 1}))
+    response = qachain.qa_chain.invoke({"query": "What does add do?"})
+    assert response["result"].startswith("Stub answer")
+    endpoint = QAChain(repo_id="dummy-repo")
+    assert qachain.cache_key("q", "i") != endpoint.cache_key("q", "i")
@@ -0,0 +1,153 @@
+import time
+import threading
+import numpy as np
+import pytest
+from langchain_core.prompts import PromptTemplate
+from coderag.components.llm_backend import (
+    LocalLLM,
+    RequestBatcher,
+    StubBackend,
+    TransformersBackend,
+    create_backend,
+    get_local_llm,
+)
+
+
+def test_concurrent_prompts_are_batched():
+    backend = StubBackend(responses=["ok"], latency=0.05)
+    batcher = RequestBatcher(backend, max_batch_size=4, max_wait=0.2)
+    results = []
+
+    def ask(i):
+        results.append(batcher.submit(f"prompt {i}").result(timeout=5))
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["ok"] * 8
+    assert sum(backend.batches) == 8
+    assert max(backend.batches) <= 4
+    assert len(backend.batches) < 8
+    assert batcher.stats.requests == 8
+    assert batcher.stats.mean_batch_size > 1
+
+
+def test_batch_failure_reaches_every_caller():
+    class FailingBackend(StubBackend):
+        def generate(self, prompts):
+            raise RuntimeError("out of memory")
+
+    batcher = RequestBatcher(FailingBackend(), max_wait=0.01)
+    with pytest.raises(RuntimeError, match="out of memory"):
+        batcher.submit("prompt").result(timeout=5)
+
+
+def test_local_llm_in_chains():
+    backend = StubBackend(responses=["first answer STOP ignored", "second"])
+    llm = LocalLLM(batcher=RequestBatcher(backend, max_wait=0.05))
+    assert llm.invoke("question", stop=["STOP"]) == "first answer "
+
+    # The prompts of one call are completed in one batch
+    chain = PromptTemplate.from_template("Explain {code}") | llm
+    answers = chain.batch([{"code": "a"}, {"code": "b"}])
+    assert answers == ["second", "first answer STOP ignored"]
+    assert backend.batches[-1] == 2
+    assert "".join(llm.stream("question")) == "second"
+
+
+def test_one_instance_per_process():
+    llm = get_local_llm("stub", "stub", 0.0, 100)
+    assert get_local_llm("stub", "stub", 0.0, 100) is llm
+    assert get_local_llm("stub", "stub", 0.0, 200) is not llm
+    with pytest.raises(ValueError):
+        create_backend("remote", "model", 0.0, 100)
+
+
+def test_concurrent_streams_are_batched():
+    backend = StubBackend(responses=["one two three"], latency=0.05)
+    batcher = RequestBatcher(backend, max_batch_size=4, max_wait=0.2)
+    results = []
+
+    def ask(i):
+        results.append(list(batcher.stream(f"prompt {i}")))
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    # Every stream receives its text piece by piece, from one shared batch
+    assert results == [["one", " two", " three"]] * 4
+    assert backend.batches == [4]
+
+
+def test_abandoned_stream_does_not_block_the_model():
+    backend = StubBackend(responses=["a long answer"])
+    batcher = RequestBatcher(backend, max_wait=0.01)
+    stream = batcher.stream("prompt")
+    assert next(stream) == "a"
+    stream.close()
+    assert batcher.submit("prompt").result(timeout=5) == "a long answer"
+    assert "".join(batcher.stream("prompt")) == "a long answer"
+
+
+def test_missing_model_fails_fast(tmp_path):
+    with pytest.raises((ImportError, FileNotFoundError)):
+        create_backend("llamacpp", str(tmp_path / "missing.gguf"), 0.0, 100)
+    with pytest.raises((ImportError, FileNotFoundError)):
+        create_backend("transformers", str(tmp_path / "missing"), 0.0, 100)
+
+
+def test_streamed_text_ends_at_stop_sequences():
+    backend = StubBackend(responses=["def add(a, b): ``` trailing words"])
+    llm = LocalLLM(batcher=RequestBatcher(backend, max_wait=0.01))
+    pieces = list(llm.stream("question", stop=["```"]))
+    assert "".join(pieces) == "def add(a, b): "
+    # A stop sequence split across pieces is held back, not emitted
+    assert "".join(llm.stream("question", stop=["b): ``"])) == "def add(a, "
+    assert llm.invoke("question", stop=["```"]) == "def add(a, b): "
+
+
+class FakeTokenizer:
+    def __call__(self, prompts, **kwargs):
+        return {"input_ids": np.zeros((len(prompts), 1), dtype=int)}
+
+    def decode(self, ids, skip_special_tokens=True):
+        return "".join(f"t{i} " for i in ids)
+
+
+class SlowTransformersBackend(TransformersBackend):
+    """Generates one token per step, honouring the cancel criterion."""
+
+    def __init__(self):
+        super().__init__("model", 0.0, max_new_tokens=200)
+        self._model = self
+        self.tokenizer = FakeTokenizer()
+        self.steps = 0
+
+    def _generate(self, inputs, streamer=None, cancel=None):
+        rows = len(inputs["input_ids"])
+        streamer.put(inputs["input_ids"])
+        for step in range(self.max_new_tokens):
+            time.sleep(0.01)
+            self.steps += 1
+            streamer.put(np.full(rows, step))
+            if cancel is not None and cancel.is_set():
+                break
+        streamer.end()
+
+
+def test_abandoned_transformers_stream_frees_the_worker():
+    backend = SlowTransformersBackend()
+    batcher = RequestBatcher(backend, max_wait=0.01)
+    stream = batcher.stream("prompt")
+    assert next(stream) == "t0 "
+    stream.close()
+
+    # The worker is free again long before the 200 steps would have run
+    start = time.monotonic()
+    batcher.warm_up()
+    assert time.monotonic() - start < 1.0
+    assert backend.steps < 50
@@ -0,0 +1,144 @@
+import os
+import faiss
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+from coderag.components.hybrid_retriever import HybridRetriever
+from coderag.components.metadata_filter import (
+    FilteredRetriever,
+    MetadataIndex,
+    parse_filter,
+    path_metadata,
+)
+from coderag.components.vector_store import search_index
+
+
+def test_path_metadata(tmp_path):
+    path = os.path.join(tmp_path, "components", "Loader.PY")
+    assert path_metadata(path, str(tmp_path)) == {
+        "path": "components/Loader.PY",
+        "extension": ".py",
+        "language": "python",
+        "package": "components",
+    }
+    metadata = path_metadata(os.path.join(tmp_path, "app.ts"), str(tmp_path))
+    assert metadata["package"] == ""
+    assert metadata["language"] == "typescript"
+
+
+def test_parse_filter():
+    assert parse_filter("package:components ext:.py,.pyi kind:function") == {
+        "package": "components",
+        "extension": [".py", ".pyi"],
+        "kind": "function",
+    }
+    assert parse_filter("  ") == {}
+    with pytest.raises(ValueError):
+        parse_filter("author:me")
+    with pytest.raises(ValueError):
+        parse_filter("components")
+
+
+@pytest.fixture
+def vector_store():
+    documents = []
+    for i in range(40):
+        package = ["components", "config", "tests", ""][i % 4]
+        path = f"{package}/module_{i}.py" if package else f"module_{i}.md"
+        documents.append(
+            Document(
+                page_content=f"def helper_{i}(x): return x + {i}",
+                metadata={
+                    "i": i,
+                    "path": path,
+                    "extension": os.path.splitext(path)[1],
+                    "package": package,
+                    "kind": "function" if i % 2 else "class",
+                },
+            )
+        )
+    return FAISS.from_documents(documents, DeterministicFakeEmbedding(size=16))
+
+
+def test_metadata_index_mask(vector_store):
+    index = MetadataIndex.from_vector_store(vector_store)
+    assert index.mask({}) is None
+    mask = index.mask({"package": "components", "kind": "class"})
+    assert mask.sum() == 10
+    assert index.mask({"package": ["components", "config"]}).sum() == 20
+    assert index.mask({"path": "tests/"}).sum() == 10
+    assert index.mask({"path": "*.md"}).sum() == 10
+    assert index.mask({"path": "config/module_1.py"}).sum() == 1
+    assert index.mask({"package": "nothing"}).sum() == 0
+
+
+def test_search_index_respects_mask_for_every_index_type():
+    rng = np.random.default_rng(0)
+    vectors = rng.random((200, 8), dtype=np.float32)
+    mask = np.zeros(200, dtype=bool)
+    mask[::7] = True
+    hnsw = faiss.IndexHNSWFlat(8, 8)
+    ivf = faiss.IndexIVFFlat(faiss.IndexFlatL2(8), 8, 4)
+    ivf.train(vectors)
+    ivf.nprobe = 4
+    for index in (faiss.IndexFlatL2(8), hnsw, ivf):
+        index.add(vectors)
+        _, positions = search_index(index, vectors[:3], 5, mask)
+        assert positions.shape == (3, 5)
+        assert all(mask[i] for i in positions.ravel() if i >= 0)
+    _, positions = search_index(faiss.IndexFlatL2(8), vectors[:1], 5, None)
+    assert positions.shape == (1, 5)
+
+
+def test_filtered_retriever(vector_store):
+    retriever = FilteredRetriever(
+        vector_store=vector_store,
+        metadata_index=MetadataIndex.from_vector_store(vector_store),
+        metadata_filter=parse_filter("package:config kind:function"),
+        k=4,
+    )
+    docs = retriever.invoke("helper")
+    # Only 10 chunks match, but k of them are still returned
+    assert len(docs) == 4
+    assert all(doc.metadata["package"] == "config" for doc in docs)
+    assert all(doc.metadata["kind"] == "function" for doc in docs)
+    retriever.metadata_filter = {"package": "nothing"}
+    assert retriever.invoke("helper") == []
+
+
+def test_hybrid_retriever_filter(vector_store):
+    retriever = HybridRetriever.from_vector_store(vector_store, k=5, fetch_k=10)
+    filtered = retriever.filtered({"extension": ".md"})
+    docs = filtered.invoke("helper_3")
+    assert len(docs) == 5
+    assert all(doc.metadata["extension"] == ".md" for doc in docs)
+    # The shared retriever keeps searching everything
+    assert retriever.metadata_filter is None
+    assert filtered.bm25 is retriever.bm25
+
+
+def test_mask_matches_every_chunk_of_the_inverted_columns():
+    import random
+    import numpy as np
+    from coderag.components.metadata_filter import MetadataIndex
+
+    rng = random.Random(0)
+    metadatas = [
+        {
+            "path": f"{rng.choice(['api', 'core', 'core/io'])}/m{rng.randrange(5)}.py",
+            "language": rng.choice(["python", "markdown"]),
+            "kind": rng.choice(["function", "class", "module"]),
+        }
+        for _ in range(500)
+    ]
+    index = MetadataIndex(metadatas)
+    mask = index.mask({"path": "core", "kind": ["class", "module"]})
+    expected = [
+        m["path"].startswith("core/") and m["kind"] in ("class", "module")
+        for m in metadatas
+    ]
+    assert np.array_equal(mask, expected)
+    assert not index.mask({"language": "rust"}).any()
+    assert MetadataIndex([]).mask({"kind": "class"}).size == 0
@@ -0,0 +1,36 @@
+import pytest
+from langchain_core.documents import Document
+from coderag.components.mmap_docstore import MmapDocstore, MmapDocstoreWriter, RowIds
+
+
+def test_writer_and_reader_round_trip(tmp_path):
+    documents = [
+        Document(page_content="def f():\n    return 1\n", metadata={"source": "a.py"}),
+        Document(page_content="héllo wörld", metadata={"source": "b.md", "n": 2}),
+    ]
+    with MmapDocstoreWriter(str(tmp_path)) as writer:
+        for i, document in enumerate(documents):
+            assert writer.add(document, f"id-{i}") == i
+
+    docstore = MmapDocstore(str(tmp_path))
+    assert len(docstore) == 2
+    second = docstore.search(1)
+    assert second.id == "id-1"
+    assert second.page_content == "héllo wörld"
+    assert second.metadata == {"source": "b.md", "n": 2}
+    assert docstore.search(2) == "ID 2 not found."
+
+
+def test_empty_docstore(tmp_path):
+    MmapDocstoreWriter(str(tmp_path)).close()
+    docstore = MmapDocstore(str(tmp_path))
+    assert len(docstore) == 0
+    assert docstore.search(0) == "ID 0 not found."
+
+
+def test_row_ids():
+    ids = RowIds(3)
+    assert list(ids) == [0, 1, 2]
+    assert ids[2] == 2
+    with pytest.raises(KeyError):
+        ids[3]
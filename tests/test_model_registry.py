@@ -0,0 +1,53 @@
+import threading
+import time
+from coderag.components.model_registry import ModelRegistry, get_model_registry
+
+
+def test_clients_are_created_once_per_key():
+    registry = ModelRegistry()
+    created = []
+
+    def factory():
+        time.sleep(0.05)
+        created.append(object())
+        return created[-1]
+
+    clients = []
+    threads = [
+        threading.Thread(target=lambda: clients.append(registry.get("llm", factory)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1
+    assert all(client is created[0] for client in clients)
+    assert registry.get("other", object) is not created[0]
+    assert get_model_registry() is get_model_registry()
+
+
+def test_ollama_clients_are_shared():
+    registry = ModelRegistry()
+    llm = registry.ollama_llm("llama3.1", keep_alive="30m")
+    assert registry.ollama_llm("llama3.1", keep_alive="30m") is llm
+    assert registry.ollama_llm("codellama", keep_alive="30m") is not llm
+    assert llm.keep_alive == "30m"
+
+
+def test_warm_up_runs_once_and_retries_failures():
+    registry = ModelRegistry()
+    calls = []
+    assert registry.warm_up("embeddings", lambda: calls.append(1))
+    assert not registry.warm_up("embeddings", lambda: calls.append(1))
+    assert calls == [1]
+
+    def fail():
+        calls.append(2)
+        raise ConnectionError("server down")
+
+    assert not registry.warm_up("agent", fail)
+    assert not registry.warm_up("agent", fail)
+    assert calls == [1, 2, 2]
+    assert registry.warm_up("agent", lambda: None)
+    assert "embeddings" in registry.summary() and "agent" in registry.summary()
@@ -0,0 +1,62 @@
+from unittest.mock import MagicMock, patch
+from coderag.components.query_cache import QueryCache, normalize_query, query_key
+
+
+def test_query_key_normalizes_and_covers_settings():
+    key = query_key("What does  main do?", "idx", "repo", 0.5, 500)
+    assert key == query_key("  what does main DO? ", "idx", "repo", 0.5, 500)
+    assert key != query_key("What does main do?", "idx2", "repo", 0.5, 500)
+    assert key != query_key("What does main do?", "idx", "repo", 0.7, 500)
+    assert key != query_key("What does main do?", "idx", "repo", 0.5, 100)
+    assert normalize_query(" A\n b ") == "a b"
+
+
+def test_get_or_compute_calls_once():
+    cache = QueryCache()
+    compute = MagicMock(return_value={"result": "42"})
+    assert cache.get_or_compute("k", compute) == {"result": "42"}
+    assert cache.get_or_compute("k", compute) == {"result": "42"}
+    compute.assert_called_once()
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_eviction():
+    cache = QueryCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_entries_expire():
+    cache = QueryCache(ttl=10)
+    with patch("coderag.components.query_cache.time.time", return_value=1000.0):
+        cache.put("a", 1)
+    with patch("coderag.components.query_cache.time.time", return_value=1005.0):
+        assert cache.get("a") == 1
+    with patch("coderag.components.query_cache.time.time", return_value=1011.0):
+        assert cache.get("a") is None
+
+
+def test_disk_backend_survives_restart(tmp_path):
+    cache = QueryCache(cache_dir=str(tmp_path))
+    cache.put("a", {"result": "answer"})
+    cache.close()
+
+    reopened = QueryCache(cache_dir=str(tmp_path))
+    assert reopened.get("a") == {"result": "answer"}
+    reopened.clear()
+    assert reopened.get("a") is None
+
+
+def test_disk_backend_is_bounded(tmp_path):
+    cache = QueryCache(max_entries=1, cache_dir=str(tmp_path), max_disk_entries=2)
+    for i in range(4):
+        cache.put(str(i), i)
+    cache.close()
+
+    reopened = QueryCache(cache_dir=str(tmp_path))
+    assert [reopened.get(str(i)) for i in range(4)] == [None, None, 2, 3]
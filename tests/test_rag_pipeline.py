@@ -0,0 +1,88 @@
+import os
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from coderag.pipeline.rag_pipeline import STAGES, CodeAnalysisPipeline
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    calls: int = 0
+    fail_after: int = -1
+
+    def embed_documents(self, texts):
+        if self.calls == self.fail_after:
+            raise RuntimeError("embedding crashed")
+        self.calls += 1
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def codebase(tmp_path):
+    root = tmp_path / "codebase"
+    (root / "pkg").mkdir(parents=True)
+    for i in range(5):
+        source = f"def f_{i}(x):\n    return x + {i}\n"
+        (root / "pkg" / f"mod_{i}.py").write_text(source)
+    return root
+
+
+def make_pipeline(codebase, tmp_path, embeddings):
+    return CodeAnalysisPipeline(
+        root_dir=str(codebase),
+        output_dir=str(tmp_path / "outputs"),
+        embeddings=embeddings,
+        chunk_mode="recursive",
+        shard_size=2,
+    )
+
+
+def test_pipeline_runs_all_stages(codebase, tmp_path):
+    pipeline = make_pipeline(codebase, tmp_path, CountingEmbedding(size=8))
+    reports = pipeline.run()
+    assert [report.name for report in reports] == list(STAGES)
+    assert [report.items for report in reports] == [5, 5, 5, 5, 5]
+    assert not any(report.resumed for report in reports)
+    outputs = tmp_path / "outputs"
+    for name in ("files.json", "documents.jsonl", "chunks.jsonl", "pipeline.json"):
+        assert (outputs / name).exists()
+    assert len(os.listdir(outputs / "embeddings")) == 3
+
+    store = pipeline.load_vector_store()
+    assert store.index.ntotal == 5
+    document = store.docstore.search(store.index_to_docstore_id[0])
+    assert document.metadata["package"] == "pkg"
+
+
+def test_pipeline_resumes_after_crash(codebase, tmp_path):
+    embeddings = CountingEmbedding(size=8, fail_after=2)
+    with pytest.raises(RuntimeError):
+        make_pipeline(codebase, tmp_path, embeddings).run()
+
+    pipeline = make_pipeline(codebase, tmp_path, CountingEmbedding(size=8))
+    assert pipeline.completed_stages() == ["discover", "load", "split"]
+    reports = pipeline.run()
+    assert [report.resumed for report in reports] == [False, True, True, False, False]
+    # Only the shard that was not saved before the crash is embedded
+    assert pipeline.embeddings.calls == 1
+    assert pipeline.load_vector_store().index.ntotal == 5
+
+    rerun = make_pipeline(codebase, tmp_path, CountingEmbedding(size=8))
+    assert all(report.resumed for report in rerun.run()[1:])
+
+
+def test_pipeline_starts_over_when_files_change(codebase, tmp_path):
+    make_pipeline(codebase, tmp_path, CountingEmbedding(size=8)).run()
+    (codebase / "pkg" / "mod_5.py").write_text("def f_5(x):\n    return x\n")
+
+    pipeline = make_pipeline(codebase, tmp_path, CountingEmbedding(size=8))
+    reports = pipeline.run()
+    assert not any(report.resumed for report in reports)
+    assert reports[-1].items == 6
+    assert pipeline.embeddings.calls == 3
+
+
+def test_stage_requires_previous_stages(codebase, tmp_path):
+    pipeline = make_pipeline(codebase, tmp_path, CountingEmbedding(size=8))
+    with pytest.raises(ValueError):
+        pipeline.run_stage("embed")
+    with pytest.raises(ValueError):
+        pipeline.run_stage("deploy")
@@ -0,0 +1,62 @@
+import time
+import pytest
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from coderag.components.reranker import RerankingRetriever
+
+
+class ListRetriever(BaseRetriever):
+    documents: list
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return self.documents
+
+
+class LengthCrossEncoder:
+    """Scores longer chunks higher, optionally sleeping per batch."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.batches.append(len(pairs))
+        time.sleep(self.delay)
+        return [float(len(text)) for _, text in pairs]
+
+
+@pytest.fixture
+def candidates():
+    # Dense order: shortest first, so re-ranking reverses it
+    return [Document(page_content="x" * (i + 1), metadata={"i": i}) for i in range(10)]
+
+
+def test_rerank_keeps_top_n_by_score(candidates):
+    cross_encoder = LengthCrossEncoder()
+    retriever = RerankingRetriever(
+        retriever=ListRetriever(documents=candidates),
+        cross_encoder=cross_encoder,
+        top_n=3,
+        batch_size=4,
+    )
+    docs = retriever.invoke("query")
+    assert [d.metadata["i"] for d in docs] == [9, 8, 7]
+    assert docs[0].metadata["rerank_score"] == 10.0
+    assert cross_encoder.batches == [4, 4, 2]
+    assert retriever.last_stats.complete
+
+
+def test_time_budget_falls_back_to_dense_order(candidates):
+    retriever = RerankingRetriever(
+        retriever=ListRetriever(documents=candidates),
+        cross_encoder=LengthCrossEncoder(delay=0.05),
+        top_n=6,
+        batch_size=4,
+        time_budget=0.08,
+    )
+    docs = retriever.invoke("query")
+    # One batch fits the budget; the rest keep their dense order
+    assert [d.metadata["i"] for d in docs] == [3, 2, 1, 0, 4, 5]
+    assert "rerank_score" not in docs[4].metadata
+    assert retriever.last_stats.scored == 4
+    assert not retriever.last_stats.complete
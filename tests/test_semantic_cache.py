@@ -0,0 +1,92 @@
+import pytest
+from unittest.mock import MagicMock
+from langchain_core.embeddings import Embeddings
+from coderag.components.semantic_cache import SemanticCache
+
+
+class KeywordEmbedding(Embeddings):
+    """Embeds texts by the keywords they contain, so rephrasings are close."""
+
+    keywords = ["demo.py", "utils.py", "explain", "what", "do"]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        words = text.lower().replace("?", "").split()
+        vector = [float(keyword in words) for keyword in self.keywords]
+        # Mentions of a file dominate the meaning of a question
+        vector[0] *= 4
+        vector[1] *= 4
+        return vector
+
+
+@pytest.fixture
+def cache():
+    return SemanticCache(KeywordEmbedding(), threshold=0.9)
+
+
+def test_rephrased_question_hits(cache):
+    compute = MagicMock(return_value={"result": "demo answer"})
+    cache.get_or_compute("what does demo.py do", "index-1", compute)
+    assert cache.get_or_compute("explain demo.py", "index-1", compute) == {
+        "result": "demo answer"
+    }
+    compute.assert_called_once()
+    assert cache.stats.hits == 1
+    assert cache.stats.hit_rate == 0.5
+    assert cache.stats.saved_seconds >= 0.0
+
+
+def test_different_question_misses(cache):
+    cache.store("what does demo.py do", "index-1", "demo answer")
+    assert cache.lookup("what does utils.py do", "index-1") is None
+
+
+def test_scope_must_match(cache):
+    cache.store("what does demo.py do", "index-1", "demo answer")
+    assert cache.lookup("what does demo.py do", "index-2") is None
+    assert cache.lookup("what does demo.py do", "index-1") == "demo answer"
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = SemanticCache(KeywordEmbedding(), max_entries=1)
+    cache.store("what does demo.py do", "index-1", "demo answer")
+    cache.store("what does utils.py do", "index-1", "utils answer")
+    assert len(cache) == 1
+    assert cache.lookup("what does demo.py do", "index-1") is None
+    assert cache.lookup("what does utils.py do", "index-1") == "utils answer"
+
+
+def test_questions_about_different_identifiers_miss():
+    class ProseEmbedding(Embeddings):
+        """Ignores identifiers, like a small model that sees the same question."""
+
+        def embed_documents(self, texts):
+            return [self.embed_query(text) for text in texts]
+
+        def embed_query(self, text):
+            return [1.0, 0.0]
+
+    cache = SemanticCache(ProseEmbedding(), threshold=0.9)
+    cache.store("what does load_file do?", "index-1", "load answer")
+    assert cache.lookup("what does save_file do?", "index-1") is None
+    assert cache.lookup("What does `load_file` do", "index-1") == "load answer"
+    cache.store("what does save_file do?", "index-1", "save answer")
+    assert cache.lookup("explain save_file", "index-1") == "save answer"
+    assert cache.lookup("what does IndexManager do?", "index-1") is None
+
+
+def test_code_identifiers():
+    from coderag.components.semantic_cache import code_identifiers
+
+    assert code_identifiers("What does load_file() do in demo.py?") == {
+        "load_file",
+        "demo.py",
+    }
+    assert code_identifiers("where is getVectorStore or run() used") == {
+        "getVectorStore",
+        "run",
+    }
+    assert code_identifiers("explain the `main` function.") == {"main"}
+    assert code_identifiers("explain this code.") == frozenset()
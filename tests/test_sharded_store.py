@@ -0,0 +1,160 @@
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+from coderag.components.hybrid_retriever import HybridRetriever
+from coderag.components.sharded_store import (
+    ROOT_SHARD,
+    ShardedIndexManager,
+    ShardedRetriever,
+    ShardedVectorStore,
+)
+
+
+@pytest.fixture
+def embeddings():
+    return DeterministicFakeEmbedding(size=16)
+
+
+def make_documents(n, package):
+    return [
+        Document(
+            page_content=f"def helper_{package}_{i}(x): return x + {i}",
+            metadata={"package": package, "kind": "function" if i % 2 else "class"},
+        )
+        for i in range(n)
+    ]
+
+
+def test_fan_out_matches_single_index(embeddings):
+    first, second = make_documents(30, "a"), make_documents(30, "b")
+    single = FAISS.from_documents(first + second, embeddings)
+    sharded = ShardedVectorStore(
+        {
+            "a": FAISS.from_documents(first, embeddings),
+            "b": FAISS.from_documents(second, embeddings),
+        },
+        embeddings,
+    )
+    assert sharded.ntotal == 60
+    for query in ("helper_a_3", "helper_b_17", "return x + 5"):
+        expected = single.similarity_search_with_score(query, k=5)
+        results = sharded.similarity_search_with_score(query, k=5)
+        assert [d.page_content for d, _ in results] == [
+            d.page_content for d, _ in expected
+        ]
+        assert [s for _, s in results] == pytest.approx([s for _, s in expected])
+    docs = sharded.as_retriever(search_kwargs={"k": 3}).invoke("helper_b_4")
+    assert len(docs) == 3
+    assert all(doc.metadata["shard"] in ("a", "b") for doc in docs)
+
+
+def test_metadata_filter_and_replace_shard(embeddings):
+    first, second = make_documents(10, "a"), make_documents(10, "b")
+    sharded = ShardedVectorStore(
+        {
+            "a": FAISS.from_documents(first, embeddings),
+            "b": FAISS.from_documents(second, embeddings),
+        },
+        embeddings,
+    )
+    docs = sharded.similarity_search(
+        "helper", k=4, metadata_filter={"package": "b", "kind": "class"}
+    )
+    assert len(docs) == 4
+    assert {doc.metadata["package"] for doc in docs} == {"b"}
+    assert {doc.metadata["kind"] for doc in docs} == {"class"}
+
+    replaced = sharded.replace_shard(
+        "b", FAISS.from_documents(make_documents(3, "c"), embeddings)
+    )
+    assert replaced.ntotal == 13
+    assert sharded.ntotal == 20
+    assert replaced.shards["a"] is sharded.shards["a"]
+    assert replaced.replace_shard("b", None).ntotal == 10
+
+
+def test_sharded_retriever_fuses_one_global_ranking(embeddings):
+    first, second = make_documents(10, "a"), make_documents(10, "b")
+    retrievers = {
+        name: HybridRetriever.from_vector_store(
+            FAISS.from_documents(documents, embeddings), k=3
+        )
+        for name, documents in (("a", first), ("b", second))
+    }
+    retriever = ShardedRetriever(retrievers=retrievers, k=4, fetch_k=20)
+    # Best dense and best BM25 match, though shard "a" comes first
+    docs = retriever.invoke("def helper_b_7(x): return x + 7")
+    assert len(docs) == 4
+    assert docs[0].page_content == "def helper_b_7(x): return x + 7"
+    assert docs[0].metadata["shard"] == "b"
+    scores = [doc.metadata["rrf_score"] for doc in docs]
+    assert scores == sorted(scores, reverse=True)
+    assert scores[0] > scores[1]
+
+    # Without BM25 matches the order is the dense order of one combined index
+    single = FAISS.from_documents(first + second, embeddings)
+    expected = single.similarity_search("zzz qqq", k=4)
+    docs = retriever.invoke("zzz qqq")
+    assert [d.page_content for d in docs] == [d.page_content for d in expected]
+
+
+@pytest.fixture
+def codebase(tmp_path):
+    root = tmp_path / "codebase"
+    for package in ("api", "core"):
+        (root / package).mkdir(parents=True)
+        for i in range(3):
+            source = f"def {package}_{i}(x):\n    return x + {i}\n"
+            (root / package / f"mod_{i}.py").write_text(source)
+    (root / "setup.py").write_text("setup()\n")
+    return root
+
+
+def test_directory_shards_update_independently(codebase, tmp_path, embeddings):
+    manager = ShardedIndexManager.by_directory(
+        str(codebase), faiss_path=str(tmp_path / "faiss"), embeddings=embeddings
+    )
+    store = manager.get_vector_store()
+    assert set(store.shards) == {"api", "core", ROOT_SHARD}
+    assert {name: shard.index.ntotal for name, shard in store.shards.items()} == {
+        "api": 3,
+        "core": 3,
+        ROOT_SHARD: 1,
+    }
+    core = store.shards["core"]
+    document = core.docstore.search(core.index_to_docstore_id[0])
+    assert document.metadata["path"].startswith("core/")
+    assert manager.get_vector_store() is store
+
+    key = manager.index_key
+    (codebase / "api" / "mod_0.py").write_text("def changed():\n    pass\n")
+    updated = manager.get_vector_store()
+    assert manager.index_key != key
+    assert updated is not store
+    # Only the changed shard was touched
+    assert updated.shards["core"] is store.shards["core"]
+    assert updated.shards["api"] is not store.shards["api"]
+    assert updated.keys["core"] == store.keys["core"]
+
+    rebuilt = manager.rebuild_shard("core")
+    assert rebuilt.shards["core"] is not updated.shards["core"]
+    assert rebuilt.shards["api"] is updated.shards["api"]
+    assert rebuilt.shards["core"].index.ntotal == 3
+
+
+def test_repository_shards(tmp_path, embeddings):
+    roots = {}
+    for name in ("one", "two"):
+        root = tmp_path / name
+        root.mkdir()
+        (root / "main.py").write_text(f"def {name}():\n    return 1\n")
+        roots[name] = str(root)
+    manager = ShardedIndexManager.by_repository(
+        roots, faiss_path=str(tmp_path / "faiss"), embeddings=embeddings
+    )
+    store = manager.get_vector_store()
+    assert sorted(store.shards) == ["one", "two"]
+    assert manager.root_dirs == sorted(roots.values())
+    document = store.similarity_search("def two():\n    return 1", k=1)[0]
+    assert document.metadata["shard"] == "two"
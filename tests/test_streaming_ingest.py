@@ -0,0 +1,132 @@
+import threading
+import time
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from coderag.components import load_document
+from coderag.components.streaming_ingest import MemoryBudget, StreamingIngestor
+from coderag.components.vector_store import VectorStore
+
+
+def file_chunks(n_files, chunks_per_file=3):
+    for i in range(n_files):
+        ids = [f"f{i}.py::{j}" for j in range(chunks_per_file)]
+        chunks = [
+            Document(page_content=f"def f_{i}_{j}(): return {i * j}")
+            for j in range(chunks_per_file)
+        ]
+        yield ids, chunks
+
+
+class SlowEmbedding(DeterministicFakeEmbedding):
+    def embed_documents(self, texts):
+        time.sleep(0.01)
+        return super().embed_documents(texts)
+
+
+def test_memory_budget_blocks_until_released():
+    budget = MemoryBudget(100)
+    stop = threading.Event()
+    assert budget.acquire(80, stop)
+    waiter = threading.Thread(target=budget.acquire, args=(50, stop))
+    waiter.start()
+    time.sleep(0.05)
+    assert waiter.is_alive()
+    budget.release(80)
+    waiter.join(1)
+    assert not waiter.is_alive()
+    assert budget.peak == 80
+    # A batch over the ceiling still passes on its own
+    budget.release(50)
+    assert budget.acquire(500, stop)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat"])
+def test_ingest_matches_in_memory_build(tmp_path, index_type):
+    embeddings = SlowEmbedding(size=16)
+    vector_store = VectorStore(index_type=index_type, train_size=100, nprobe=64)
+    ingestor = StreamingIngestor(batch_size=16, max_memory_bytes=4096)
+    stats = ingestor.ingest(
+        file_chunks(100), embeddings, vector_store, str(tmp_path / "index")
+    )
+    assert (stats.files, stats.chunks, stats.batches) == (100, 300, 19)
+    # The slow embedder holds back reading; only a few batches are in flight
+    assert stats.peak_bytes < 4096 + 2 * 16 * (16 * 4 + 40)
+
+    store = vector_store.load_mmap(str(tmp_path / "index"), embeddings)
+    assert store.index.ntotal == 300
+    document = store.docstore.search(store.index_to_docstore_id[42])
+    assert document.id == "f14.py::0"
+    assert document.page_content == "def f_14_0(): return 0"
+    results = store.similarity_search("def f_57_2(): return 114", k=1)
+    assert results[0].id == "f57.py::2"
+
+
+def test_ingest_propagates_errors_and_rejects_empty_streams(tmp_path):
+    def broken():
+        yield from file_chunks(2)
+        raise OSError("disk gone")
+
+    ingestor = StreamingIngestor(batch_size=4)
+    with pytest.raises(OSError):
+        ingestor.ingest(
+            broken(), DeterministicFakeEmbedding(size=8), VectorStore(), str(tmp_path)
+        )
+    with pytest.raises(ValueError):
+        ingestor.ingest(
+            iter([]), DeterministicFakeEmbedding(size=8), VectorStore(), str(tmp_path)
+        )
+
+
+def test_index_manager_streams_builds_and_updates(tmp_path):
+    root = tmp_path / "codebase"
+    root.mkdir()
+    for i in range(20):
+        source = f"def f_{i}(x):\n    return x + {i}\n"
+        (root / f"mod_{i}.py").write_text(source)
+    manager = load_document.IndexManager(
+        str(root),
+        embeddings=DeterministicFakeEmbedding(size=8),
+        faiss_path=str(tmp_path / "faiss"),
+        ingestor=StreamingIngestor(batch_size=4),
+    )
+    store = manager.get_vector_store()
+    assert store.index.ntotal == 20
+    assert type(store.docstore).__name__ == "MmapDocstore"
+    assert store.docstore.search(0).metadata["path"].startswith("mod_")
+
+    (root / "mod_3.py").write_text("def changed():\n    pass\n")
+    updated = manager.get_vector_store()
+    contents = [
+        updated.docstore.search(updated.index_to_docstore_id[i]).page_content
+        for i in range(updated.index.ntotal)
+    ]
+    assert updated.index.ntotal == 20
+    assert "def changed():\n    pass" in contents
+    # The mmap snapshot served before the update is untouched
+    assert store.index.ntotal == 20
+
+
+def test_default_batches_reach_the_embedding_pool(tmp_path):
+    from coderag.components.embedding_engine import EmbeddingEngine
+
+    class RecordingEmbedding(DeterministicFakeEmbedding):
+        sizes: list = []
+
+        def embed_documents(self, texts):
+            self.sizes.append(len(texts))
+            return super().embed_documents(texts)
+
+    embeddings = RecordingEmbedding(size=8)
+    files = [
+        (
+            [f"{i}-{j}" for j in range(10)],
+            [Document(page_content=f"chunk {i} {j}") for j in range(10)],
+        )
+        for i in range(300)
+    ]
+    StreamingIngestor().ingest(files, embeddings, VectorStore(), str(tmp_path))
+    # The engine only fans out to its process pool for large enough inputs
+    min_parallel_chunks = EmbeddingEngine("model").min_parallel_chunks
+    assert embeddings.sizes[0] >= min_parallel_chunks
+    assert sum(embeddings.sizes) == 3000
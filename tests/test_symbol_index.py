@@ -0,0 +1,112 @@
+import os
+import pytest
+from coderag.components.symbol_index import SymbolIndex, SymbolRetriever
+
+
+@pytest.fixture
+def codebase(tmp_path):
+    root = tmp_path / "codebase"
+    root.mkdir()
+    (root / "store.py").write_text(
+        "MAX_SIZE = 10\n"
+        "\n"
+        "class Store:\n"
+        "    def save(self, item):\n"
+        "        return validate(item)\n"
+        "\n"
+        "def validate(item):\n"
+        "    return item is not None\n"
+    )
+    (root / "app.py").write_text(
+        "from store import Store, validate\n"
+        "\n"
+        "def main():\n"
+        "    Store().save(1)\n"
+        "    validate(2)\n"
+    )
+    (root / "README.md").write_text("# Store\n")
+    return root
+
+
+def files_of(root):
+    return [str(path) for path in sorted(root.iterdir())]
+
+
+@pytest.fixture
+def symbol_index(codebase, tmp_path):
+    index = SymbolIndex(str(codebase), str(tmp_path / "symbols.sqlite"))
+    index.update(files_of(codebase))
+    yield index
+    index.close()
+
+
+def test_definitions_imports_and_references(symbol_index):
+    [store] = symbol_index.definitions("Store")
+    assert (store["path"], store["kind"], store["line"]) == ("store.py", "class", 3)
+    [save] = symbol_index.definitions("Store.save")
+    assert save["kind"] == "method"
+    assert symbol_index.definitions("MAX_SIZE")[0]["kind"] == "variable"
+
+    calls = symbol_index.references("validate")
+    assert [(row["path"], row["line"]) for row in calls] == [
+        ("app.py", 5),
+        ("store.py", 5),
+    ]
+    assert [row["path"] for row in symbol_index.importers("validate")] == ["app.py"]
+
+
+def test_answer_resolves_location_questions(symbol_index):
+    answer = symbol_index.answer("Where is validate used?")
+    assert "`store.py:7` (function)" in answer
+    assert "`app.py:5`" in answer
+    assert symbol_index.answer("Explain how saving works") is None
+    assert symbol_index.answer("Where is nothing_like_this defined?") is None
+
+
+def test_update_is_incremental(codebase, tmp_path):
+    db_path = str(tmp_path / "symbols.sqlite")
+    index = SymbolIndex(str(codebase), db_path)
+    assert index.update(files_of(codebase)) == {"indexed": 2, "removed": 0}
+    assert index.update(files_of(codebase)) == {"indexed": 0, "removed": 0}
+    index.close()
+
+    (codebase / "store.py").write_text("def validate(item):\n    return True\n")
+    os.remove(codebase / "app.py")
+    index = SymbolIndex(str(codebase), db_path)
+    assert index.update(files_of(codebase)) == {"indexed": 1, "removed": 1}
+    assert index.definitions("Store") == []
+    assert index.references("validate") == []
+    index.close()
+
+
+def test_retriever_returns_definition_source(symbol_index):
+    retriever = SymbolRetriever(symbol_index=symbol_index, k=2)
+    docs = retriever.invoke("What does Store.save do?")
+    assert docs[0].page_content.startswith("    def save(self, item):")
+    assert docs[0].metadata["symbol"] == "Store.save"
+
+    docs = retriever.invoke("Where is validate called?")
+    assert docs[0].metadata["kind"] == "call"
+
+
+def test_readers_never_see_a_file_half_reindexed(symbol_index, codebase):
+    import threading
+
+    store = codebase / "store.py"
+    source = store.read_text()
+    stop = threading.Event()
+
+    def reindex():
+        for i in range(200):
+            # A new size forces the file to be deleted and re-inserted
+            store.write_text(source + "#" * (i % 2 + 1) + "\n")
+            symbol_index.update(files_of(codebase))
+        stop.set()
+
+    writer = threading.Thread(target=reindex)
+    writer.start()
+    counts = set()
+    while not stop.is_set():
+        counts.add(len(symbol_index.definitions("validate")))
+    writer.join()
+    assert counts <= {1}
@@ -19,3 +19,81 @@ def test_initialize_faiss_store(vector_store):
     ) as mock_faiss:
         vector_store.initialize_faiss_store(mock_texts, mock_embeddings)
         mock_faiss.assert_called_once()
+
+
+@pytest.fixture
+def documents():
+    from langchain_core.documents import Document
+
+    return [
+        Document(page_content=f"def function_{i}(): return {i}", metadata={"i": i})
+        for i in range(400)
+    ]
+
+
+@pytest.mark.parametrize("index_type", ["hnsw", "ivf_flat", "ivf_pq", "sq"])
+def test_approximate_indexes_report_recall(index_type, documents):
+    import numpy as np
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    embeddings = DeterministicFakeEmbedding(size=32)
+    store = VectorStore(index_type=index_type, nprobe=64, ef_search=128)
+    vector_store = store.initialize_faiss_store(documents, embeddings, save_dir=None)
+    assert vector_store.index.ntotal == len(documents)
+
+    vectors = np.array(embeddings.embed_documents([d.page_content for d in documents]))
+    report = store.evaluate_recall(vector_store, vectors, k=5)
+    assert 0.0 <= report["recall@5"] <= 1.0
+    if index_type in ("hnsw", "ivf_flat"):
+        assert report["recall@5"] > 0.9
+
+    hits = vector_store.similarity_search(documents[7].page_content, k=1)
+    assert hits[0].metadata["i"] == 7
+
+
+def test_unknown_index_type_is_rejected():
+    with pytest.raises(ValueError):
+        VectorStore(index_type="annoy")
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw"])
+def test_mmap_layout_round_trip(index_type, documents, tmp_path):
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    embeddings = DeterministicFakeEmbedding(size=32)
+    store = VectorStore(index_type=index_type, ef_search=128)
+    vector_store = store.initialize_faiss_store(documents, embeddings, save_dir=None)
+    store.save_mmap(vector_store, str(tmp_path))
+
+    mapped = store.load_mmap(str(tmp_path), embeddings)
+    assert mapped.index.ntotal == len(documents)
+    hits = mapped.similarity_search(documents[42].page_content, k=1)
+    assert hits[0].page_content == documents[42].page_content
+    assert hits[0].metadata["i"] == 42
+    if index_type == "hnsw":
+        import faiss
+
+        assert faiss.downcast_index(mapped.index).hnsw.efSearch == 128
+
+
+def test_recall_is_opt_in_and_bounded(documents):
+    import numpy as np
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    embeddings = DeterministicFakeEmbedding(size=32)
+    vectors = np.array(embeddings.embed_documents([d.page_content for d in documents]))
+    store = VectorStore(index_type="hnsw")
+    with patch.object(VectorStore, "evaluate_recall") as evaluate:
+        vector_store = store.build_from_vectors(documents, vectors, embeddings)
+        evaluate.assert_not_called()
+
+    # Held-out queries are left out of the searched sample
+    store.recall_sample = 100
+    report = store.evaluate_recall(vector_store, vectors, k=5)
+    assert report["sample"] == 100
+    assert 0.0 <= report["recall@5"] <= 1.0
+
+    # A flat index is exact on any sample, so its recall is 1
+    flat = VectorStore(recall_sample=100)
+    flat_store = flat.build_from_vectors(documents, vectors, embeddings)
+    assert flat.evaluate_recall(flat_store, vectors, k=5)["recall@5"] == 1.0